@@ -1,117 +1,179 @@
-from phi.agent import Agent
-from phi.model.ollama import Ollama
-import json
-
-
-class CoherenceAgent:
-    def __init__(self):
+import threading
+import tracing
+from agents.base_agent import ChunkedAgent
+from agents.llm_client import LLMError
+from agents.chunking import OUTPUT_RESERVE_TOKENS
+from agents.response_parser import parse_with_repair
+
+# Instructions shared by every chunk. They open the prompt and the chunk and its index come
+# last, so the server can reuse the prefix it has already processed instead of prefilling
+# the instructions again for each chunk.
+COHERENCE_INSTRUCTIONS = (
+    "You are an advanced research analysis model. You are tasked with evaluating the coherence "
+    "of a research paper, but since the paper is large, it has been divided into smaller chunks "
+    "for analysis.\n\n"
+    "When analyzing a chunk, consider it as part of the larger document. Focus on:\n"
+    "- Logical flow within the chunk\n"
+    "- Clarity of arguments presented there\n"
+    "- Consistency in terminology, tone, and progression of ideas with respect to a broader narrative.\n\n"
+    "Provide the following:\n"
+    "- A coherence score between 0 and 1 (1 being highly coherent)\n"
+    "- 3 key takeaways in a concise explanation justifying your evaluation.\n\n"
+    "Please provide your output in the following JSON format:\n"
+    "{\n"
+    "  \"score\": <coherence_score>,\n"
+    "  \"explanation\": \"<concise_justification_in_three_key_takeaways>\"\n"
+    "}\n\n"
+)
+CHUNK_TEMPLATE = "Research Paper Chunk:\n\n{chunk}\n\nThis is chunk {number} of {total}."
+
+# Experimental session mode, off by default: the instructions are sent once and acknowledged,
+# and every chunk request continues from the returned context. With the constant instruction
+# prefix above, the server already reuses the prefilled instructions, so on the prefill
+# benchmark (scripts/benchmark.py prefill) the session gains nothing: 2803 prefill tokens
+# per chunk against 2802 for the constant prefix alone.
+SESSION_PROMPT = COHERENCE_INSTRUCTIONS + "Reply only \"OK\" for now; the chunks follow one per message."
+SESSION_REPLY_TOKENS = 4
+
+
+class CoherenceAgent(ChunkedAgent):
+    name = "coherence"
+
+    def __init__(self, base_url=None, model="llama3.2", cache=None, client=None,
+                 stream=True, max_output_tokens=OUTPUT_RESERVE_TOKENS, json_mode=False, reuse_context=False):
         """
         Initialize the CoherenceAgent with the Ollama model.
+        Args:
+            base_url (str): The base URL for the Ollama server, or several separated by commas to
+                spread the requests over them. Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            model (str): The Ollama model to use. Default is "llama3.2".
+            cache (LLMCache): Response cache. Defaults to the cache shared by all agents.
+            client (OllamaClient or EndpointPool): HTTP client. Defaults to the client shared for base_url.
+            stream (bool): Stream the reply and stop the model once a complete score/explanation
+                object has been received.
+            max_output_tokens (int): Cap on the number of tokens the model may generate per chunk.
+            json_mode (bool): Constrain the model's output to the score/explanation JSON schema.
+            reuse_context (bool): Experimental, off by default. Send the instructions once and
+                continue every chunk request from the model's context, instead of repeating them
+                in each prompt; it gains little over the constant instruction prefix.
         """
-        try:
-            self.agent = Agent(
-                model=Ollama(id="llama3.2"),  # Initialize the Ollama model
-                markdown=True  # Ensure markdown rendering if needed
-            )
-        except Exception as e:
-            raise RuntimeError(f"Error initializing the agent: {str(e)}")
+        super().__init__(base_url, model, cache, client, stream, max_output_tokens, json_mode)
+        self.reuse_context = reuse_context
+        self._session = None
+        self._session_lock = threading.Lock()
 
-    def _parse_response(self, response):
+    def _session_context(self):
+        """
+        Return the context of a session primed with the instructions, starting it on first use.
+        The context holds token ids of this model, so it is shared by all papers and endpoints.
+        Returns:
+            list: Context to send with chunk requests, or None if the server returned none.
         """
-        Extract the score and explanation from the response string.
+        with self._session_lock:
+            if self._session is None:
+                options = {**self.options, "num_predict": SESSION_REPLY_TOKENS}
+                try:
+                    with tracing.span("session_start"):
+                        reply = self.cache.get_or_call(
+                            self.model, SESSION_PROMPT, options,
+                            lambda: self.client.generate(self.model, SESSION_PROMPT, options=options)
+                        )
+                except LLMError:
+                    # Fall back to full prompts for this chunk and try again with the next one
+                    return None
+                # An empty list records that the server does not return contexts
+                self._session = reply.get("context") or []
+            return self._session or None
+
+    def _run_model(self, prompt, context=None):
+        """
+        Send a prompt to the model, going through the response cache.
         Args:
-            response (str): Raw response string from the model.
+            prompt (str): The input prompt for the model.
+            context (list): Session context the prompt continues from.
         Returns:
-            dict: Parsed response with 'score' and 'explanation'.
+            str: Text content of the model's reply.
         """
-        try:
-            # Extract JSON-like portion of the response
-            start_index = response.find("{")
-            end_index = response.rfind("}") + 1
-            json_part = response[start_index:end_index]
-
-            # Parse the JSON
-            result = json.loads(response)
-
-            # Return the parsed output
-            return {
-                "score": result.get("score", 0),
-                "explanation": result.get("explanation", "No explanation provided.")
-            }
-        except Exception as e:
-            raise ValueError(f"Error parsing the response: {response}. Details: {str(e)}")
+        fields = {"format": self.format} if self.format else {}
+        # The cache is keyed on what the model sees, session included
+        cache_prompt = prompt
+        params = {**self.options, **fields}
+        if context:
+            fields["context"] = context
+            cache_prompt = SESSION_PROMPT + prompt
+            params["context"] = "session"
+
+        with self._timed("llm_call"):
+            return self.cache.get_or_call(
+                self.model, cache_prompt, params, lambda: self._generate(prompt, fields).get("response", "")
+            )
 
-    def analyze(self, text, chunk_size=5000):
+    def _build_prompt(self, chunk, index, total, session=False):
         """
-        Analyze the coherence of the research paper in manageable chunks.
+        Build the coherence prompt for one chunk.
         Args:
-            text (str): Preprocessed text of the paper.
-            chunk_size (int): Maximum size of each chunk for analysis. Default is 5000 tokens.
+            chunk (str): Text of the chunk.
+            index (int): Zero-based index of the chunk.
+            total (int): Total number of chunks.
+            session (bool): Leave out the instructions, which the session context already holds.
         Returns:
-            dict: Aggregated coherence score and detailed explanations for all chunks.
+            str: Prompt for the model.
         """
-        def chunk_text(text, chunk_size):
-            """
-            Split the text into smaller chunks.
-            Args:
-                text (str): Text to be split.
-                chunk_size (int): Size of each chunk.
-            Returns:
-                list: List of text chunks.
-            """
-            return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-
-        chunks = chunk_text(text, chunk_size)
-        aggregated_score = 0
-        explanations = []
-
-        for i, chunk in enumerate(chunks):
-            # Formulate the prompt
-            prompt = (
-                f"You are an advanced research analysis model. You are tasked with evaluating the coherence "
-                f"of a research paper, but since the paper is large, it has been divided into smaller chunks "
-                f"for analysis. You are evaluating chunk {i+1} of {len(chunks)}.\n\n"
-                f"When analyzing this chunk, consider it as part of the larger document. Focus on:\n"
-                f"- Logical flow within this chunk\n"
-                f"- Clarity of arguments presented here\n"
-                f"- Consistency in terminology, tone, and progression of ideas with respect to a broader narrative.\n\n"
-                f"Provide the following:\n"
-                f"- A coherence score between 0 and 1 (1 being highly coherent)\n"
-                f"- 3 key takeaways in a concise explanation justifying your evaluation.\n\n"
-                f"Research Paper Chunk {i+1}/{len(chunks)}:\n\n{chunk}\n\n"
-                f"Please provide your output in the following JSON format:\n"
-                f"{{\n"
-                f"  \"score\": <coherence_score>,\n"
-                f"  \"explanation\": \"<concise_justification_in_three_key_takeaways>\"\n"
-                f"}}"
-            )
+        prompt = CHUNK_TEMPLATE.format(chunk=chunk, number=index + 1, total=total)
+        return prompt if session else COHERENCE_INSTRUCTIONS + prompt
 
-            try:
-                # Get the response
-                response = self.agent.run(prompt)
+    def _evaluate_chunk(self, i, total, chunk):
+        context = self._session_context() if self.reuse_context else None
+        with self._timed("prompt_build"):
+            prompt = self._build_prompt(chunk, i, total, session=context is not None)
+
+        try:
+            # Get the response
+            response = self._run_model(prompt, context)
 
-                # Debugging: Log raw response (you can remove or comment this once the code works)
-                # print(f"DEBUG: Response for chunk {i+1}:\n{response}\n")
+            if not response:
+                return 0, f"Chunk {i+1}: No response returned by the model."
 
-                if not response:
-                    explanations.append(f"Chunk {i+1}: No response returned by the model.")
-                    continue
+            # Parse the response, asking the model to reformat its reply once if needed
+            with self._timed("parse"):
+                result = parse_with_repair(response, self._repair)
+            return result.get("score", 0), f"Chunk {i+1}: {result['explanation']}"
+        except Exception as e:
+            return 0, f"Chunk {i+1}: Error occurred - {str(e)}"
 
-                # Parse the response
-                result = self._parse_response(response)
-                aggregated_score += result.get("score", 0)
-                explanations.append(f"Chunk {i+1}: {result['explanation']}")
-            except Exception as e:
-                explanations.append(f"Chunk {i+1}: Error occurred - {str(e)}")
-                continue
+    def _aggregate(self, chunk_results, evaluated):
+        """
+        Average the chunk scores and join the chunk explanations.
+        Args:
+            chunk_results (list): (score, explanation) of each chunk; None for skipped chunks.
+            evaluated (list): The results of the chunks that were not skipped.
+        Returns:
+            dict: Aggregated coherence score, detailed explanations for all chunks and the raw
+                'chunk_scores' (None for skipped chunks), with 'skipped_chunks' when some
+                chunks were skipped.
+        """
+        skipped = len(chunk_results) - len(evaluated)
+        aggregated_score = sum(score for score, _ in evaluated)
+        explanations = [
+            result[1] if result is not None else f"Chunk {i+1}: Skipped, the LLM backend was saturated."
+            for i, result in enumerate(chunk_results)
+        ]
 
         # Calculate the average coherence score
-        final_score = aggregated_score / len(chunks) if chunks else 0
+        final_score = aggregated_score / len(evaluated) if evaluated else 0
 
         # Combine explanations into a single output
         detailed_explanation = "\n\n".join(explanations)
 
-        return {"score": final_score, "explanation": detailed_explanation}
+        result = {
+            "score": final_score,
+            "explanation": detailed_explanation,
+            # Kept so scores can be re-aggregated without calling the model again
+            "chunk_scores": [chunk_result[0] if chunk_result is not None else None for chunk_result in chunk_results],
+        }
+        if skipped:
+            result["skipped_chunks"] = skipped
+        return result
 
 
 # # Input text
@@ -39,70 +39,51 @@
 #         return {"score": score, "explanation": explanation}
 
 
-import requests
+import tracing
+from agents.base_agent import BaseAgent
 
-class EthicsAgent:
-    def __init__(self, base_url="http://localhost:11434"):
-        """
-        Initialize the EthicsAgent to interface with the Ollama application.
-        Args:
-            base_url (str): The base URL for the Ollama server. Default is "http://localhost:11434".
-        """
-        self.base_url = base_url
+# Share of a paper's fingerprints found in another paper above which the overlap is shown to the model
+OVERLAP_NOTICE_THRESHOLD = 0.05
 
-    def analyze(self, text):
-        """
-        Analyze the ethical soundness of the research paper.
-        Args:
-            text (str): Preprocessed text of the paper.
-        Returns:
-            dict: Score and explanation for ethics.
-        """
-        prompt = (
-            "Assess the ethical soundness of the following research paper. "
-            "Provide a score between 0 and 1 (1 being ethically sound) "
-            "and a brief explanation.\n\n"
-            f"{text}"
-        )
-        response = self._run_ollama(prompt)
-        return self._parse_response(response)
+class EthicsAgent(BaseAgent):
+    name = "ethics"
+    instruction = "Assess the ethical soundness of the following research paper."
+    high = "ethically sound"
 
-    def _run_ollama(self, prompt):
+    def __init__(self, base_url=None, plagiarism_index=None, **kwargs):
         """
-        Send a prompt to the Ollama application and get a response.
+        Initialize the EthicsAgent to interface with the Ollama application.
         Args:
-            prompt (str): The input prompt for the model.
-        Returns:
-            dict: The JSON response from the Ollama application.
+            base_url (str): The base URL for the Ollama server, or several separated by commas.
+                Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            plagiarism_index (PlagiarismIndex): Optional fingerprint index of the corpus. The
+                paper is checked against it and substantial overlap is reported to the model.
+            **kwargs: Model, cache, client and generation settings, see BaseAgent.
         """
-        url = f"{self.base_url}/api/completion"
-        payload = {
-            "model": "llama-3.2",  # Specify the model
-            "prompt": prompt
-        }
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+        super().__init__(base_url, **kwargs)
+        self.plagiarism_index = plagiarism_index
 
-    def _parse_response(self, response):
+    def _prepare(self, text, exclude=None):
         """
-        Parse the Ollama response to extract the score and explanation.
+        Check the paper against the plagiarism index, if one is set.
         Args:
-            response (dict): The raw response from Ollama.
+            text (str): Preprocessed text of the paper.
+            exclude (str): Name of the paper in the plagiarism index, so it is not matched with itself.
         Returns:
-            dict: Parsed score and explanation.
+            tuple: (context, extra, None), with the 'plagiarism' check result in extra when
+                a plagiarism index is set.
         """
-        if "error" in response:
-            return {"score": 0.0, "explanation": response["error"]}
-        
-        content = response.get("completion", "").strip()
-        try:
-            score = float(content.split("Score:")[1].split()[0])
-            explanation = content.split("Explanation:")[1].strip()
-        except IndexError:
-            score = 0.0
-            explanation = "Failed to parse the response."
-        return {"score": score, "explanation": explanation}
+        if self.plagiarism_index is None:
+            return "", {}, None
+        with tracing.span("plagiarism_check"):
+            overlap = self.plagiarism_index.check(text, exclude=exclude)
+        context = ""
+        notable = [m for m in overlap["matches"] if m["containment"] > OVERLAP_NOTICE_THRESHOLD]
+        if notable:
+            context = (
+                "An automated text-overlap check found that this paper shares text with other "
+                "submissions: "
+                + ", ".join(f"{m['containment']:.0%} of its text appears in {m['name']}" for m in notable)
+                + ". Take possible recycled text into account.\n\n"
+            )
+        return context, {"plagiarism": overlap}, None
@@ -0,0 +1,131 @@
+from functools import partial
+from agents.base_agent import ChunkedAgent
+from agents.chunking import OUTPUT_RESERVE_TOKENS
+from agents.response_parser import parse_with_repair, parse_multi_score_response
+
+# Criteria scored together in one request, with what a score of 1 means for each
+CRITERIA = {
+    "coherence": "highly coherent: logical flow, clear arguments, consistent terminology",
+    "ethics": "ethically sound: responsible methods, no misconduct or harmful practices",
+    "novelty": "highly novel: original ideas or methods that go beyond prior work",
+}
+
+# The fused reply holds three explanations, so it gets more room than a single score
+FUSED_OUTPUT_TOKENS = 2 * OUTPUT_RESERVE_TOKENS
+
+FUSED_REPAIR_PROMPT = (
+    "Rewrite the following evaluation as a JSON object with the keys "
+    + ", ".join(f"\"{criterion}\"" for criterion in CRITERIA)
+    + ". Each key maps to an object with \"score\" (a number between 0 and 1) and "
+    "\"explanation\" (a string). Output only the JSON object.\n\n"
+    "Evaluation:\n{reply}"
+)
+
+
+class FusedAgent(ChunkedAgent):
+    name = "fused"
+
+    def __init__(self, base_url=None, model="llama3.2", cache=None, client=None,
+                 stream=True, max_output_tokens=FUSED_OUTPUT_TOKENS):
+        """
+        Initialize the FusedAgent, which scores coherence, ethics and novelty in a single
+        request per chunk so the paper text is sent to the model only once.
+        Args:
+            base_url (str): The base URL for the Ollama server, or several separated by commas to
+                spread the requests over them. Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            model (str): The Ollama model to use. Default is "llama3.2".
+            cache (LLMCache): Response cache. Defaults to the cache shared by all agents.
+            client (OllamaClient or EndpointPool): HTTP client. Defaults to the client shared for base_url.
+            stream (bool): Stream the reply and stop the model once the complete object has been received.
+            max_output_tokens (int): Cap on the number of tokens the model may generate per chunk.
+        """
+        super().__init__(base_url, model, cache, client, stream, max_output_tokens)
+
+    def _build_prompt(self, chunk, index, total):
+        """
+        Build the fused prompt for one chunk.
+        Args:
+            chunk (str): Text of the chunk.
+            index (int): Zero-based index of the chunk.
+            total (int): Total number of chunks.
+        Returns:
+            str: Prompt for the model.
+        """
+        criteria = "\n".join(f"- {criterion}: 1 means {meaning}" for criterion, meaning in CRITERIA.items())
+        fields = ",\n".join(
+            f"  \"{criterion}\": {{\"score\": <{criterion}_score>, \"explanation\": \"<brief_justification>\"}}"
+            for criterion in CRITERIA
+        )
+        return (
+            f"You are an advanced research analysis model. Evaluate the following part of a research "
+            f"paper on several criteria at once. Give each criterion a score between 0 and 1:\n"
+            f"{criteria}\n\n"
+            f"Research Paper Chunk {index+1}/{total}:\n\n{chunk}\n\n"
+            f"Please provide your output in the following JSON format:\n"
+            f"{{\n{fields}\n}}"
+        )
+
+    def _run_model(self, prompt):
+        """
+        Send a prompt to the model, going through the response cache.
+        Args:
+            prompt (str): The input prompt for the model.
+        Returns:
+            str: Text content of the model's reply.
+        """
+        fields = {"format": self.format} if self.format else {}
+        with self._timed("llm_call"):
+            return self.cache.get_or_call(
+                self.model, prompt, {**self.options, **fields},
+                lambda: self._generate(prompt, fields, required_keys=tuple(CRITERIA)).get("response", "")
+            )
+
+    def _evaluate_chunk(self, i, total, chunk):
+        with self._timed("prompt_build"):
+            prompt = self._build_prompt(chunk, i, total)
+        try:
+            response = self._run_model(prompt)
+            if not response:
+                return {criterion: (0, f"Chunk {i+1}: No response returned by the model.") for criterion in CRITERIA}
+            with self._timed("parse"):
+                result = parse_with_repair(
+                    response, self._repair, parse=partial(parse_multi_score_response, criteria=tuple(CRITERIA)),
+                    repair_prompt=FUSED_REPAIR_PROMPT
+                )
+            return {
+                criterion: (scores["score"], f"Chunk {i+1}: {scores['explanation']}")
+                for criterion, scores in result.items()
+            }
+        except Exception as e:
+            return {criterion: (0, f"Chunk {i+1}: Error occurred - {str(e)}") for criterion in CRITERIA}
+
+    def _aggregate(self, chunk_results, evaluated):
+        """
+        Average every criterion over the chunks.
+
+        Ethics and novelty are therefore judged per chunk rather than on the whole paper
+        as EthicsAgent and NoveltyAgent do.
+        Args:
+            chunk_results (list): Mapping of criterion to (score, explanation) for each chunk;
+                None for skipped chunks.
+            evaluated (list): The results of the chunks that were not skipped.
+        Returns:
+            dict: For each criterion, a result dict with 'score', 'explanation' and the raw
+                'chunk_scores' (None for skipped chunks), in the same shape as CoherenceAgent returns.
+        """
+        skipped = len(chunk_results) - len(evaluated)
+        results = {}
+        for criterion in CRITERIA:
+            scores = [chunk_result[criterion][0] for chunk_result in evaluated]
+            explanations = [chunk_result[criterion][1] for chunk_result in evaluated]
+            results[criterion] = {
+                "score": sum(scores) / len(evaluated) if evaluated else 0,
+                "explanation": "\n\n".join(explanations),
+                "chunk_scores": [
+                    chunk_result[criterion][0] if chunk_result is not None else None
+                    for chunk_result in chunk_results
+                ],
+            }
+            if skipped:
+                results[criterion]["skipped_chunks"] = skipped
+        return results
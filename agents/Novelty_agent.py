@@ -41,70 +41,62 @@
 
 
 
-import requests
+import tracing
+from agents.base_agent import BaseAgent
 
-class NoveltyAgent:
-    def __init__(self, base_url="http://localhost:11434"):
-        """
-        Initialize the NoveltyAgent to interface with the Ollama application.
-        Args:
-            base_url (str): The base URL for the Ollama server. Default is "http://localhost:11434".
-        """
-        self.base_url = base_url
+# Papers at least this similar to an indexed paper are scored from the index alone
+DUPLICATE_THRESHOLD = 0.8
 
-    def analyze(self, text):
-        """
-        Assess the novelty of the research paper.
-        Args:
-            text (str): Preprocessed text of the paper.
-        Returns:
-            dict: Score and explanation for novelty.
-        """
-        prompt = (
-            "Evaluate the novelty of the following research paper. "
-            "Provide a score between 0 and 1 (1 being highly novel) "
-            "and a brief explanation.\n\n"
-            f"{text}"
-        )
-        response = self._run_ollama(prompt)
-        return self._parse_response(response)
+class NoveltyAgent(BaseAgent):
+    name = "novelty"
+    instruction = "Evaluate the novelty of the following research paper."
+    high = "highly novel"
 
-    def _run_ollama(self, prompt):
+    def __init__(self, base_url=None, index=None, duplicate_threshold=DUPLICATE_THRESHOLD, neighbors=3, **kwargs):
         """
-        Send a prompt to the Ollama application and get a response.
+        Initialize the NoveltyAgent to interface with the Ollama application.
         Args:
-            prompt (str): The input prompt for the model.
-        Returns:
-            dict: The JSON response from the Ollama application.
+            base_url (str): The base URL for the Ollama server, or several separated by commas.
+                Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            index (NoveltyIndex): Optional similarity index of the corpus. Its nearest neighbors
+                are given to the model as context, and near-duplicates skip the model entirely.
+            duplicate_threshold (float): Similarity at which a paper counts as a near-duplicate.
+            neighbors (int): Number of similar papers mentioned in the prompt.
+            **kwargs: Model, cache, client and generation settings, see BaseAgent.
         """
-        url = f"{self.base_url}/api/completion"
-        payload = {
-            "model": "llama-3.2",  # Specify the model you are running
-            "prompt": prompt
-        }
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+        super().__init__(base_url, **kwargs)
+        self.index = index
+        self.duplicate_threshold = duplicate_threshold
+        self.neighbors = neighbors
 
-    def _parse_response(self, response):
+    def _prepare(self, text, exclude=None):
         """
-        Parse the Ollama response to extract the score and explanation.
+        Look the paper up in the novelty index, if one is set.
         Args:
-            response (dict): The raw response from Ollama.
+            text (str): Preprocessed text of the paper.
+            exclude (str): Name of the paper in the novelty index, so it is not compared with itself.
         Returns:
-            dict: Parsed score and explanation.
+            tuple: (context, extra, result), with the index's 'similar_papers' in extra and,
+                for a near-duplicate, a result scored from the index alone.
         """
-        if "error" in response:
-            return {"score": 0.0, "explanation": response["error"]}
-        
-        content = response.get("completion", "").strip()
-        try:
-            score = float(content.split("Score:")[1].split()[0])
-            explanation = content.split("Explanation:")[1].strip()
-        except IndexError:
-            score = 0.0
-            explanation = "Failed to parse the response."
-        return {"score": score, "explanation": explanation}
+        if self.index is None or not len(self.index):
+            return "", {}, None
+        with tracing.span("novelty_index"):
+            signal = self.index.novelty(text, self.neighbors, exclude)
+        if signal["max_similarity"] >= self.duplicate_threshold:
+            nearest = signal["neighbors"][0]
+            return "", {}, {
+                "score": signal["score"],
+                "explanation": f"Near-duplicate of {nearest['name']} in the corpus "
+                               f"(similarity {nearest['similarity']:.2f}).",
+                "similar_papers": signal["neighbors"],
+            }
+        context = ""
+        if signal["neighbors"]:
+            context = (
+                f"For reference, among {len(self.index)} papers in the corpus the most similar "
+                "to this one by word usage are: "
+                + ", ".join(f"{n['name']} (cosine similarity {n['similarity']:.2f})" for n in signal["neighbors"])
+                + ". Similarities near 1 suggest the paper repeats existing work.\n\n"
+            )
+        return context, {"similar_papers": signal["neighbors"]}, None
@@ -0,0 +1,10 @@
+from agents.base_agent import BaseAgent
+
+
+class PublishabilityAgent(BaseAgent):
+    name = "publishability"
+    instruction = (
+        "Judge whether the following research paper is ready to be published at a reputable venue, "
+        "weighing its contribution, methodology, presentation and ethics."
+    )
+    high = "clearly publishable as it stands"
@@ -0,0 +1,36 @@
+from agents.base_agent import BaseAgent
+
+
+class RelevanceAgent(BaseAgent):
+    name = "relevance"
+    instruction = (
+        "Assess the relevance of the following research paper: whether it addresses a problem "
+        "that matters to its field and whether its results are useful to other researchers."
+    )
+    high = "highly relevant"
+
+    def __init__(self, base_url=None, topic=None, **kwargs):
+        """
+        Initialize the RelevanceAgent to interface with the Ollama application.
+        Args:
+            base_url (str): The base URL for the Ollama server, or several separated by commas.
+                Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            topic (str): Optional topic, e.g. a venue's call for papers, to judge relevance against
+                instead of the paper's own field.
+            **kwargs: Model, cache, client and generation settings, see BaseAgent.
+        """
+        super().__init__(base_url, **kwargs)
+        self.topic = topic
+
+    def _prepare(self, text, exclude=None):
+        """
+        Tell the model the topic relevance is judged against, if one is set.
+        Args:
+            text (str): Preprocessed text of the paper.
+            exclude (str): Unused.
+        Returns:
+            tuple: (context, {}, None).
+        """
+        if not self.topic:
+            return "", {}, None
+        return f"Judge relevance to the following topic: {self.topic}\n\n", {}, None
@@ -0,0 +1,10 @@
+from agents.base_agent import BaseAgent
+
+
+class ResearchQualityAgent(BaseAgent):
+    name = "research_quality"
+    instruction = (
+        "Assess the research quality of the following research paper: soundness of the methodology, "
+        "rigour of the experiments or proofs, and whether the evidence supports the conclusions."
+    )
+    high = "methodologically rigorous"
@@ -0,0 +1,10 @@
+from agents.base_agent import BaseAgent
+
+
+class WritingQualityAgent(BaseAgent):
+    name = "writing_quality"
+    instruction = (
+        "Assess the writing quality of the following research paper: clarity of the prose, "
+        "grammar, structure of the sections and readability for an expert audience."
+    )
+    high = "clearly and correctly written"
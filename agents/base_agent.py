@@ -0,0 +1,357 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from engine import BackendSaturated
+from agents.llm_client import get_client, LLMError
+from agents.llm_cache import get_default_cache
+from agents.chunking import chunk_text, iter_chunks, chunk_budget, context_tokens, OUTPUT_RESERVE_TOKENS
+from agents.response_parser import (
+    JSONObjectDetector, ResponseParseError, SCORE_SCHEMA, parse_with_repair, make_repair
+)
+
+# Prompt of the agents that score a whole paper on one criterion. Fields: instruction,
+# high (what a score of 1 means), name, context (placed before the paper) and text.
+SCORE_TEMPLATE = (
+    "{instruction} "
+    "Provide a score between 0 and 1 (1 being {high}) "
+    "and a brief explanation.\n\n"
+    "{context}"
+    "{text}\n\n"
+    "Please provide your output in the following JSON format:\n"
+    "{{\n"
+    "  \"score\": <{name}_score>,\n"
+    "  \"explanation\": \"<brief_explanation>\"\n"
+    "}}"
+)
+
+# Requests analyze_many keeps in flight, so that the server's parallel slots batch them
+DEFAULT_BATCH_SIZE = 4
+
+# Phases timed per agent
+TIMED_PHASES = ("prompt_build", "llm_call", "parse")
+
+
+class AgentTiming:
+    def __init__(self):
+        """
+        Initialize thread-safe timers of an agent's papers and of each phase of their evaluation.
+        """
+        self.papers = 0
+        self.seconds = 0.0
+        self.phases = {phase: 0.0 for phase in TIMED_PHASES}
+        self._lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def record_papers(self, papers, seconds):
+        with self._lock:
+            self.papers += papers
+            self.seconds += seconds
+
+    def summary(self):
+        """
+        Return the time spent by the agent.
+        Returns:
+            dict: papers, total seconds, mean seconds per paper and seconds per phase.
+                Phases of concurrent requests overlap, so they can add up to more than the total.
+        """
+        with self._lock:
+            return {
+                "papers": self.papers,
+                "total_s": self.seconds,
+                "mean_s": self.seconds / self.papers if self.papers else 0.0,
+                **{f"{phase}_s": seconds for phase, seconds in self.phases.items()},
+            }
+
+
+class BaseAgent:
+    # Set by subclasses: result key, and the fields of the prompt template
+    name = None
+    instruction = None
+    high = None
+    template = SCORE_TEMPLATE
+
+    def __init__(self, base_url=None, model="llama3.2", cache=None, client=None,
+                 stream=True, max_output_tokens=OUTPUT_RESERVE_TOKENS, json_mode=False,
+                 template=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Initialize an agent that scores whole papers on one criterion. Subclasses set the
+        prompt fields and may override _prepare to add context or skip the model.
+        Args:
+            base_url (str): The base URL for the Ollama server, or several separated by commas to
+                spread the requests over them. Defaults to the servers configured in .env (OLLAMA_ENDPOINTS).
+            model (str): The Ollama model to use. Default is "llama3.2".
+            cache (LLMCache): Response cache. Defaults to the cache shared by all agents.
+            client (OllamaClient or EndpointPool): HTTP client. Defaults to the client shared for base_url.
+            stream (bool): Stream the reply and stop the model once a complete score/explanation
+                object has been received.
+            max_output_tokens (int): Cap on the number of tokens the model may generate.
+            json_mode (bool): Constrain the model's output to the score/explanation JSON schema.
+            template (str): Prompt template replacing the class's, with the fields of SCORE_TEMPLATE.
+            batch_size (int): Requests analyze_many sends concurrently.
+        """
+        self.model = model
+        self.cache = cache if cache is not None else get_default_cache()
+        self.client = client if client is not None else get_client(base_url)
+        self.base_url = self.client.base_url
+        self.stream = stream
+        self.max_output_tokens = max_output_tokens
+        self.options = self._model_options(max_output_tokens)
+        self.format = SCORE_SCHEMA if json_mode else None
+        self._repair = make_repair(self.client, model, self.cache, self.options)
+        if template is not None:
+            self.template = template
+        self.batch_size = batch_size
+        self.timing = AgentTiming()
+
+    def _model_options(self, max_output_tokens):
+        """
+        Return the Ollama options the agent's requests are sent with.
+        Args:
+            max_output_tokens (int): Cap on the number of tokens the model may generate.
+        Returns:
+            dict: Model options.
+        """
+        return {"num_predict": max_output_tokens}
+
+    @contextmanager
+    def _timed(self, phase):
+        """
+        Trace a phase of the evaluation and add its duration to the agent's timing.
+        """
+        start = time.perf_counter()
+        with tracing.span(phase):
+            yield
+        self.timing.record(phase, time.perf_counter() - start)
+
+    def build_prompt(self, text, context=""):
+        """
+        Fill the agent's prompt template.
+        Args:
+            text (str): Preprocessed text of the paper.
+            context (str): Text placed before the paper, e.g. signals from the corpus.
+        Returns:
+            str: Prompt for the model.
+        """
+        return self.template.format(
+            instruction=self.instruction, high=self.high, name=self.name, context=context, text=text
+        )
+
+    def _prepare(self, text, exclude=None):
+        """
+        Compute what the prompt needs besides the paper. Subclasses override it.
+        Args:
+            text (str): Preprocessed text of the paper.
+            exclude (str): Name of the paper, to leave it out of corpus comparisons.
+        Returns:
+            tuple: (context, extra, result): text placed before the paper, fields added to the
+                result, and a finished result when the model is not needed (otherwise None).
+        """
+        return "", {}, None
+
+    def analyze(self, text, exclude=None):
+        """
+        Score one paper.
+        Args:
+            text (str): Preprocessed text of the paper.
+            exclude (str): Name of the paper, to leave it out of corpus comparisons.
+        Returns:
+            dict: Score and explanation, plus any fields added by the agent.
+        """
+        return self.analyze_many([text], [exclude], map_calls=map)[0]
+
+    def analyze_many(self, texts, excludes=None, map_calls=None):
+        """
+        Score several papers, sending their requests together. Cached replies are returned
+        at once and the other requests are in flight at the same time, so the server can
+        batch them instead of handling one paper after another.
+        Args:
+            texts (list): Preprocessed texts of the papers.
+            excludes (list): Name of each paper, to leave it out of corpus comparisons.
+            map_calls (callable): Function applying the model call to every prompt, in order,
+                e.g. the evaluation engine's map_chunks. Defaults to a pool of batch_size threads.
+                Errors it raises, such as BackendSaturated, are passed on to the caller.
+        Returns:
+            list: One result per text, in order.
+        """
+        start = time.perf_counter()
+        excludes = [None] * len(texts) if excludes is None else excludes
+        jobs = []
+        for text, exclude in zip(texts, excludes):
+            context, extra, result = self._prepare(text, exclude)
+            prompt = None
+            if result is None:
+                with self._timed("prompt_build"):
+                    prompt = self.build_prompt(text, context)
+            jobs.append((prompt, extra, result))
+
+        prompts = [prompt for prompt, _, result in jobs if result is None]
+        if map_calls is None and len(prompts) > 1:
+            # Each request runs in a copy of the caller's context so its spans nest under the caller's
+            contexts = [contextvars.copy_context() for _ in prompts]
+            with ThreadPoolExecutor(max_workers=min(self.batch_size, len(prompts))) as pool:
+                responses = list(pool.map(lambda context, prompt: context.run(self._run_ollama, prompt),
+                                          contexts, prompts))
+        else:
+            responses = list((map_calls or map)(self._run_ollama, prompts))
+
+        responses = iter(responses)
+        results = []
+        for prompt, extra, result in jobs:
+            if result is None:
+                response = next(responses)
+                with self._timed("parse"):
+                    result = self._parse_response(response)
+                result.update(extra)
+            results.append(result)
+        self.timing.record_papers(len(texts), time.perf_counter() - start)
+        return results
+
+    def _run_ollama(self, prompt):
+        """
+        Send a prompt to the Ollama application and get a response.
+        Args:
+            prompt (str): The input prompt for the model.
+        Returns:
+            dict: The JSON response from the Ollama application.
+        """
+        fields = {"format": self.format} if self.format else {}
+
+        def call():
+            try:
+                return self._generate(prompt, fields)
+            except LLMError as e:
+                return {"error": str(e)}
+
+        with self._timed("llm_call"):
+            return self.cache.get_or_call(self.model, prompt, {**self.options, **fields}, call)
+
+    def _generate(self, prompt, fields=None, required_keys=("score", "explanation")):
+        """
+        Send a prompt to the model without going through the cache. A streamed reply is
+        stopped once a complete JSON object with the required keys has been received.
+        Args:
+            prompt (str): The input prompt for the model.
+            fields (dict): Extra request fields, e.g. format or context.
+            required_keys (tuple): Keys the streamed object must contain.
+        Returns:
+            dict: The JSON response from the Ollama application.
+        Raises:
+            LLMError: If the request fails.
+        """
+        fields = fields or {}
+        if not self.stream:
+            return self.client.generate(self.model, prompt, options=self.options, **fields)
+        detector = JSONObjectDetector(required_keys)
+        return self.client.generate_stream(
+            self.model, prompt, options=self.options,
+            stop_when=lambda piece: detector.feed(piece) is not None, **fields
+        )
+
+    def _parse_response(self, response):
+        """
+        Parse the Ollama response to extract the score and explanation.
+        Args:
+            response (dict): The raw response from Ollama.
+        Returns:
+            dict: Parsed score and explanation.
+        """
+        if "error" in response:
+            return {"score": 0.0, "explanation": response["error"]}
+
+        try:
+            return parse_with_repair(response.get("response", ""), self._repair)
+        except ResponseParseError:
+            return {"score": 0.0, "explanation": "Failed to parse the response."}
+
+
+# Agents that split the paper into chunks fitting the model's context and score each chunk
+# with its own request. Subclasses score a chunk in _evaluate_chunk and combine the chunk
+# results in _aggregate; the prompt template fields of BaseAgent are not used.
+class ChunkedAgent(BaseAgent):
+    def _model_options(self, max_output_tokens):
+        # Run the model with the context window the chunker plans for
+        return {"num_ctx": context_tokens(self.model), "num_predict": max_output_tokens}
+
+    def _analyze_chunk(self, job):
+        """
+        Evaluate a single chunk.
+        Args:
+            job (tuple): (index, total, chunk) for the chunk to evaluate.
+        Returns:
+            The chunk result of _evaluate_chunk.
+        """
+        i, total, chunk = job
+        with tracing.span("chunk", index=i):
+            return self._evaluate_chunk(i, total, chunk)
+
+    def _evaluate_chunk(self, i, total, chunk):
+        """
+        Score one chunk. Subclasses override it.
+        Args:
+            i (int): Zero-based index of the chunk.
+            total (int): Total number of chunks.
+            chunk (str): Text of the chunk.
+        Returns:
+            The chunk result passed to _aggregate.
+        """
+        raise NotImplementedError
+
+    def _aggregate(self, chunk_results, evaluated):
+        """
+        Combine the chunk results into the agent's result. Subclasses override it.
+        Args:
+            chunk_results (list): Result of each chunk, in order; None for skipped chunks.
+            evaluated (list): The results of the chunks that were not skipped.
+        Returns:
+            dict: The agent's result.
+        """
+        raise NotImplementedError
+
+    def analyze(self, text, chunk_size=None, overlap=0, map_chunks=map):
+        """
+        Split the paper into chunks, score each one and combine their results.
+        Args:
+            text (str or FileText): Preprocessed text of the paper. A FileText is chunked
+                lazily, so only the chunks being evaluated are held in memory.
+            chunk_size (int): Maximum size of each chunk for analysis, in tokens.
+                Defaults to what fits in the model's context next to the prompt and reply.
+            overlap (int): Tokens repeated from the end of each chunk at the start of the next.
+            map_chunks (callable): Function used to apply the chunk evaluation to every chunk.
+                Must preserve order. Defaults to the built-in serial map; the evaluation
+                engine passes a concurrent one, which returns None for chunks skipped
+                because the backend was saturated.
+        Returns:
+            dict: The agent's result, see _aggregate.
+        Raises:
+            BackendSaturated: If every chunk was skipped.
+        """
+        start = time.perf_counter()
+        if chunk_size is None:
+            chunk_size = chunk_budget(self.model, output_tokens=self.max_output_tokens)
+        with tracing.span("chunking") as span:
+            if isinstance(text, str):
+                chunks = chunk_text(text, max_tokens=chunk_size, model=self.model, overlap_tokens=overlap)
+                total = len(chunks)
+            else:
+                # The prompt names the chunk count, so count in a first lazy pass
+                total = sum(1 for _ in iter_chunks(text, chunk_size, self.model, overlap))
+                chunks = iter_chunks(text, chunk_size, self.model, overlap)
+            span.count(chunks=total)
+        jobs = ((i, total, chunk) for i, chunk in enumerate(chunks))
+        chunk_results = list(map_chunks(self._analyze_chunk, jobs))
+
+        with tracing.span("aggregate"):
+            # Skipped chunks are left out of the aggregates rather than scored 0
+            evaluated = [chunk_result for chunk_result in chunk_results if chunk_result is not None]
+            if total and not evaluated:
+                raise BackendSaturated(f"All {total} chunks were skipped")
+            result = self._aggregate(chunk_results, evaluated)
+        self.timing.record_papers(1, time.perf_counter() - start)
+        return result
@@ -0,0 +1,224 @@
+import re
+
+# Context window assumed for each model, in tokens. The agents pass it to Ollama as num_ctx.
+MODEL_CONTEXT_TOKENS = {
+    "llama3.2": 4096,
+    "llama-3.2": 4096,
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+
+# Room kept free in the context window for the instructions and for the model's reply
+PROMPT_RESERVE_TOKENS = 400
+OUTPUT_RESERVE_TOKENS = 512
+
+# Rough average for English text with Llama tokenizers
+CHARS_PER_TOKEN = 4
+
+# Streaming: characters read from a file at a time, and chunks' worth of text buffered
+# before the front of the buffer is split off
+DEFAULT_BLOCK_CHARS = 1 << 16
+STREAM_WINDOW_CHUNKS = 8
+
+# Split points from the most to the least preferred. Every pattern matches an empty
+# string, so the separators stay attached to the pieces and joining the pieces gives
+# back the original text.
+SPLIT_LEVELS = [
+    # Section headings: "Abstract:" lines written by preprocess_text, or numbered headings
+    re.compile(r"(?<=\n)(?=[A-Z][A-Za-z ]{2,40}:\n|\d+\.?[ \t]+[A-Z][^\n]{0,80}\n)"),
+    # Paragraphs
+    re.compile(r"(?<=\n\n)"),
+    # Lines
+    re.compile(r"(?<=\n)"),
+    # Sentences
+    re.compile(r"(?<=[.!?])(?=\s)"),
+    # Words
+    re.compile(r"(?=\s)"),
+]
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text.
+    Args:
+        text (str): Text to measure.
+    Returns:
+        int: Approximate token count.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def context_tokens(model):
+    """
+    Return the context window assumed for a model.
+    Args:
+        model (str): Model identifier.
+    Returns:
+        int: Context size in tokens.
+    """
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def chunk_budget(model, prompt_tokens=PROMPT_RESERVE_TOKENS, output_tokens=OUTPUT_RESERVE_TOKENS):
+    """
+    Compute how many tokens of paper text fit in one request.
+    Args:
+        model (str): Model identifier.
+        prompt_tokens (int): Tokens used by the instructions around the chunk.
+        output_tokens (int): Tokens reserved for the model's reply.
+    Returns:
+        int: Maximum number of tokens per chunk.
+    """
+    return max(context_tokens(model) - prompt_tokens - output_tokens, 1)
+
+
+def _split(text, max_tokens, levels):
+    """
+    Recursively split text into pieces of at most max_tokens, using the most
+    preferred split level that works.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    if not levels:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    pieces = []
+    for part in levels[0].split(text):
+        if not part:
+            continue
+        if estimate_tokens(part) > max_tokens:
+            pieces.extend(_split(part, max_tokens, levels[1:]))
+        else:
+            pieces.append(part)
+    return _merge(pieces, max_tokens)
+
+
+def _merge(pieces, max_tokens):
+    """
+    Greedily join consecutive pieces into chunks of at most max_tokens.
+    """
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and estimate_tokens(current + piece) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _tail(text, overlap_tokens):
+    """
+    Return roughly the last overlap_tokens of a text, starting at a sentence or word boundary.
+    """
+    tail = text[-overlap_tokens * CHARS_PER_TOKEN:]
+    for pattern in SPLIT_LEVELS[3:]:
+        match = pattern.search(tail, 1)
+        if match:
+            return tail[match.start():].lstrip()
+    return tail
+
+
+def _with_overlap(chunks, overlap_tokens):
+    """
+    Strip chunks, drop empty ones and prefix each with the tail of the previous one.
+    Works lazily on any iterable of raw chunks.
+    """
+    previous = None
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        yield chunk if previous is None or overlap_tokens <= 0 else f"{_tail(previous, overlap_tokens)} {chunk}"
+        previous = chunk
+
+
+def chunk_text(text, max_tokens=None, model=None, overlap_tokens=0):
+    """
+    Split a paper into chunks that fit a token budget, preferring section, then
+    paragraph, line, sentence and word boundaries.
+    Args:
+        text (str): Text to split.
+        max_tokens (int): Maximum tokens per chunk, overlap included. Defaults to
+            chunk_budget(model).
+        model (str): Model the chunks are meant for. Used when max_tokens is not given.
+        overlap_tokens (int): Tokens from the end of each chunk repeated at the start of
+            the next one, to keep context across chunk boundaries.
+    Returns:
+        list: List of text chunks.
+    """
+    if not text.strip():
+        return []
+    if max_tokens is None:
+        max_tokens = chunk_budget(model)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    return list(_with_overlap(_split(text, max_tokens - overlap_tokens, SPLIT_LEVELS), overlap_tokens))
+
+
+def iter_chunks(blocks, max_tokens=None, model=None, overlap_tokens=0, window_chunks=STREAM_WINDOW_CHUNKS):
+    """
+    Lazily split text arriving in blocks into chunks, like chunk_text.
+
+    Blocks are buffered until about window_chunks chunks' worth of text is available.
+    The buffer is then split as chunk_text would, every chunk but the last is yielded,
+    and the last one goes back to the front of the buffer to be merged with the text
+    that follows. Memory therefore stays proportional to the chunk size, not to the
+    document. The chunks match chunk_text's except where a preferred split point sits
+    right at the edge of the buffer.
+    Args:
+        blocks (iterable): Pieces of text in order, e.g. a FileText.
+        max_tokens (int): Maximum tokens per chunk, overlap included. Defaults to chunk_budget(model).
+        model (str): Model the chunks are meant for. Used when max_tokens is not given.
+        overlap_tokens (int): Tokens from the end of each chunk repeated at the start of the next one.
+        window_chunks (int): Chunks' worth of text buffered before splitting.
+    Yields:
+        str: Text chunks.
+    """
+    if max_tokens is None:
+        max_tokens = chunk_budget(model)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    budget = max_tokens - overlap_tokens
+    window = window_chunks * budget * CHARS_PER_TOKEN
+
+    def raw_chunks():
+        buffer = ""
+        for block in blocks:
+            buffer += block
+            while len(buffer) >= window:
+                *ready, rest = _split(buffer[:window], budget, SPLIT_LEVELS)
+                if not ready:
+                    break
+                yield from ready
+                buffer = rest + buffer[window:]
+        if buffer:
+            yield from _split(buffer, budget, SPLIT_LEVELS)
+
+    return _with_overlap(raw_chunks(), overlap_tokens)
+
+
+class FileText:
+    def __init__(self, path, block_chars=DEFAULT_BLOCK_CHARS):
+        """
+        A text file read lazily in blocks. It can be iterated several times, e.g. once to
+        count the chunks and once to evaluate them, without holding the text in memory.
+        Args:
+            path (str): Path to a UTF-8 text file.
+            block_chars (int): Characters read at a time.
+        """
+        self.path = path
+        self.block_chars = block_chars
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for block in iter(lambda: f.read(self.block_chars), ""):
+                yield block
+
+    def read(self):
+        """
+        Return the whole text, for agents that send the paper in one request.
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+import tracing
+
+# Default cache settings (overridable from .env)
+DEFAULT_CACHE_PATH = "Data/llm_cache.sqlite"
+DEFAULT_MAX_MB = 512  # Evict least recently used entries above this size
+DEFAULT_MAX_AGE_DAYS = 30  # Evict entries older than this
+EVICT_EVERY = 100  # Run eviction after this many writes
+
+
+class LLMCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 max_age=DEFAULT_MAX_AGE_DAYS * 86400, bypass=False):
+        """
+        Initialize a persistent, content-addressed cache of LLM responses.
+        Args:
+            path (str): Path to the SQLite database file.
+            max_bytes (int): Maximum total size of cached responses, or None for no limit.
+            max_age (float): Maximum age of an entry in seconds, or None for no limit.
+            bypass (bool): If True, never read from or write to the cache.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model, prompt, params=None):
+        """
+        Hash the model id, prompt and generation parameters into a cache key.
+        Args:
+            model (str): Model identifier.
+            prompt (str): Prompt sent to the model.
+            params (dict): Generation parameters that influence the output.
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        payload = json.dumps({"model": model, "prompt": prompt, "params": params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+        Args:
+            key (str): Cache key from make_key.
+        Returns:
+            The cached value, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age is not None and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, model=None):
+        """
+        Store a response.
+        Args:
+            key (str): Cache key from make_key.
+            value: JSON-serialisable response.
+            model (str): Model identifier, kept for inspection.
+        """
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, len(data), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            run_eviction = self._writes % EVICT_EVERY == 0
+        if run_eviction:
+            self.evict()
+
+    def get_or_call(self, model, prompt, params, fn):
+        """
+        Return the cached response for a request, calling fn on a miss.
+        Empty responses and responses carrying an "error" key are not cached.
+        Args:
+            model (str): Model identifier.
+            prompt (str): Prompt sent to the model.
+            params (dict): Generation parameters that influence the output.
+            fn (callable): Zero-argument function performing the actual call.
+        Returns:
+            The cached or freshly computed response.
+        """
+        if self.bypass:
+            return fn()
+
+        key = self.make_key(model, prompt, params)
+        value = self.get(key)
+        if value is not None:
+            tracing.count(cache_hits=1)
+            return value
+
+        value = fn()
+        if value and not (isinstance(value, dict) and "error" in value):
+            self.put(key, value, model)
+        return value
+
+    def evict(self):
+        """
+        Remove expired entries, then least recently used entries until the size limit holds.
+        """
+        with self._lock:
+            if self.max_age is not None:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+                    stale = []
+                    for key, size in rows:
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current size of the cache.
+        Returns:
+            dict: Cache statistics.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "bypass": self.bypass,
+        }
+
+    def clear(self):
+        """
+        Remove every cached response.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Return the cache shared by all agents, configured from the environment:
+    LLM_CACHE_PATH, LLM_CACHE_MAX_MB, LLM_CACHE_MAX_AGE_DAYS and LLM_CACHE_BYPASS.
+    Returns:
+        LLMCache: The shared cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024,
+                max_age=float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)) * 86400,
+                bypass=os.getenv("LLM_CACHE_BYPASS", "0").lower() in ("1", "true", "yes"),
+            )
+        return _default_cache
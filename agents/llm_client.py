@@ -0,0 +1,523 @@
+import os
+import time
+import json
+import random
+import asyncio
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+from agents.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Default transport settings
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_CONNECT_TIMEOUT = 5  # Seconds to establish a connection
+DEFAULT_READ_TIMEOUT = 300  # Seconds to wait for the model between bytes of the reply
+DEFAULT_RETRIES = 3  # Extra attempts after a failed request
+DEFAULT_BACKOFF = 0.5  # Base delay in seconds, doubled on every retry
+DEFAULT_POOL_SIZE = 16  # Keep-alive connections kept open per server
+DEFAULT_HEALTH_TIMEOUT = 2  # Seconds allowed for a health check
+DEFAULT_HEALTH_INTERVAL = 30  # Seconds before an endpoint found down is checked again
+DEFAULT_ENDPOINT_RETRIES = 1  # Retries on one endpoint of a pool before failing over to another
+
+# HTTP statuses worth retrying: overloaded or temporarily failing server
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """
+    Raised when a request to the LLM server fails after all retries.
+    """
+
+
+def summarize_latencies(latencies, failures):
+    """
+    Summarise call latencies.
+    Args:
+        latencies (list): Seconds taken by each completed call.
+        failures (int): Number of failed calls.
+    Returns:
+        dict: calls, failures, and p50/p95/max latency in seconds.
+    """
+    latencies = sorted(latencies)
+
+    def percentile(fraction):
+        if not latencies:
+            return 0.0
+        return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+    return {
+        "calls": len(latencies),
+        "failures": failures,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+class OllamaClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 pool_size=DEFAULT_POOL_SIZE):
+        """
+        Initialize a client for an Ollama server.
+
+        Requests go through one requests.Session, so connections are pooled and kept
+        alive between calls. The client is safe to share between threads.
+        Args:
+            base_url (str): The base URL for the Ollama server.
+            connect_timeout (float): Seconds allowed to open a connection.
+            read_timeout (float): Seconds allowed between bytes of the reply.
+            retries (int): Number of retries after a connection error, timeout or 5xx/429 reply.
+            backoff (float): Base delay between retries; doubled each time, with jitter.
+            pool_size (int): Maximum number of pooled connections to the server.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Latency of every completed call, for run statistics
+        self.latencies = []
+        self.failures = 0
+        self._stats_lock = threading.Lock()
+
+    def _record(self, elapsed=None):
+        # Record the latency of a completed call, or a failure when elapsed is None
+        with self._stats_lock:
+            if elapsed is None:
+                self.failures += 1
+            else:
+                self.latencies.append(elapsed)
+
+    def stats(self):
+        """
+        Return call counts and latency percentiles since the client was created or reset.
+        Returns:
+            dict: calls, failures, and p50/p95/max latency in seconds.
+        """
+        with self._stats_lock:
+            return summarize_latencies(self.latencies, self.failures)
+
+    @staticmethod
+    def _count_tokens(prompt, reply, text):
+        # Add token and character counts to the current tracing span. Streams closed early
+        # never get Ollama's final counts, so those fall back to estimates.
+        tracing.count(
+            prompt_chars=len(prompt),
+            prompt_tokens=reply.get("prompt_eval_count") or estimate_tokens(prompt),
+            completion_chars=len(text),
+            completion_tokens=reply.get("eval_count") or estimate_tokens(text),
+        )
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.latencies = []
+            self.failures = 0
+
+    def check_health(self, timeout=DEFAULT_HEALTH_TIMEOUT):
+        """
+        Check that the server answers, by listing its models with GET /api/tags.
+        Args:
+            timeout (float): Seconds allowed for the check.
+        Returns:
+            bool: Whether the server replied successfully.
+        """
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+            response.close()
+        except requests.exceptions.RequestException:
+            return False
+        return response.ok
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff with full jitter, so retrying workers do not stampede together
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _send(self, path, payload, stream=False):
+        """
+        POST a JSON payload, retrying transient failures until a reply arrives.
+        Args:
+            path (str): API path, e.g. "/api/generate".
+            payload (dict): Request body.
+            stream (bool): Return as soon as the headers arrive, leaving the body unread.
+        Returns:
+            requests.Response: The successful reply.
+        Raises:
+            LLMError: If the request still fails after all retries.
+        """
+        url = f"{self.base_url}{path}"
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._sleep_before_retry(attempt - 1)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = e
+                logger.warning("POST %s failed after %.2fs (attempt %d): %s",
+                               url, time.perf_counter() - start, attempt + 1, e)
+                continue
+
+            elapsed = time.perf_counter() - start
+            logger.info("POST %s %d in %.2fs", url, response.status_code, elapsed)
+            if response.status_code in RETRY_STATUSES:
+                response.close()
+                last_error = requests.exceptions.HTTPError(f"{response.status_code} from {url}")
+                continue
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                response.close()
+                raise LLMError(f"Request to {url} failed: {e}") from e
+            return response
+
+        raise LLMError(f"Request to {url} failed after {self.retries + 1} attempts: {last_error}")
+
+    def post(self, path, payload):
+        """
+        POST a JSON payload, retrying transient failures.
+        Args:
+            path (str): API path, e.g. "/api/generate".
+            payload (dict): Request body.
+        Returns:
+            dict: The decoded JSON reply.
+        Raises:
+            LLMError: If the request still fails after all retries.
+        """
+        start = time.perf_counter()
+        try:
+            response = self._send(path, payload)
+            reply = response.json()
+        except LLMError:
+            self._record()
+            raise
+        except ValueError as e:
+            self._record()
+            raise LLMError(f"Invalid JSON from {response.url}: {e}") from e
+        self._record(time.perf_counter() - start)
+        return reply
+
+    def generate(self, model, prompt, options=None, **fields):
+        """
+        Run a non-streaming completion with /api/generate.
+        Args:
+            model (str): Model to use.
+            prompt (str): The input prompt for the model.
+            options (dict): Ollama model options such as num_ctx or temperature.
+            **fields: Additional request fields such as format or keep_alive.
+        Returns:
+            dict: The JSON reply; the generated text is under "response".
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, **fields}
+        if options:
+            payload["options"] = options
+        reply = self.post("/api/generate", payload)
+        self._count_tokens(prompt, reply, reply.get("response", ""))
+        return reply
+
+    def generate_stream(self, model, prompt, options=None, stop_when=None, **fields):
+        """
+        Run a streaming completion and consume the tokens as they arrive.
+
+        When stop_when returns True the connection is closed, which makes Ollama stop
+        generating, so the model does not keep writing after the useful part of its reply.
+        Args:
+            model (str): Model to use.
+            prompt (str): The input prompt for the model.
+            options (dict): Ollama model options such as num_ctx or num_predict.
+            stop_when (callable): Called with each new piece of text; returning True ends the stream.
+            **fields: Additional request fields such as format or keep_alive.
+        Returns:
+            dict: The final streamed message, with the full text under "response" and
+                "stopped_early" set when stop_when ended the stream.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, **fields}
+        if options:
+            payload["options"] = options
+
+        start = time.perf_counter()
+        pieces = []
+        message = {}
+        stopped_early = False
+        try:
+            response = self._send("/api/generate", payload, stream=True)
+        except LLMError:
+            self._record()
+            raise
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise LLMError(f"Stream from {response.url} failed: {message['error']}")
+                piece = message.get("response", "")
+                pieces.append(piece)
+                if stop_when is not None and stop_when(piece):
+                    stopped_early = not message.get("done", False)
+                    break
+                if message.get("done"):
+                    break
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._record()
+            raise LLMError(f"Stream from {response.url} failed: {e}") from e
+        except LLMError:
+            self._record()
+            raise
+        finally:
+            response.close()
+
+        elapsed = time.perf_counter() - start
+        self._record(elapsed)
+        self._count_tokens(prompt, message, "".join(pieces))
+        logger.info("Stream from %s: %d pieces in %.2fs%s", response.url, len(pieces),
+                    elapsed, " (stopped early)" if stopped_early else "")
+        return {**message, "response": "".join(pieces), "stopped_early": stopped_early}
+
+    async def agenerate(self, model, prompt, options=None, **fields):
+        """
+        Async variant of generate. The blocking call runs on the default executor, so it
+        shares this client's connection pool.
+        """
+        return await asyncio.to_thread(self.generate, model, prompt, options, **fields)
+
+    def close(self):
+        self.session.close()
+
+
+class Endpoint:
+    def __init__(self, client):
+        """
+        Initialize the routing state of one server in an EndpointPool.
+        Args:
+            client (OllamaClient): Client for the server.
+        """
+        self.client = client
+        self.outstanding = 0  # Requests in progress
+        self.routed = 0  # Requests sent, including ones that failed over
+        self.failovers = 0  # Requests moved to another endpoint after failing here
+        self.healthy = True
+        self.checked_at = 0.0
+
+
+class EndpointPool:
+    def __init__(self, base_urls, health_interval=DEFAULT_HEALTH_INTERVAL, retries=DEFAULT_ENDPOINT_RETRIES,
+                 **client_options):
+        """
+        Initialize a client that spreads requests over several Ollama servers.
+
+        Each request goes to the healthy endpoint with the fewest requests in progress,
+        so a slow server receives less work. When a request fails after its retries the
+        endpoint is health-checked with GET /api/tags and the request moves on to the next
+        endpoint. Endpoints that fail the check are left out for health_interval seconds,
+        then checked again before they receive requests. The pool offers the same methods
+        as OllamaClient, so agents use either one.
+        Args:
+            base_urls (list): Base URLs of the Ollama servers.
+            health_interval (float): Seconds before an endpoint found down is checked again.
+            retries (int): Retries on one endpoint before failing over.
+            **client_options: Other OllamaClient options, such as read_timeout.
+        """
+        self.endpoints = [Endpoint(OllamaClient(url, retries=retries, **client_options)) for url in base_urls]
+        self.base_url = ",".join(endpoint.client.base_url for endpoint in self.endpoints)
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _check(self, endpoint):
+        # Health-check an endpoint and record the outcome
+        healthy = endpoint.client.check_health()
+        with self._lock:
+            endpoint.healthy = healthy
+            endpoint.checked_at = time.monotonic()
+        if not healthy:
+            logger.warning("Endpoint %s is down; checking again in %ds", endpoint.client.base_url, self.health_interval)
+        return healthy
+
+    def check_health(self):
+        """
+        Check every endpoint now.
+        Returns:
+            dict: Whether each endpoint is up, by base URL.
+        """
+        return {endpoint.client.base_url: self._check(endpoint) for endpoint in self.endpoints}
+
+    def _acquire(self, tried):
+        """
+        Pick the healthy endpoint with the fewest requests in progress and count the request.
+        Args:
+            tried (list): Endpoints the request already failed on.
+        Returns:
+            Endpoint: The chosen endpoint, or None if no untried endpoint is up.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in tried]
+            due = [endpoint for endpoint in candidates
+                   if not endpoint.healthy and now - endpoint.checked_at >= self.health_interval]
+        for endpoint in due:
+            self._check(endpoint)
+        with self._lock:
+            healthy = [endpoint for endpoint in candidates if endpoint.healthy]
+            if not healthy:
+                return None
+            # Ties go to the endpoint used least, so a serial run still rotates over the pool
+            endpoint = min(healthy, key=lambda endpoint: (endpoint.outstanding, endpoint.routed))
+            endpoint.outstanding += 1
+            endpoint.routed += 1
+            return endpoint
+
+    def _route(self, call, can_fail_over=lambda: True):
+        """
+        Run a request on the best endpoint, failing over to the others on error.
+        Args:
+            call (callable): Called with an OllamaClient; performs the request.
+            can_fail_over (callable): Returns False once the request may no longer be repeated.
+        Returns:
+            Whatever call returns.
+        Raises:
+            LLMError: If the request failed on every endpoint that is up.
+        """
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                break
+            tried.append(endpoint)
+            try:
+                return call(endpoint.client)
+            except LLMError as e:
+                last_error = e
+                # A bad request fails everywhere, but a healthy server stays in rotation
+                self._check(endpoint)
+                if not can_fail_over():
+                    raise
+                with self._lock:
+                    endpoint.failovers += 1
+                tracing.count(failovers=1)
+                logger.warning("Request to %s failed, failing over: %s", endpoint.client.base_url, e)
+            finally:
+                with self._lock:
+                    endpoint.outstanding -= 1
+        if last_error is None:
+            raise LLMError(f"No healthy endpoint among {self.base_url}")
+        raise LLMError(f"Request failed on {len(tried)} endpoints; last error: {last_error}") from last_error
+
+    def post(self, path, payload):
+        return self._route(lambda client: client.post(path, payload))
+
+    def generate(self, model, prompt, options=None, **fields):
+        return self._route(lambda client: client.generate(model, prompt, options, **fields))
+
+    def generate_stream(self, model, prompt, options=None, stop_when=None, **fields):
+        # Pieces already handed to stop_when cannot be taken back, so a stream that broke
+        # after its first piece is not repeated on another endpoint
+        received = []
+
+        def watch(piece):
+            received.append(piece)
+            return stop_when is not None and stop_when(piece)
+
+        return self._route(
+            lambda client: client.generate_stream(model, prompt, options, stop_when=watch, **fields),
+            can_fail_over=lambda: not received,
+        )
+
+    async def agenerate(self, model, prompt, options=None, **fields):
+        return await asyncio.to_thread(self.generate, model, prompt, options, **fields)
+
+    def stats(self):
+        """
+        Return call counts and latency percentiles over all endpoints; failed attempts
+        that were failed over count as failures.
+        Returns:
+            dict: calls, failures, and p50/p95/max latency in seconds.
+        """
+        latencies = []
+        failures = 0
+        for endpoint in self.endpoints:
+            with endpoint.client._stats_lock:
+                latencies.extend(endpoint.client.latencies)
+                failures += endpoint.client.failures
+        return summarize_latencies(latencies, failures)
+
+    def endpoint_stats(self):
+        """
+        Return the statistics of each endpoint.
+        Returns:
+            dict: Per base URL, OllamaClient.stats() plus 'healthy', 'outstanding', 'routed' and 'failovers'.
+        """
+        stats = {}
+        for endpoint in self.endpoints:
+            with self._lock:
+                state = {"healthy": endpoint.healthy, "outstanding": endpoint.outstanding,
+                         "routed": endpoint.routed, "failovers": endpoint.failovers}
+            stats[endpoint.client.base_url] = {**endpoint.client.stats(), **state}
+        return stats
+
+    def reset_stats(self):
+        for endpoint in self.endpoints:
+            endpoint.client.reset_stats()
+        with self._lock:
+            for endpoint in self.endpoints:
+                endpoint.routed = 0
+                endpoint.failovers = 0
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+
+def configured_endpoints():
+    """
+    Return the Ollama servers configured in the environment (or .env):
+    OLLAMA_ENDPOINTS, either comma-separated base URLs or the path of a JSON file listing
+    them; otherwise OLLAMA_BASE_URL; otherwise the local default server.
+    Returns:
+        list: Base URLs.
+    """
+    value = os.getenv("OLLAMA_ENDPOINTS", "").strip()
+    if value and os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            urls = json.load(f)
+    else:
+        urls = value.split(",")
+    urls = [url.strip() for url in urls if url.strip()]
+    return urls or [os.getenv("OLLAMA_BASE_URL", DEFAULT_BASE_URL)]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=None):
+    """
+    Return the client shared by all agents talking to a server, or to a pool of servers.
+    Args:
+        base_url (str): Base URL of the Ollama server, or several separated by commas.
+            Defaults to configured_endpoints().
+    Returns:
+        OllamaClient or EndpointPool: Shared client; a pool when there are several servers.
+    """
+    if base_url is None:
+        base_url = ",".join(configured_endpoints())
+    with _clients_lock:
+        if base_url not in _clients:
+            urls = [url.strip() for url in base_url.split(",") if url.strip()]
+            _clients[base_url] = OllamaClient(urls[0]) if len(urls) == 1 else EndpointPool(urls)
+        return _clients[base_url]
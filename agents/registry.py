@@ -0,0 +1,140 @@
+import time
+import importlib
+import threading
+
+# Agents that can be run, by name: (module, class, chunked). Chunked agents split the paper
+# and take a map_chunks function; the others send the whole paper in one request.
+AGENT_SPECS = {
+    "coherence": ("agents.Coherence_agent", "CoherenceAgent", True),
+    "ethics": ("agents.Ethics_agent", "EthicsAgent", False),
+    "novelty": ("agents.Novelty_agent", "NoveltyAgent", False),
+    "writing_quality": ("agents.Writing_quality_agent", "WritingQualityAgent", False),
+    "relevance": ("agents.Relevance_agent", "RelevanceAgent", False),
+    "research_quality": ("agents.Research_quality_agent", "ResearchQualityAgent", False),
+    "publishability": ("agents.Publishability_agent", "PublishabilityAgent", False),
+    "fused": ("agents.Fused_agent", "FusedAgent", True),
+}
+DEFAULT_AGENTS = ("coherence",)  # Agents run by main.py when --agents is not given
+
+
+class AgentRegistry:
+    def __init__(self, specs=None, **options):
+        """
+        Build agents on first use. An agent's module, and the HTTP client, response cache
+        and other dependencies it pulls in, are only imported when the agent is first needed,
+        so runs that use a few agents do not pay for the others.
+        Args:
+            specs (dict): Agents by name, as (module, class, chunked). Defaults to AGENT_SPECS.
+            **options: Keyword arguments passed to every agent's constructor, e.g. cache or client.
+        """
+        self.specs = dict(AGENT_SPECS if specs is None else specs)
+        self.options = options
+        self.build_times = {}  # Seconds spent importing and constructing each agent
+        self._agents = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def register(self, name, module, class_name, chunked=False):
+        """
+        Make an agent available under a name.
+        Args:
+            name (str): Name used on the command line and as the result key.
+            module (str): Module defining the agent class, imported on first use.
+            class_name (str): Name of the agent class.
+            chunked (bool): Whether analyze takes a map_chunks function.
+        """
+        with self._lock:
+            self.specs[name] = (module, class_name, chunked)
+            self._agents.pop(name, None)
+
+    def names(self):
+        """
+        Return the names of the available agents.
+        Returns:
+            list: Agent names, in registration order.
+        """
+        return list(self.specs)
+
+    def select(self, value):
+        """
+        Parse a comma-separated list of agent names, e.g. from --agents.
+        Args:
+            value (str): Agent names separated by commas.
+        Returns:
+            list: The names, without duplicates.
+        Raises:
+            ValueError: If a name is not registered or the list is empty.
+        """
+        names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.specs]
+        if unknown or not names:
+            raise ValueError(f"Unknown agents: {', '.join(unknown) or '(none given)'}; "
+                             f"choose from {', '.join(self.specs)}")
+        return names
+
+    def is_chunked(self, name):
+        """
+        Tell whether an agent evaluates papers chunk by chunk.
+        Args:
+            name (str): Agent name.
+        Returns:
+            bool: True if the agent's analyze takes a map_chunks function.
+        """
+        return self.specs[name][2]
+
+    def on_build(self, callback):
+        """
+        Call a function on every agent once it is built, e.g. to apply command-line settings.
+        Agents built already are passed to it straight away.
+        Args:
+            callback (callable): Called with (name, agent).
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+            built = list(self._agents.items())
+        for name, agent in built:
+            callback(name, agent)
+
+    def get(self, name):
+        """
+        Return an agent, importing and constructing it on first use.
+        Args:
+            name (str): Agent name.
+        Returns:
+            The agent instance, shared by all callers.
+        Raises:
+            KeyError: If no agent is registered under that name.
+        """
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            # Papers are evaluated concurrently; only the first caller builds the agent
+            if name not in self._agents:
+                module, class_name, _ = self.specs[name]
+                start = time.perf_counter()
+                agent = getattr(importlib.import_module(module), class_name)(**self.options)
+                for callback in self._callbacks:
+                    callback(name, agent)
+                self.build_times[name] = time.perf_counter() - start
+                self._agents[name] = agent
+            return self._agents[name]
+
+    def set(self, name, agent):
+        """
+        Use an existing agent instead of building one, e.g. one pointed at a mock server.
+        Args:
+            name (str): Agent name.
+            agent: The agent instance.
+        """
+        with self._lock:
+            self._agents[name] = agent
+
+    def built(self):
+        """
+        Return the agents built so far.
+        Returns:
+            dict: Agent instance by name.
+        """
+        with self._lock:
+            return dict(self._agents)
@@ -0,0 +1,255 @@
+import re
+import json
+import threading
+
+
+class JSONObjectDetector:
+    def __init__(self, required_keys=("score", "explanation")):
+        """
+        Initialize a detector that finds the first complete JSON object in text that
+        arrives piece by piece, e.g. streamed tokens.
+
+        The detector keeps track of brace depth and string state across pieces, so each
+        character is scanned once no matter how many pieces the text arrives in.
+        Args:
+            required_keys (tuple): Keys an object must contain to be accepted.
+        """
+        self.required_keys = required_keys
+        self.buffer = ""
+        self.result = None
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece):
+        """
+        Add text and scan it.
+        Args:
+            piece (str): Next piece of the text.
+        Returns:
+            dict: The first complete object with the required keys, or None if there is none yet.
+        """
+        if self.result is not None:
+            return self.result
+        self.buffer += piece
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._depth:
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.result = self._accept(self.buffer[self._start:self._pos])
+                    if self.result is not None:
+                        return self.result
+        return None
+
+    def _accept(self, candidate):
+        # Return the candidate object if it parses and has the required keys
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            return None
+        if isinstance(value, dict) and all(key in value for key in self.required_keys):
+            return value
+        return None
+
+
+class ResponseParseError(ValueError):
+    """
+    Raised when no score can be extracted from a model reply.
+    """
+
+
+# JSON schema for score replies, sent to Ollama as the "format" of schema-constrained requests
+SCORE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"},
+        "explanation": {"type": "string"},
+    },
+    "required": ["score", "explanation"],
+}
+
+# Prompt for the repair retry: short, and without the paper text, so it is cheap
+REPAIR_PROMPT = (
+    "Rewrite the following evaluation as a JSON object with the keys \"score\" "
+    "(a number between 0 and 1) and \"explanation\" (a string). Output only the JSON object.\n\n"
+    "Evaluation:\n{reply}"
+)
+REPAIR_MAX_TOKENS = 256
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_SCORE_PATTERN = re.compile(r"\**score\**\s*[:=]\s*\**\s*([0-9]*\.?[0-9]+)", re.IGNORECASE)
+_EXPLANATION_PATTERN = re.compile(r"\**explanation\**\s*[:=]\s*(.*)", re.IGNORECASE | re.DOTALL)
+
+
+def _normalise(value):
+    # Coerce a parsed object into {"score": float in [0, 1], "explanation": str}
+    try:
+        score = float(value.get("score"))
+    except (TypeError, ValueError):
+        raise ResponseParseError(f"Score is not a number: {value.get('score')!r}")
+    explanation = value.get("explanation", "No explanation provided.")
+    if isinstance(explanation, (list, tuple)):
+        explanation = "\n".join(str(item) for item in explanation)
+    return {"score": min(max(score, 0.0), 1.0), "explanation": str(explanation).strip()}
+
+
+def parse_score_response(reply):
+    """
+    Extract the score and explanation from a model reply.
+
+    Handles bare JSON, ```json fenced blocks, prose before or after the object,
+    list-valued explanations and, as a last resort, "Score: ... Explanation: ..." text.
+    Args:
+        reply (str): Raw text of the model's reply.
+    Returns:
+        dict: Parsed response with 'score' and 'explanation'.
+    Raises:
+        ResponseParseError: If no score can be found.
+    """
+    if not reply or not reply.strip():
+        raise ResponseParseError("Empty response.")
+
+    candidates = _FENCE_PATTERN.findall(reply) + [reply]
+    for required_keys in (("score", "explanation"), ("score",)):
+        for candidate in candidates:
+            value = JSONObjectDetector(required_keys).feed(candidate)
+            if value is not None:
+                return _normalise(value)
+
+    score_match = _SCORE_PATTERN.search(reply)
+    if score_match:
+        explanation_match = _EXPLANATION_PATTERN.search(reply)
+        return _normalise({
+            "score": score_match.group(1),
+            "explanation": explanation_match.group(1) if explanation_match else reply,
+        })
+
+    raise ResponseParseError(f"No score found in the response: {reply[:200]!r}")
+
+
+def parse_multi_score_response(reply, criteria):
+    """
+    Extract one score and explanation per criterion from a reply of the form
+    {"<criterion>": {"score": ..., "explanation": ...}, ...}.
+    Args:
+        reply (str): Raw text of the model's reply.
+        criteria (tuple): Names of the criteria that must all be present.
+    Returns:
+        dict: Mapping of criterion to parsed {'score', 'explanation'}.
+    Raises:
+        ResponseParseError: If the object or one of its scores cannot be found.
+    """
+    if not reply or not reply.strip():
+        raise ResponseParseError("Empty response.")
+    for candidate in _FENCE_PATTERN.findall(reply) + [reply]:
+        value = JSONObjectDetector(tuple(criteria)).feed(candidate)
+        if value is not None:
+            if not all(isinstance(value[criterion], dict) for criterion in criteria):
+                raise ResponseParseError(f"Expected an object per criterion: {reply[:200]!r}")
+            return {criterion: _normalise(value[criterion]) for criterion in criteria}
+    raise ResponseParseError(f"No scores for {', '.join(criteria)} found in the response: {reply[:200]!r}")
+
+
+class ParseStats:
+    def __init__(self):
+        """
+        Initialize thread-safe counters of parse outcomes over a run.
+        """
+        self.counts = {"parsed": 0, "repaired": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def summary(self):
+        """
+        Return the parse counters and the success rate.
+        Returns:
+            dict: Counts per outcome, total and success_rate.
+        """
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        succeeded = counts["parsed"] + counts["repaired"]
+        return {**counts, "total": total, "success_rate": succeeded / total if total else 1.0}
+
+
+# Parse outcomes of every agent in this process
+PARSE_STATS = ParseStats()
+
+
+def parse_with_repair(reply, repair=None, stats=PARSE_STATS, parse=parse_score_response,
+                      repair_prompt=REPAIR_PROMPT):
+    """
+    Parse a reply, asking the model to reformat it only if parsing fails.
+    Args:
+        reply (str): Raw text of the model's reply.
+        repair (callable): Optional function taking the repair prompt and returning the
+            model's new reply.
+        stats (ParseStats): Counters to update.
+        parse (callable): Parser applied to the reply; raises ResponseParseError on failure.
+        repair_prompt (str): Template of the repair prompt, with a {reply} placeholder.
+    Returns:
+        dict: Parsed response, as returned by parse.
+    Raises:
+        ResponseParseError: If the reply cannot be parsed, even after the repair retry.
+    """
+    try:
+        result = parse(reply)
+    except ResponseParseError as e:
+        if repair is None or not reply or not reply.strip():
+            stats.record("failed")
+            raise
+        error = e
+    else:
+        stats.record("parsed")
+        return result
+
+    try:
+        result = parse(repair(repair_prompt.format(reply=reply)))
+    except Exception as e:
+        stats.record("failed")
+        raise ResponseParseError(f"{error} Repair failed: {e}") from e
+    stats.record("repaired")
+    return result
+
+
+def make_repair(client, model, cache, options=None):
+    """
+    Build the repair function used by parse_with_repair for an agent's model.
+    Repair requests are short, JSON-constrained and cached like any other request.
+    Args:
+        client (OllamaClient): HTTP client.
+        model (str): Model to use.
+        cache (LLMCache): Response cache.
+        options (dict): The agent's model options; num_predict is lowered for repairs.
+    Returns:
+        callable: Function taking a repair prompt and returning the model's reply text.
+    """
+    repair_options = {**(options or {}), "num_predict": REPAIR_MAX_TOKENS}
+
+    def repair(prompt):
+        return cache.get_or_call(
+            model, prompt, {**repair_options, "format": "json"},
+            lambda: client.generate(model, prompt, options=repair_options, format="json").get("response", "")
+        )
+
+    return repair
@@ -0,0 +1,312 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Default concurrency settings
+DEFAULT_MAX_IN_FLIGHT = 4  # Maximum number of LLM calls in flight across all backends
+DEFAULT_BACKEND_LIMIT = 2  # Maximum number of LLM calls in flight per backend
+DEFAULT_MAX_PAPERS = 4  # Number of papers evaluated at the same time
+
+# Adaptive (AIMD) limiter settings
+DEFAULT_LATENCY_TOLERANCE = 2.0  # Without a latency target, calls slower than this times the fastest call back off
+DEFAULT_DECREASE_FACTOR = 0.7  # Multiplicative decrease of the limit on a slow call
+
+
+class BackendSaturated(RuntimeError):
+    """
+    Raised when a backend has too many calls waiting, or a call waited too long for a slot.
+    """
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=DEFAULT_BACKEND_LIMIT, min_limit=1, max_limit=DEFAULT_MAX_IN_FLIGHT,
+                 target_latency=None, latency_tolerance=DEFAULT_LATENCY_TOLERANCE,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR, max_queue=None, max_wait=None):
+        """
+        Initialize a concurrency limit for one backend that adapts to its latency (AIMD).
+
+        Every call that finishes within the latency target raises the limit by 1/limit, so
+        the limit grows by about one per round of calls. A slower call multiplies it by
+        decrease_factor, at most once per call duration, so one burst of slow replies counts
+        as one congestion signal. The limit settles just below the point where the server
+        starts queueing requests.
+        Args:
+            initial (int): Starting limit.
+            min_limit (int): Lowest limit.
+            max_limit (int): Highest limit.
+            target_latency (float): Seconds a call may take before it counts as congestion.
+                Defaults to latency_tolerance times the fastest call seen so far.
+            latency_tolerance (float): Multiple of the fastest call used when target_latency is None.
+            decrease_factor (float): Factor applied to the limit on congestion.
+            max_queue (int): Callers allowed to wait for a slot; more raise BackendSaturated.
+            max_wait (float): Seconds a caller may wait for a slot before BackendSaturated is raised.
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.fastest = None
+        self.history = []  # Limit after every completed call
+        self.rejected = 0
+        self.decreases = 0
+        self.peak_in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a slot under the current limit.
+        Raises:
+            BackendSaturated: If the wait queue is full or the wait exceeds max_wait.
+        """
+        with self._condition:
+            if self.max_queue is not None and self.in_flight >= int(self.limit) and self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise BackendSaturated(f"{self.waiting} calls already waiting for the backend")
+            self.waiting += 1
+            try:
+                if not self._condition.wait_for(lambda: self.in_flight < int(self.limit), self.max_wait):
+                    self.rejected += 1
+                    raise BackendSaturated(f"No backend slot within {self.max_wait}s")
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, latency, failed=False):
+        """
+        Free a slot and adapt the limit to how the call went.
+        Args:
+            latency (float): Seconds the call took.
+            failed (bool): Whether the call raised; failures count as congestion.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if not failed:
+                self.fastest = latency if self.fastest is None else min(self.fastest, latency)
+            target = self.target_latency
+            if target is None and self.fastest is not None:
+                target = self.fastest * self.latency_tolerance
+            now = time.monotonic()
+            if failed or (target is not None and latency > target):
+                if now - self._last_decrease > latency:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.decreases += 1
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.history.append(self.limit)
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Summarise the limiter.
+        Returns:
+            dict: Current limit, the limit it settled on (mean over the second half of the
+                calls), peak concurrency, calls, decreases and rejected calls.
+        """
+        with self._condition:
+            history = list(self.history)
+            settled = history[len(history) // 2:]
+            return {
+                "limit": self.limit,
+                "settled_limit": sum(settled) / len(settled) if settled else self.limit,
+                "peak_in_flight": self.peak_in_flight,
+                "calls": len(history),
+                "decreases": self.decreases,
+                "rejected": self.rejected,
+                "fastest_call": self.fastest,
+            }
+
+
+class EvaluationEngine:
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, backend_limits=None,
+                 default_backend_limit=DEFAULT_BACKEND_LIMIT, max_papers=DEFAULT_MAX_PAPERS,
+                 adaptive=False, target_latency=None, max_queue=None, max_wait=None):
+        """
+        Initialize the EvaluationEngine.
+
+        Papers, agents and chunks each run on their own thread pool so that a task
+        waiting on its children never starves the pool those children run on. The
+        number of LLM calls actually in flight is bounded by a global semaphore and
+        by one semaphore per backend. Tasks run in a copy of the submitting thread's
+        context, so tracing spans nest across the pools.
+
+        In adaptive mode each backend gets an AdaptiveLimiter instead of a fixed
+        semaphore. It starts at the backend's limit, can grow up to max_in_flight, and
+        backs off when calls get slow.
+        Args:
+            max_in_flight (int): Global cap on concurrent LLM calls.
+            backend_limits (dict): Optional per-backend limits, keyed by backend name (base URL).
+            default_backend_limit (int): Limit used for backends not listed in backend_limits.
+            max_papers (int): Number of papers evaluated concurrently.
+            adaptive (bool): Adapt each backend's limit to its latency.
+            target_latency (float): Adaptive mode: seconds a call may take before the limit backs off.
+            max_queue (int): Adaptive mode: calls allowed to wait per backend before BackendSaturated.
+            max_wait (float): Adaptive mode: seconds a call may wait for a slot before BackendSaturated.
+        """
+        self.max_in_flight = max_in_flight
+        self.backend_limits = dict(backend_limits or {})
+        self.default_backend_limit = default_backend_limit
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._global_slots = threading.BoundedSemaphore(max_in_flight)
+        self._backend_slots = {}
+        self._lock = threading.Lock()
+
+        self._paper_pool = ThreadPoolExecutor(max_workers=max_papers, thread_name_prefix="paper")
+        self._agent_pool = ThreadPoolExecutor(max_workers=max_papers * 4, thread_name_prefix="agent")
+        self._chunk_pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="chunk")
+
+    def _backend_semaphore(self, backend):
+        """
+        Return the semaphore or adaptive limiter guarding a backend, creating it on first use.
+        Args:
+            backend (str): Backend name.
+        Returns:
+            threading.BoundedSemaphore or AdaptiveLimiter: Slots for the backend.
+        """
+        with self._lock:
+            if backend not in self._backend_slots:
+                limit = self.backend_limits.get(backend, self.default_backend_limit)
+                if self.adaptive:
+                    self._backend_slots[backend] = AdaptiveLimiter(
+                        initial=limit, max_limit=max(limit, self.max_in_flight), target_latency=self.target_latency,
+                        max_queue=self.max_queue, max_wait=self.max_wait,
+                    )
+                else:
+                    self._backend_slots[backend] = threading.BoundedSemaphore(limit)
+            return self._backend_slots[backend]
+
+    @contextmanager
+    def limit(self, backend):
+        """
+        Hold one global slot and one backend slot for the duration of an LLM call. The backend
+        slot is taken first, so calls waiting on a busy backend do not hold global slots that
+        calls to idle backends could use.
+        Args:
+            backend (str): Backend name.
+        Raises:
+            BackendSaturated: In adaptive mode, if the backend's queue is full or the wait too long.
+        """
+        backend_slots = self._backend_semaphore(backend)
+        if not self.adaptive:
+            with backend_slots, self._global_slots:
+                yield
+            return
+
+        backend_slots.acquire()
+        start = time.perf_counter()
+        failed = True
+        try:
+            with self._global_slots:
+                # Time the call itself, not the wait for a global slot
+                start = time.perf_counter()
+                yield
+            failed = False
+        finally:
+            backend_slots.release(time.perf_counter() - start, failed)
+
+    def call(self, backend, fn, *args, **kwargs):
+        """
+        Run a single LLM-bound call under the concurrency limits.
+        Args:
+            backend (str): Backend name.
+            fn (callable): Function performing the call.
+        Returns:
+            Whatever fn returns.
+        """
+        with self.limit(backend):
+            return fn(*args, **kwargs)
+
+    def _submit(self, pool, fn, *args):
+        # Run fn on the pool in a copy of the current context (one copy per task)
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+
+    def _call_or_skip(self, backend, fn, item):
+        # Run one chunk, or return None if the backend is saturated
+        try:
+            return self.call(backend, fn, item)
+        except BackendSaturated:
+            return None
+
+    def map_chunks(self, backend, fn, items, skip_saturated=False, window=None):
+        """
+        Apply an LLM-bound function to each item concurrently.
+
+        Items are pulled from the iterable only as slots free up, at most `window` ahead
+        of the oldest unfinished one, so a lazily produced sequence of chunks is never
+        held in memory all at once.
+        Args:
+            backend (str): Backend name.
+            fn (callable): Function called once per item.
+            items (iterable): Items to process.
+            skip_saturated (bool): Return None for items the saturated backend could not take,
+                instead of raising BackendSaturated.
+            window (int): Items submitted but not yet collected. Defaults to twice max_in_flight,
+                which keeps every slot busy.
+        Returns:
+            list: Results in the same order as items.
+        """
+        call = self._call_or_skip if skip_saturated else self.call
+        window = window or 2 * self.max_in_flight
+        pending = deque()
+        results = []
+        for item in items:
+            if len(pending) >= window:
+                results.append(pending.popleft().result())
+            pending.append(self._submit(self._chunk_pool, call, backend, fn, item))
+        results.extend(future.result() for future in pending)
+        return results
+
+    def run_agents(self, jobs):
+        """
+        Run several agent jobs for the same paper concurrently.
+        Args:
+            jobs (dict): Mapping of agent name to a zero-argument callable.
+        Returns:
+            dict: Mapping of agent name to result, in the same key order as jobs.
+        """
+        futures = {name: self._submit(self._agent_pool, job) for name, job in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def map_papers(self, fn, items):
+        """
+        Apply a per-paper function to each item concurrently.
+        Args:
+            fn (callable): Function called once per paper.
+            items (iterable): Papers to process.
+        Returns:
+            list: Results in the same order as items.
+        """
+        futures = [self._submit(self._paper_pool, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    def backend_stats(self):
+        """
+        Return the adaptive limiter statistics of every backend used so far.
+        Returns:
+            dict: AdaptiveLimiter.stats() per backend; empty unless the engine is adaptive.
+        """
+        with self._lock:
+            slots = dict(self._backend_slots)
+        return {backend: limiter.stats() for backend, limiter in slots.items() if isinstance(limiter, AdaptiveLimiter)}
+
+    def shutdown(self):
+        """
+        Shut down all thread pools.
+        """
+        for pool in (self._paper_pool, self._agent_pool, self._chunk_pool):
+            pool.shutdown(wait=True)
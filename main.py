@@ -1,81 +1,602 @@
 import os
-import json
-from agents.Coherence_agent import CoherenceAgent
-from agents.Ethics_agent import EthicsAgent
-from agents.Novelty_agent import NoveltyAgent
+import time
+import logging
+import argparse
+from functools import partial
+from agents.registry import AgentRegistry, DEFAULT_AGENTS
+from agents.llm_cache import get_default_cache
+from agents.chunking import FileText
+from agents.response_parser import PARSE_STATS, SCORE_SCHEMA
+from scripts.pipeline_manifest import PipelineManifest, CheckpointLog, file_hash, text_hash
+from scripts.preprocess_text import load_section_index, read_sections
+from scripts.corpus import add_selection_arguments, select_papers
+from scripts.results_store import ResultsStore, STORE_PATH
+from scripts.scoring import combine_scores, load_scoring
+import tracing
+from engine import EvaluationEngine, BackendSaturated, DEFAULT_MAX_IN_FLIGHT, DEFAULT_BACKEND_LIMIT, DEFAULT_MAX_PAPERS
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialize agents
-coherence_agent = CoherenceAgent()
-ethics_agent = EthicsAgent()
-novelty_agent = NoveltyAgent()
+# Agents are built on first use, so only the agents a run selects are imported and constructed
+agents = AgentRegistry()
 
 # Define directories
 preprocessed_dir = "Data/preprocessed_text"
-output_file = "Data/evaluation_results.json"
+checkpoint_file = "Data/evaluation_results.jsonl"
+manifest_file = "Data/pipeline_manifest.json"
 
-# Define scoring thresholds (based on labeled data insights)
-PUBLISHABLE_THRESHOLD = 0.75  # Minimum average score required for publishability
+# Bump when prompts, agents or scoring change so that checkpointed results are re-evaluated
+EVALUATION_VERSION = "4"
 
-def evaluate_paper(file_path):
+# Sections each whole-paper agent reads, from the section index written by preprocess_text.
+# Agents not listed, and papers where none of the sections was found, get the whole text.
+SECTION_ROUTES = {
+    "novelty": ("Abstract", "Introduction"),
+    "ethics": ("Methodology",),
+    "relevance": ("Abstract", "Introduction", "Conclusion"),
+    "research_quality": ("Methodology", "Results", "Discussion"),
+    "writing_quality": ("Abstract", "Introduction", "Conclusion"),
+}
+
+# Criterion weights and the minimum combined score required for publishability,
+# from Data/scoring.json when scripts/rescore.py --calibrate has written it
+CRITERION_WEIGHTS, PUBLISHABLE_THRESHOLD = load_scoring()
+
+def traced_agent(name, fn, *args, **kwargs):
+    """
+    Run an agent inside an "agent" tracing span.
+    Args:
+        name (str): Agent name.
+        fn (callable): The agent's analyze method.
+    Returns:
+        Whatever fn returns.
+    """
+    with tracing.span("agent", agent=name):
+        return fn(*args, **kwargs)
+
+def run_agents(text, engine=None, fused=False, paper=None, names=DEFAULT_AGENTS, routed_texts=None):
+    """
+    Run the selected agents on a paper.
+    Args:
+        text (str or FileText): Preprocessed text of the paper.
+        engine (EvaluationEngine): Optional engine used to run agents and chunks concurrently.
+            When omitted the agents run one after another.
+        fused (bool): Score coherence, ethics and novelty together with one request per chunk.
+        paper (str): Name of the paper, used to leave it out of its own novelty and plagiarism comparisons.
+        names (list): Agents to run, by registry name. Ignored in fused mode.
+        routed_texts (dict): Text to send instead of the whole paper, by agent name.
+    Returns:
+        dict: Result of each agent, keyed by agent name. Agents skipped because their backend was
+            saturated get a score of None and 'skipped': True.
+    """
+    routed_texts = routed_texts or {}
+    if fused:
+        fused_agent = agents.get("fused")
+        map_chunks = map if engine is None else partial(
+            engine.map_chunks, fused_agent.base_url, skip_saturated=engine.adaptive
+        )
+        return traced_agent("fused", fused_agent.analyze, text, map_chunks=map_chunks)
+
+    def run_agent(name):
+        agent = agents.get(name)
+        try:
+            if agents.is_chunked(name):
+                map_chunks = map if engine is None else partial(
+                    engine.map_chunks, agent.base_url, skip_saturated=engine.adaptive
+                )
+                return traced_agent(name, agent.analyze, text, map_chunks=map_chunks)
+            # The other agents send their sections, or the whole paper, in one request
+            whole_text = routed_texts.get(name) or (text if isinstance(text, str) else text.read())
+            if engine is None:
+                return traced_agent(name, agent.analyze, whole_text, exclude=paper)
+            # Only the model call takes an engine slot; corpus lookups and parsing run outside it
+            return traced_agent(name, agent.analyze_many, [whole_text], [paper],
+                                map_calls=partial(engine.map_chunks, agent.base_url))[0]
+        except BackendSaturated as e:
+            # Like a skipped chunk, a skipped agent is left out of the combined score
+            return {"score": None, "skipped": True, "explanation": f"Skipped, the LLM backend was saturated ({e})."}
+
+    if engine is None:
+        return {name: run_agent(name) for name in names}
+    return engine.run_agents({name: partial(run_agent, name) for name in names})
+
+def evaluate_paper(file_path, engine=None, fused=False, stream_text=False, names=DEFAULT_AGENTS,
+                   routes=SECTION_ROUTES):
     """
-    Evaluate a single research paper using all agents.
+    Evaluate a single research paper using the selected agents.
     Args:
         file_path (str): Path to the preprocessed text file.
+        engine (EvaluationEngine): Optional engine used to run agents and chunks concurrently.
+        fused (bool): Score all criteria with one request per chunk.
+        stream_text (bool): Read the paper lazily in blocks, so memory is bounded by the chunk size.
+        names (list): Agents to run, by registry name.
+        routes (dict): Sections read by each agent; agents not listed get the whole text.
     Returns:
         dict: Evaluation results from all agents.
     """
-    with open(file_path, "r", encoding="utf-8") as file:
-        text = file.read()
+    with tracing.span("paper", filename=os.path.basename(file_path)):
+        if stream_text:
+            # The chunked agents pull chunks from the file as they evaluate them
+            text = FileText(file_path)
+        else:
+            with open(file_path, "r", encoding="utf-8") as file:
+                text = file.read()
 
-    # Run agents
-    coherence_result = coherence_agent.analyze(text)
-    # ethics_result = ethics_agent.analyze(text)
-    # novelty_result = novelty_agent.analyze(text)
+        routed_texts = {}
+        routed = [name for name in names if name in routes and not fused]
+        if routed:
+            with tracing.span("sections"):
+                index = load_section_index(file_path)
+                routed_texts = {name: read_sections(file_path, index, routes[name]) for name in routed}
 
-    # Combine results
-    combined_score = (
-        coherence_result["score"] 
-        # ethics_result["score"] +
-        # novelty_result["score"]
-    ) / 3  # Average score
+        # Run agents
+        agent_results = run_agents(text, engine, fused, os.path.splitext(os.path.basename(file_path))[0], names,
+                                   routed_texts)
 
-    # Determine publishability
-    is_publishable = combined_score >= PUBLISHABLE_THRESHOLD
+        with tracing.span("aggregate"):
+            # Weighted mean over the agents that were run and not skipped
+            scores = {name: result["score"] for name, result in agent_results.items() if result["score"] is not None}
+            if not scores:
+                raise BackendSaturated("Every agent was skipped")
+            combined_score = combine_scores(scores, CRITERION_WEIGHTS)
+
+            # Determine publishability
+            is_publishable = combined_score >= PUBLISHABLE_THRESHOLD
 
     return {
         "filename": os.path.basename(file_path),
-        "coherence": coherence_result,
-        # "ethics": ethics_result,
-        # "novelty": novelty_result,
+        # One result per agent that was run
+        **agent_results,
         "average_score": combined_score,
         "is_publishable": is_publishable
     }
 
+def paper_fingerprint(file_path, fused=False, names=DEFAULT_AGENTS, routes=SECTION_ROUTES):
+    """
+    Fingerprint a paper's text together with the evaluation settings.
+    Args:
+        file_path (str): Path to the preprocessed text file.
+        fused (bool): Whether the paper is evaluated in fused mode.
+        names (list): Agents the paper is evaluated with, outside fused mode.
+        routes (dict): Sections read by each agent.
+    Returns:
+        str: Hex digest that changes whenever the paper or the evaluation changes.
+    """
+    if fused:
+        agents_used = "fused"
+    else:
+        # An agent reading other sections gives another result
+        agents_used = ",".join(
+            name + (f"[{'+'.join(routes[name])}]" if name in routes else "") for name in sorted(names)
+        )
+    return text_hash(EVALUATION_VERSION, agents_used, file_hash(file_path))
+
+def safe_evaluate(file_path, engine=None, on_result=None, fused=False, stream_text=False, names=DEFAULT_AGENTS,
+                  routes=SECTION_ROUTES):
+    """
+    Evaluate a paper, reporting errors instead of raising them.
+    Args:
+        file_path (str): Path to the preprocessed text file.
+        engine (EvaluationEngine): Optional engine used to run agents and chunks concurrently.
+        on_result (callable): Optional callback called with (file_path, evaluation) as soon
+            as the paper is evaluated, e.g. to checkpoint it.
+        fused (bool): Score all criteria with one request per chunk.
+        stream_text (bool): Read the paper lazily in blocks, so memory is bounded by the chunk size.
+        names (list): Agents to run, by registry name.
+        routes (dict): Sections read by each agent; agents not listed get the whole text.
+    Returns:
+        dict: Evaluation results, or None if the evaluation failed.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        print(f"Evaluating {filename}...")
+        evaluation = evaluate_paper(file_path, engine, fused, stream_text, names, routes)
+    except Exception as e:
+        print(f"Error evaluating {filename}: {e}")
+        return None
+    if on_result is not None:
+        on_result(file_path, evaluation)
+    return evaluation
+
+def evaluate_papers(file_paths, engine=None, on_result=None, fused=False, stream_text=False, names=DEFAULT_AGENTS,
+                    routes=SECTION_ROUTES):
+    """
+    Evaluate several papers, serially or on the evaluation engine.
+    Args:
+        file_paths (list): Paths to the preprocessed text files.
+        engine (EvaluationEngine): Optional engine used to evaluate papers concurrently.
+        on_result (callable): Optional callback called with (file_path, evaluation) per paper.
+        fused (bool): Score all criteria with one request per chunk.
+        stream_text (bool): Read the paper lazily in blocks, so memory is bounded by the chunk size.
+        names (list): Agents to run, by registry name.
+        routes (dict): Sections read by each agent; agents not listed get the whole text.
+    Returns:
+        list: Evaluation results in the same order as file_paths, skipping failed papers.
+    """
+    evaluate = partial(safe_evaluate, engine=engine, on_result=on_result, fused=fused, stream_text=stream_text,
+                       names=names, routes=routes)
+    if engine is None:
+        evaluations = [evaluate(path) for path in file_paths]
+    else:
+        evaluations = engine.map_papers(evaluate, file_paths)
+    return [evaluation for evaluation in evaluations if evaluation is not None]
+
+def triage_papers(file_paths, model, low, high):
+    """
+    Classify papers with the local triage model and pick out those that still need the agents.
+    Args:
+        file_paths (list): Paths to the preprocessed text files.
+        model (TriageModel): Trained triage model.
+        low (float): Probability at or below which a paper is non-publishable without LLM evaluation.
+        high (float): Probability at or above which a paper is publishable without LLM evaluation.
+    Returns:
+        tuple: (triage, uncertain) where triage maps every path to its triage dict and
+            uncertain lists the paths left for the agents, in order.
+    """
+    triage = {}
+    uncertain = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as file:
+            decision, probability = model.triage(file.read(), low, high)
+        triage[file_path] = {"decision": decision, "probability": probability}
+        if decision == "uncertain":
+            uncertain.append(file_path)
+    return triage, uncertain
+
+def parse_backend_limits(values):
+    """
+    Parse "--backend-limit URL=N" arguments.
+    Args:
+        values (list): List of "backend=limit" strings.
+    Returns:
+        dict: Mapping of backend to limit.
+    """
+    limits = {}
+    for value in values or []:
+        backend, _, limit = value.rpartition("=")
+        limits[backend] = int(limit)
+    return limits
+
+def endpoint_pools():
+    """
+    Return the endpoint pools used by the agents built so far.
+    Returns:
+        list: Distinct EndpointPool instances.
+    """
+    # Already imported by the agents that were built
+    from agents.llm_client import EndpointPool
+
+    pools = []
+    for agent in agents.built().values():
+        if isinstance(agent.client, EndpointPool) and agent.client not in pools:
+            pools.append(agent.client)
+    return pools
+
+def add_evaluation_arguments(parser):
+    """
+    Add the options controlling how papers are evaluated, shared by main.py and pipeline.py.
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend.
+    """
+    parser.add_argument("--serial", action="store_true", help="Evaluate papers, agents and chunks one at a time.")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Global cap on concurrent LLM calls.")
+    parser.add_argument("--backend-limit", action="append", metavar="URL=N",
+                        help="Concurrency limit for one backend (repeatable).")
+    parser.add_argument("--default-backend-limit", type=int, default=DEFAULT_BACKEND_LIMIT,
+                        help="Concurrency limit for backends without an explicit limit.")
+    parser.add_argument("--max-papers", type=int, default=DEFAULT_MAX_PAPERS,
+                        help="Number of papers evaluated concurrently.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache.")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-evaluate every paper, ignoring checkpointed results.")
+    parser.add_argument("--verbose", action="store_true", help="Log every LLM request and its latency.")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Wait for complete replies instead of stopping once the JSON object is received.")
+    parser.add_argument("--max-output-tokens", type=int, help="Cap on tokens generated per LLM call.")
+    parser.add_argument("--json-mode", action="store_true",
+                        help="Constrain model output to the score/explanation JSON schema.")
+    parser.add_argument("--agents", default=",".join(DEFAULT_AGENTS),
+                        help="Agents to run, separated by commas, from: "
+                             f"{', '.join(name for name in agents.names() if name != 'fused')}.")
+    parser.add_argument("--reuse-context", action="store_true",
+                        help="Coherence (experimental): send the instructions once and continue each chunk "
+                             "from the model's context. Saves little over the default prompt layout.")
+    parser.add_argument("--relevance-topic",
+                        help="Topic the relevance agent judges papers against, instead of their own field.")
+    parser.add_argument("--fused", action="store_true",
+                        help="Score coherence, ethics and novelty together with one request per chunk.")
+    parser.add_argument("--triage", action="store_true",
+                        help="Skip LLM evaluation for papers the local triage model is confident about. "
+                             "Needs a model trained on enough labeled papers (MIN_TRIAGE_PAPERS in scripts/train_model.py).")
+    # Defaults of the options below live in modules imported only when the option is used
+    parser.add_argument("--triage-model",
+                        help="Model trained by scripts/train_model.py. Default: its MODEL_PATH.")
+    parser.add_argument("--triage-low", type=float,
+                        help="Triage probability at or below which a paper is non-publishable.")
+    parser.add_argument("--triage-high", type=float,
+                        help="Triage probability at or above which a paper is publishable.")
+    parser.add_argument("--novelty-index", nargs="?", const="", metavar="DIR",
+                        help="Ground novelty scores in the corpus index built by scripts/novelty_index.py "
+                             "(default directory: its INDEX_DIR).")
+    parser.add_argument("--plagiarism-corpus", nargs="?", const="", metavar="DIR",
+                        help="Check papers for text shared with this corpus and add the overlap to the ethics "
+                             "result (default directory: scripts/plagiarism.py's INPUT_DIR).")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt each backend's concurrency to its latency (AIMD), up to --max-in-flight.")
+    parser.add_argument("--target-latency", type=float,
+                        help="Adaptive mode: seconds per call before backing off. Default: 2x the fastest call.")
+    parser.add_argument("--max-queue", type=int,
+                        help="Adaptive mode: calls allowed to wait per backend; further chunks are skipped.")
+    parser.add_argument("--max-wait", type=float,
+                        help="Adaptive mode: seconds a chunk may wait for a slot before it is skipped.")
+    parser.add_argument("--stream-text", action="store_true",
+                        help="Read papers lazily in blocks so memory is bounded by the chunk size, not the paper size.")
+    parser.add_argument("--no-section-routing", action="store_true",
+                        help="Send the whole paper to every agent instead of the sections listed in SECTION_ROUTES.")
+    parser.add_argument("--results-store", default=STORE_PATH,
+                        help="SQLite database the results are written to; query it with scripts/results_store.py.")
+
+class EvaluationRun:
+    def __init__(self, args, manifest=None):
+        """
+        Set up an evaluation run: build and configure the selected agents, load the checkpoint,
+        open the results store and start the evaluation engine. Papers can then be passed to
+        evaluate in one batch, as main does, or a few at a time as they become available.
+        Args:
+            args (argparse.Namespace): Options added by add_evaluation_arguments.
+            manifest (PipelineManifest): Manifest shared with the other pipeline stages.
+                Defaults to the one in manifest_file.
+        Raises:
+            ValueError: If --agents names an unknown agent, or the fused agent.
+        """
+        self.args = args
+        self.selected = agents.select(args.agents)
+        if "fused" in self.selected:
+            raise ValueError("the fused agent scores every criterion at once; use --fused instead")
+        run_names = ["fused"] if args.fused else self.selected
+
+        self.routes = {} if args.no_section_routing else dict(SECTION_ROUTES)
+        # Corpus comparisons are made between whole papers
+        if args.novelty_index is not None:
+            self.routes.pop("novelty", None)
+        if args.plagiarism_corpus is not None:
+            self.routes.pop("ethics", None)
+
+        self.cache = get_default_cache()
+        if args.no_cache:
+            self.cache.bypass = True
+
+        def configure(name, agent):
+            if args.no_stream:
+                agent.stream = False
+            if args.max_output_tokens:
+                agent.options["num_predict"] = args.max_output_tokens
+            if args.json_mode:
+                agent.format = "json" if name == "fused" else SCORE_SCHEMA
+            if name == "coherence" and args.reuse_context:
+                agent.reuse_context = True
+            if name == "relevance" and args.relevance_topic:
+                agent.topic = args.relevance_topic
+
+        agents.on_build(configure)
+        for name in run_names:
+            agents.get(name)
+
+        if args.novelty_index is not None and "novelty" in run_names:
+            from scripts.novelty_index import load_novelty_index, INDEX_DIR, TEXT_FORMAT
+            index_dir = args.novelty_index or INDEX_DIR
+            novelty_agent = agents.get("novelty")
+            novelty_agent.index = load_novelty_index(index_dir)
+            if novelty_agent.index is None:
+                print(f"No novelty index in {index_dir}; run scripts/novelty_index.py to build it")
+            elif novelty_agent.index.text_format != TEXT_FORMAT:
+                print(f"The novelty index in {index_dir} was built from {novelty_agent.index.text_format} text; "
+                      f"run scripts/novelty_index.py to rebuild it from {TEXT_FORMAT} text")
+
+        if args.plagiarism_corpus is not None and "ethics" in run_names:
+            from scripts.plagiarism import build_plagiarism_index, INPUT_DIR
+            start = time.perf_counter()
+            ethics_agent = agents.get("ethics")
+            ethics_agent.plagiarism_index = build_plagiarism_index(args.plagiarism_corpus or INPUT_DIR)
+            print(f"Fingerprinted {len(ethics_agent.plagiarism_index)} corpus papers "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+        # Resume from the checkpoint: papers whose text and settings are unchanged are skipped
+        self.manifest = manifest if manifest is not None else PipelineManifest(manifest_file)
+        self.checkpoint = CheckpointLog(checkpoint_file)
+        self.records = {} if args.force else self.checkpoint.load()
+        self.fingerprints = {}
+        self.file_paths = []  # Every paper passed to evaluate, in order
+
+        # Triage: confident papers get the model's verdict, the uncertain band goes to the agents.
+        # Triage results are not checkpointed, so running without --triage evaluates them fully.
+        self.triage = {}
+        self.triage_model = None
+        if args.triage:
+            from scripts.train_model import (
+                TriageModel, MODEL_PATH, DEFAULT_LOW_THRESHOLD, DEFAULT_HIGH_THRESHOLD, MIN_TRIAGE_PAPERS
+            )
+            model = TriageModel.load(args.triage_model or MODEL_PATH)
+            print(f"Triage model: {model.summary()}")
+            # A model fitted to a few labeled papers must not decide papers on its own
+            if model.papers < MIN_TRIAGE_PAPERS:
+                print(f"Triage disabled: it needs a model trained on at least {MIN_TRIAGE_PAPERS} labeled papers, "
+                      f"so every paper goes to the agents")
+            else:
+                self.triage_model = model
+            self.triage_low = DEFAULT_LOW_THRESHOLD if args.triage_low is None else args.triage_low
+            self.triage_high = DEFAULT_HIGH_THRESHOLD if args.triage_high is None else args.triage_high
+
+        # Results are streamed into the store as papers finish; each run is a complete snapshot
+        self.store = ResultsStore(args.results_store)
+        self.run_id = self.store.start_run(vars(args))
+        self.evaluated_now = set()
+
+        self.pools = endpoint_pools()
+        for pool in self.pools:
+            health = pool.check_health()
+            print(f"Endpoint pool: {sum(health.values())} of {len(pool)} endpoints up "
+                  f"({', '.join(url for url, up in health.items() if not up) or 'none down'})")
+
+        self.engine = None
+        if not args.serial:
+            backend_limits = parse_backend_limits(args.backend_limit)
+            for pool in self.pools:
+                # A pool takes the default limit once per endpoint
+                backend_limits.setdefault(pool.base_url, args.default_backend_limit * len(pool))
+            self.engine = EvaluationEngine(
+                max_in_flight=args.max_in_flight,
+                backend_limits=backend_limits,
+                default_backend_limit=args.default_backend_limit,
+                max_papers=args.max_papers,
+                adaptive=args.adaptive,
+                target_latency=args.target_latency,
+                max_queue=args.max_queue,
+                max_wait=args.max_wait,
+            )
+
+    def is_up_to_date(self, file_path):
+        filename = os.path.basename(file_path)
+        record = self.records.get(filename)
+        return (
+            record is not None
+            and record.get("fingerprint") == self.fingerprints[filename]
+            and self.manifest.is_current("evaluate", filename, self.fingerprints[filename])
+        )
+
+    def pending(self, file_paths):
+        """
+        Pick out the papers that need the agents: those without an up-to-date checkpointed
+        result and, with --triage, that the triage model is unsure about.
+        Args:
+            file_paths (list): Paths to the preprocessed text files.
+        Returns:
+            list: Paths left for the agents, in order.
+        """
+        for path in file_paths:
+            self.fingerprints[os.path.basename(path)] = paper_fingerprint(
+                path, self.args.fused, self.selected, self.routes
+            )
+        self.file_paths.extend(file_paths)
+
+        pending = [path for path in file_paths if not self.is_up_to_date(path)]
+        if len(pending) < len(file_paths):
+            print(f"Skipping {len(file_paths) - len(pending)} papers with up-to-date checkpointed results")
+
+        if self.triage_model is not None and pending:
+            start = time.perf_counter()
+            triage, pending = triage_papers(pending, self.triage_model, self.triage_low, self.triage_high)
+            for file_path, verdict in triage.items():
+                if verdict["decision"] != "uncertain":
+                    self.records[os.path.basename(file_path)] = {"result": {
+                        "filename": os.path.basename(file_path),
+                        "triage": verdict,
+                        "average_score": None,
+                        "is_publishable": verdict["decision"] == "publishable",
+                    }}
+            self.triage.update(triage)
+            print(f"Triage: {len(triage) - len(pending)} of {len(triage)} papers decided locally "
+                  f"in {time.perf_counter() - start:.2f}s, {len(pending)} sent to the agents")
+        return pending
+
+    def checkpoint_result(self, file_path, evaluation):
+        filename = os.path.basename(file_path)
+        fingerprint = self.fingerprints[filename]
+        if file_path in self.triage:
+            evaluation["triage"] = self.triage[file_path]
+        self.checkpoint.append(filename, fingerprint, evaluation)
+        self.store.add(self.run_id, evaluation)
+        self.evaluated_now.add(filename)
+        self.manifest.record("evaluate", filename, fingerprint, checkpoint=checkpoint_file)
+        self.records[filename] = {"fingerprint": fingerprint, "result": evaluation}
+
+    def evaluate(self, file_paths):
+        """
+        Evaluate papers that are not up to date, checkpointing each one as it finishes.
+        Safe to call from several threads at once.
+        Args:
+            file_paths (list): Paths to the preprocessed text files.
+        Returns:
+            list: Evaluation results of the papers evaluated now, skipping failed papers, or None
+                if every paper was up to date or decided by triage.
+        """
+        pending = self.pending(file_paths)
+        if not pending:
+            return None
+        return evaluate_papers(pending, self.engine, on_result=self.checkpoint_result,
+                               fused=self.args.fused, stream_text=self.args.stream_text,
+                               names=self.selected, routes=self.routes)
+
+    def close(self, elapsed):
+        """
+        Stop the engine, complete the run in the results store and print its statistics.
+        Args:
+            elapsed (float): Wall-clock seconds spent evaluating.
+        """
+        if self.engine is not None:
+            self.engine.shutdown()
+
+        # Add the checkpointed and triaged results, without their explanations, to complete the run
+        for path in self.file_paths:
+            filename = os.path.basename(path)
+            if filename in self.records and filename not in self.evaluated_now:
+                self.store.add(self.run_id, self.records[filename]["result"], reused=True)
+        self.store.close()
+
+        print(f"Evaluated {len(self.evaluated_now)} papers in {elapsed:.1f}s")
+        if self.engine is not None:
+            for backend, stats in self.engine.backend_stats().items():
+                print(f"Adaptive limit for {backend}: settled at {stats['settled_limit']:.1f} "
+                      f"(now {stats['limit']:.1f}, peak {stats['peak_in_flight']} in flight, "
+                      f"{stats['decreases']} back-offs, {stats['rejected']} calls skipped)")
+        for pool in self.pools:
+            for url, stats in pool.endpoint_stats().items():
+                print(f"Endpoint {url}: {stats['calls']} calls, {stats['failures']} failures, "
+                      f"{stats['failovers']} failed over, p95 {stats['p95']:.2f}s"
+                      f"{'' if stats['healthy'] else ' (down)'}")
+        for name, agent in agents.built().items():
+            # Agents built on BaseAgent time their papers and the phases of each request
+            timing = getattr(agent, "timing", None)
+            if timing is not None and timing.papers:
+                stats = timing.summary()
+                print(f"Agent {name}: {stats['papers']} papers, {stats['mean_s']:.2f}s per paper "
+                      f"(LLM {stats['llm_call_s']:.1f}s, parse {stats['parse_s']:.2f}s in total)")
+        stats = self.cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        parse_stats = PARSE_STATS.summary()
+        print(f"Parsed {parse_stats['parsed'] + parse_stats['repaired']}/{parse_stats['total']} LLM replies "
+              f"({parse_stats['success_rate']:.0%}; {parse_stats['repaired']} after a repair retry, "
+              f"{parse_stats['failed']} failed)")
+        print(f"Evaluation completed. Results saved to {self.args.results_store} as run {self.run_id}")
+
 def main():
     """
-    Main function to process all preprocessed papers and save results.
+    Main function to evaluate the selected preprocessed papers and save results.
     """
-    results = []
+    parser = argparse.ArgumentParser(description="Evaluate preprocessed research papers.")
+    add_evaluation_arguments(parser)
+    add_selection_arguments(parser, os.path.join(preprocessed_dir, "*.txt"))
+    tracing.add_tracing_arguments(parser)
+    args = parser.parse_args()
 
-    # Process each file in the preprocessed directory
-    for filename in os.listdir(preprocessed_dir):
-        file_path = os.path.join(preprocessed_dir, filename)
-        if filename.endswith(".txt") and filename == "P006.txt":
-            try:
-                print(f"Evaluating {filename}...")
-                evaluation = evaluate_paper(file_path)
-                results.append(evaluation)
-            except Exception as e:
-                print(f"Error evaluating {filename}: {e}")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
+    try:
+        run = EvaluationRun(args)
+    except ValueError as e:
+        parser.error(str(e))
 
-    # Save results to a JSON file
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        json.dump(results, outfile, indent=4)
+    # Collect the files to evaluate
+    file_paths = select_papers(args.glob or [os.path.join(preprocessed_dir, "*.txt")], args.shard)
 
-    print(f"Evaluation completed. Results saved to {output_file}")
+    start = time.perf_counter()
+    try:
+        with tracing.traced_run(args):
+            run.evaluate(file_paths)
+    finally:
+        run.close(time.perf_counter() - start)
 
 if __name__ == "__main__":
     main()
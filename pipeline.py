@@ -0,0 +1,235 @@
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+import contextvars
+
+import tracing
+from main import EvaluationRun, add_evaluation_arguments, preprocessed_dir
+from scripts.corpus import add_selection_arguments, select_papers
+from scripts.extract_text import extract_parallel, extract_serial, INPUT_DIR, OUTPUT_DIR as EXTRACTED_DIR
+from scripts.extract_text import DEFAULT_WORKERS, DEFAULT_TIMEOUT
+from scripts.pipeline_manifest import PipelineManifest, file_hash
+from scripts.preprocess_text import preprocess_paper
+
+# Papers allowed to wait between two stages. A full queue holds back the stage feeding it,
+# so extraction runs only as far ahead of evaluation as this allows.
+DEFAULT_QUEUE_SIZE = 4
+
+# Stages of the pipeline, in order
+STAGES = ("extract", "preprocess", "evaluate")
+
+_DONE = object()  # Sent down a queue by each producer once it has no more papers
+
+
+class PipelineStats:
+    def __init__(self):
+        """
+        Initialize thread-safe counters of the papers that went through each stage.
+        """
+        self.start = time.perf_counter()
+        self.counts = {}
+        self.first = {}  # Seconds from the start to the first paper finished by each stage
+        self.last = {}  # Seconds from the start to the last paper finished by each stage
+        self._lock = threading.Lock()
+
+    def record(self, stage, outcome="done"):
+        elapsed = time.perf_counter() - self.start
+        with self._lock:
+            key = (stage, outcome)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.first.setdefault(stage, elapsed)
+            self.last[stage] = elapsed
+
+    def count(self, stage, outcome="done"):
+        with self._lock:
+            return self.counts.get((stage, outcome), 0)
+
+    def print_summary(self):
+        """
+        Print the papers each stage handled and when it was busy; overlapping windows show
+        the stages running at the same time.
+        """
+        print(f"\n{'Stage':<11} {'Done':>5} {'Skipped':>8} {'Failed':>7}   Active")
+        for stage in STAGES:
+            window = (f"{self.first[stage]:7.1f}s - {self.last[stage]:7.1f}s" if stage in self.first else "-")
+            print(f"{stage:<11} {self.count(stage):>5} {self.count(stage, 'skipped'):>8} "
+                  f"{self.count(stage, 'failed'):>7}   {window}")
+
+
+def _start_thread(name, target, *args):
+    # Threads run in a copy of the caller's context so their spans nest under the run's
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(target, *args), name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_pipeline(pdf_paths, evaluate, manifest, extracted_dir=EXTRACTED_DIR, output_dir=preprocessed_dir,
+                 workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, evaluators=1,
+                 queue_size=DEFAULT_QUEUE_SIZE, force=False):
+    """
+    Extract, preprocess and evaluate papers as a pipeline: each paper moves on to the next
+    stage as soon as it is ready, through bounded queues, so the CPU-bound extraction of
+    later papers overlaps with the LLM-bound evaluation of earlier ones.
+
+    PDFs the manifest shows as unchanged are not extracted again; their text is sent on
+    straight away. Preprocessing and evaluation skip unchanged papers in the same way.
+    Args:
+        pdf_paths (list): PDFs to process.
+        evaluate (callable): Called with the path of each preprocessed text file. Returns the
+            paper's evaluations, empty if it failed, or None if it did not need evaluating, like
+            EvaluationRun.evaluate on a one-paper list. Must be thread-safe if evaluators > 1.
+        manifest (PipelineManifest): Manifest shared by the stages.
+        extracted_dir (str): Folder to save extracted text in.
+        output_dir (str): Folder to save preprocessed text in.
+        workers (int): Extraction worker processes; 0 extracts in a thread of this process.
+        timeout (float): Seconds allowed per PDF (parallel extraction only).
+        evaluators (int): Papers evaluated at the same time.
+        queue_size (int): Papers allowed to wait between two stages.
+        force (bool): Extract and preprocess papers that have not changed.
+    Returns:
+        PipelineStats: Papers handled by each stage.
+    """
+    for directory in (extracted_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+    stats = PipelineStats()
+    extracted = queue.Queue(maxsize=queue_size)
+    preprocessed = queue.Queue(maxsize=queue_size)
+
+    jobs = []
+    unchanged = []
+    hashes = {}
+    for pdf_path in pdf_paths:
+        file_name = os.path.basename(pdf_path)
+        output_path = os.path.join(extracted_dir, f"{os.path.splitext(file_name)[0]}.txt")
+        hashes[pdf_path] = file_hash(pdf_path)
+        if not force and manifest.is_current("extract", file_name, hashes[pdf_path]):
+            unchanged.append(output_path)
+        else:
+            jobs.append((pdf_path, output_path))
+
+    def extract_stage():
+        try:
+            extraction = extract_parallel(jobs, workers, timeout) if workers > 0 else extract_serial(jobs)
+            for report in extraction:
+                file_name = os.path.basename(report["file"])
+                # Extraction runs in worker processes, so its span is recorded from the report
+                tracing.record("pdf_parse", report["elapsed"], file=file_name, status=report["status"],
+                               pages=report["pages"], chars=report["chars"])
+                if report["status"] != "ok":
+                    print(f"Failed to extract text from: {file_name} ({report['error']})")
+                    stats.record("extract", "failed")
+                    continue
+                manifest.record("extract", file_name, hashes[report["file"]], report["output"])
+                stats.record("extract")
+                # Blocks while preprocessing is queue_size papers behind
+                extracted.put(report["output"])
+        finally:
+            extracted.put(_DONE)
+
+    def send_unchanged():
+        try:
+            for output_path in unchanged:
+                stats.record("extract", "skipped")
+                extracted.put(output_path)
+        finally:
+            extracted.put(_DONE)
+
+    def preprocess_stage():
+        producers = 2
+        try:
+            while producers:
+                text_path = extracted.get()
+                if text_path is _DONE:
+                    producers -= 1
+                    continue
+                try:
+                    output_path, processed = preprocess_paper(text_path, output_dir, manifest, force)
+                except Exception as e:
+                    print(f"Failed to preprocess {os.path.basename(text_path)}: {e}")
+                    stats.record("preprocess", "failed")
+                    continue
+                stats.record("preprocess", "done" if processed else "skipped")
+                preprocessed.put(output_path)
+        finally:
+            for _ in range(evaluators):
+                preprocessed.put(_DONE)
+
+    def evaluate_stage():
+        while True:
+            text_path = preprocessed.get()
+            if text_path is _DONE:
+                return
+            try:
+                evaluated = evaluate(text_path)
+            except Exception as e:
+                print(f"Error evaluating {os.path.basename(text_path)}: {e}")
+                evaluated = []
+            stats.record("evaluate", "skipped" if evaluated is None else "done" if evaluated else "failed")
+
+    threads = [
+        _start_thread("extract", extract_stage),
+        _start_thread("unchanged", send_unchanged),
+        _start_thread("preprocess", preprocess_stage),
+    ]
+    threads += [_start_thread(f"evaluate-{i}", evaluate_stage) for i in range(evaluators)]
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def main():
+    """
+    Extract, preprocess and evaluate the selected PDFs in one pipelined run.
+    """
+    parser = argparse.ArgumentParser(description="Extract, preprocess and evaluate research papers in one pipeline.")
+    add_selection_arguments(parser, os.path.join(INPUT_DIR, "*.pdf"))
+    parser.add_argument("--extracted-dir", default=EXTRACTED_DIR, help="Folder to save extracted text.")
+    parser.add_argument("--preprocessed-dir", default=preprocessed_dir, help="Folder to save preprocessed text.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Extraction worker processes; 0 extracts in a thread of this process.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds allowed per PDF (parallel extraction only).")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Papers allowed to wait between two stages.")
+    add_evaluation_arguments(parser)
+    tracing.add_tracing_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    pdf_paths = select_papers(args.glob or [os.path.join(INPUT_DIR, "*.pdf")], args.shard)
+    if not pdf_paths:
+        parser.error("no PDFs match --glob" + (" in this shard" if args.shard else ""))
+
+    # Every stage records into the same manifest, so they must share one instance. Like
+    # extract_text.py, it lives in the data folder that holds the output folders.
+    data_dir = os.path.dirname(os.path.normpath(args.preprocessed_dir))
+    manifest = PipelineManifest(os.path.join(data_dir, "pipeline_manifest.json"))
+    try:
+        run = EvaluationRun(args, manifest)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Processing {len(pdf_paths)} papers"
+          + (f" (shard {args.shard[0]}/{args.shard[1]})" if args.shard else ""))
+
+    start = time.perf_counter()
+    try:
+        with tracing.traced_run(args):
+            stats = run_pipeline(
+                pdf_paths, lambda text_path: run.evaluate([text_path]), manifest,
+                extracted_dir=args.extracted_dir, output_dir=args.preprocessed_dir,
+                workers=args.workers, timeout=args.timeout,
+                evaluators=1 if args.serial else args.max_papers,
+                queue_size=args.queue_size, force=args.force,
+            )
+    finally:
+        run.close(time.perf_counter() - start)
+    stats.print_summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,809 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from functools import partial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from scripts.mock_ollama import MockOllamaServer, add_server_arguments, server_from_args, server_config
+
+try:
+    import resource  # Unix only; peak memory is not reported elsewhere
+except ImportError:
+    resource = None
+
+# Directory paths
+PDF_DIR = "Data/All_papers"
+PREPROCESSED_DIR = "Data/preprocessed_text"
+BENCHMARK_DIR = "Data/benchmarks"  # Stored results, one JSON line per run
+
+# A metric worse than the previous run of the same configuration by more than this is flagged
+REGRESSION_TOLERANCE = 0.10
+
+
+def list_papers(input_dir, limit):
+    """
+    List the first papers of a directory.
+    Args:
+        input_dir (str): Directory containing preprocessed text files.
+        limit (int): Maximum number of papers.
+    Returns:
+        list: Paths to the selected papers.
+    """
+    names = sorted(name for name in os.listdir(input_dir) if name.endswith(".txt"))
+    return [os.path.join(input_dir, name) for name in names[:limit]]
+
+
+def benchmark_evaluate(args):
+    """
+    Compare the serial evaluation loop with the evaluation engine against the mock server.
+    """
+    import main
+    from agents.Coherence_agent import CoherenceAgent
+    from agents.llm_cache import LLMCache
+    from engine import EvaluationEngine
+
+    server = MockOllamaServer(port=0, latency=args.latency).start()
+    try:
+        # Every run must reach the server, so the response cache is bypassed
+        cache = LLMCache(":memory:", bypass=True)
+        main.agents.set("coherence", CoherenceAgent(base_url=server.base_url, cache=cache))
+        paper_paths = list_papers(args.input_dir, args.papers)
+
+        timings = {}
+        start = time.perf_counter()
+        serial_results = main.evaluate_papers(paper_paths)
+        timings["serial"] = time.perf_counter() - start
+        calls = sum(server.request_counts.values())
+
+        engine = EvaluationEngine(
+            max_in_flight=args.max_in_flight,
+            default_backend_limit=args.backend_limit,
+            max_papers=args.max_papers,
+        )
+        start = time.perf_counter()
+        try:
+            engine_results = main.evaluate_papers(paper_paths, engine)
+        finally:
+            engine.shutdown()
+        timings["engine"] = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    same_order = [r["filename"] for r in serial_results] == [r["filename"] for r in engine_results]
+    print(f"\nPapers: {len(paper_paths)}, LLM calls per run: {calls}, mock latency: {args.latency}s")
+    for mode, elapsed in timings.items():
+        print(f"{mode:>8}: {elapsed:8.2f}s  {len(paper_paths) / elapsed:6.2f} papers/s  {calls / elapsed:7.1f} calls/s")
+    print(f"Speed-up: {timings['serial'] / timings['engine']:.1f}x, same result order: {same_order}")
+
+
+def benchmark_extract(args):
+    """
+    Compare the serial extraction loop with the parallel, page-streaming extractor.
+    """
+    from scripts import extract_text
+
+    pdf_names = sorted(name for name in os.listdir(args.input_dir) if name.endswith(".pdf"))[:args.papers]
+    serial_dir = tempfile.mkdtemp(prefix="extract_serial_")
+    parallel_dir = tempfile.mkdtemp(prefix="extract_parallel_")
+    try:
+        # Serial baseline: the original loop of extract_text_from_pdf + save_text_to_file
+        start = time.perf_counter()
+        for name in pdf_names:
+            text = extract_text.extract_text_from_pdf(os.path.join(args.input_dir, name))
+            if text:
+                extract_text.save_text_to_file(text, os.path.join(serial_dir, f"{os.path.splitext(name)[0]}.txt"))
+        serial_elapsed = time.perf_counter() - start
+
+        jobs = [
+            (os.path.join(args.input_dir, name), os.path.join(parallel_dir, f"{os.path.splitext(name)[0]}.txt"))
+            for name in pdf_names
+        ]
+        start = time.perf_counter()
+        reports = list(extract_text.extract_parallel(jobs, args.workers, args.timeout))
+        parallel_elapsed = time.perf_counter() - start
+
+        identical = all(
+            open(os.path.join(serial_dir, name), encoding="utf-8").read()
+            == open(os.path.join(parallel_dir, name), encoding="utf-8").read()
+            for name in os.listdir(serial_dir)
+        )
+    finally:
+        shutil.rmtree(serial_dir)
+        shutil.rmtree(parallel_dir)
+
+    pages = sum(report["pages"] for report in reports)
+    failures = sum(1 for report in reports if report["status"] != "ok")
+    print(f"PDFs: {len(pdf_names)}, pages: {pages}, failures: {failures}")
+    print(f"  serial: {serial_elapsed:8.2f}s  {pages / serial_elapsed:7.1f} pages/s")
+    print(f"parallel: {parallel_elapsed:8.2f}s  {pages / parallel_elapsed:7.1f} pages/s ({args.workers} workers)")
+    print(f"Speed-up: {serial_elapsed / parallel_elapsed:.1f}x, identical output: {identical}")
+
+
+def benchmark_fused(args):
+    """
+    Compare separate coherence, ethics and novelty agents with the fused agent.
+    Runs against the mock server unless --base-url points at a real Ollama server.
+    """
+    from agents.llm_cache import LLMCache
+    from agents.llm_client import OllamaClient
+    from agents.Coherence_agent import CoherenceAgent
+    from agents.Ethics_agent import EthicsAgent
+    from agents.Novelty_agent import NoveltyAgent
+    from agents.Fused_agent import FusedAgent, CRITERIA
+
+    class CountingClient(OllamaClient):
+        # Count requests and prompt characters sent to the server
+        def __init__(self, base_url):
+            super().__init__(base_url)
+            self.calls = 0
+            self.prompt_chars = 0
+
+        def _send(self, path, payload, stream=False):
+            self.calls += 1
+            self.prompt_chars += len(payload.get("prompt", ""))
+            return super()._send(path, payload, stream)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = MockOllamaServer(port=0, latency=args.latency).start()
+        base_url = server.base_url
+
+    cache = LLMCache(":memory:", bypass=True)
+    separate_client = CountingClient(base_url)
+    fused_client = CountingClient(base_url)
+    separate = {
+        "coherence": CoherenceAgent(base_url, cache=cache, client=separate_client),
+        "ethics": EthicsAgent(base_url, cache=cache, client=separate_client),
+        "novelty": NoveltyAgent(base_url, cache=cache, client=separate_client),
+    }
+    fused = FusedAgent(base_url, cache=cache, client=fused_client)
+
+    timings = {"separate": 0.0, "fused": 0.0}
+    differences = {criterion: [] for criterion in CRITERIA}
+    try:
+        for path in list_papers(args.input_dir, args.papers):
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+
+            start = time.perf_counter()
+            separate_results = {name: agent.analyze(text) for name, agent in separate.items()}
+            timings["separate"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            fused_results = fused.analyze(text)
+            timings["fused"] += time.perf_counter() - start
+
+            for criterion in CRITERIA:
+                differences[criterion].append(
+                    abs(separate_results[criterion]["score"] - fused_results[criterion]["score"])
+                )
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"Papers: {args.papers}, server: {base_url}")
+    for mode, client in (("separate", separate_client), ("fused", fused_client)):
+        print(f"{mode:>9}: {timings[mode]:8.2f}s  {client.calls:5d} calls  "
+              f"{client.prompt_chars / 1000:9.1f}k prompt chars")
+    print(f"Speed-up: {timings['separate'] / timings['fused']:.1f}x")
+    for criterion, values in differences.items():
+        print(f"Mean |separate - fused| {criterion} score: {sum(values) / len(values):.3f}")
+
+
+def benchmark_batch(args):
+    """
+    Compare scoring papers one request at a time with analyze_many, for every whole-paper
+    agent, against the mock server.
+    """
+    from agents.llm_cache import LLMCache
+    from agents.llm_client import OllamaClient
+    from agents.registry import AgentRegistry
+
+    server = server_from_args(args).start()
+    try:
+        # Every run must reach the server, so the response cache is bypassed
+        registry = AgentRegistry(base_url=server.base_url, cache=LLMCache(":memory:", bypass=True),
+                                 client=OllamaClient(server.base_url))
+        names = [name for name in registry.names() if not registry.is_chunked(name)]
+        texts = []
+        for path in list_papers(args.input_dir, args.papers):
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(f.read())
+
+        timings = {"one at a time": 0.0, "analyze_many": 0.0}
+        for name in names:
+            agent = registry.get(name)
+            agent.batch_size = args.batch_size
+            start = time.perf_counter()
+            for text in texts:
+                agent.analyze(text)
+            timings["one at a time"] += time.perf_counter() - start
+            start = time.perf_counter()
+            agent.analyze_many(texts)
+            timings["analyze_many"] += time.perf_counter() - start
+    finally:
+        server.stop()
+
+    print(f"{len(names)} agents x {len(texts)} papers, mock server with {args.parallel} parallel slots")
+    for mode, elapsed in timings.items():
+        print(f"{mode:>14}: {elapsed:7.2f}s  {len(names) * len(texts) / elapsed:6.1f} papers/s per agent")
+    print(f"Speed-up: {timings['one at a time'] / timings['analyze_many']:.1f}x")
+    for name in names:
+        stats = registry.get(name).timing.summary()
+        print(f"{name:>16}: {stats['mean_s']:.3f}s per paper, LLM {stats['llm_call_s']:.2f}s, "
+              f"parse {stats['parse_s']:.3f}s")
+
+
+def use_mock_agents(base_url, cache, client):
+    """
+    Point the agents used by main.py at another server.
+    Args:
+        base_url (str): Base URL of the server.
+        cache (LLMCache): Response cache for the agents.
+        client (OllamaClient): Client shared by the agents.
+    """
+    import main
+    from agents.registry import AgentRegistry
+
+    main.agents = AgentRegistry(base_url=base_url, cache=cache, client=client)
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident memory of this process and of its finished child processes.
+    Returns:
+        float: Peak RSS in MB, or None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+    kilobytes = sum(
+        resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return kilobytes / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def load_previous_run(results_path, config):
+    """
+    Find the latest stored run with the same configuration.
+    Args:
+        results_path (str): JSON lines file of stored runs.
+        config (dict): Configuration of the current run.
+    Returns:
+        dict: The previous run, or None.
+    """
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get("config") == config:
+                previous = run
+    return previous
+
+
+def find_regressions(current, previous, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare the metrics of two runs.
+    Args:
+        current (dict): Metrics of this run.
+        previous (dict): Metrics of the previous run.
+        tolerance (float): Allowed relative change in the bad direction.
+    Returns:
+        list: (metric, previous value, current value) for every regressed metric.
+    """
+    higher_is_better = {"papers_per_sec"}
+    regressions = []
+    for metric, value in current.items():
+        old = previous.get(metric)
+        if not old or value is None:
+            continue
+        change = (old - value) / old if metric in higher_is_better else (value - old) / old
+        if change > tolerance:
+            regressions.append((metric, old, value))
+    return regressions
+
+
+def benchmark_e2e(args):
+    """
+    Run extraction, preprocessing and evaluation of a set of PDFs against the mock server,
+    store the metrics and compare them with the previous run of the same configuration.
+    """
+    import main
+    from agents.llm_cache import LLMCache
+    from agents.llm_client import OllamaClient, EndpointPool
+    from engine import EvaluationEngine
+    from scripts import extract_text
+    from scripts.preprocess_text import preprocess_text, save_preprocessed_text
+
+    pdf_names = sorted(name for name in os.listdir(args.input_dir) if name.endswith(".pdf"))[:args.papers]
+    workspace = tempfile.mkdtemp(prefix="e2e_")
+    extracted_dir = os.path.join(workspace, "extracted_text")
+    preprocessed_dir = os.path.join(workspace, "preprocessed_text")
+    os.makedirs(extracted_dir)
+    os.makedirs(preprocessed_dir)
+
+    servers = [server_from_args(args).start() for _ in range(args.endpoints)]
+    server = servers[0]
+    if args.endpoints == 1:
+        client = OllamaClient(server.base_url)
+    else:
+        client = EndpointPool([s.base_url for s in servers])
+        # Stopped servers refuse connections, so the pool has to fail over and route around them
+        for down in servers[len(servers) - args.down_endpoints:]:
+            down.stop()
+        servers = servers[:len(servers) - args.down_endpoints]
+    # Every run must reach the server, so the response cache is bypassed
+    use_mock_agents(client.base_url, LLMCache(":memory:", bypass=True), client)
+    timings = {}
+    engine = EvaluationEngine(
+        max_in_flight=args.max_in_flight,
+        default_backend_limit=args.backend_limit * len(servers),
+        max_papers=args.max_papers,
+        adaptive=args.adaptive,
+        max_queue=args.max_queue,
+    )
+    try:
+        with tracing.traced_run(args):
+            if args.pipelined:
+                # Papers move on to evaluation as soon as they are extracted and preprocessed
+                from pipeline import run_pipeline
+                from scripts.pipeline_manifest import PipelineManifest
+
+                results = []
+
+                def evaluate(path):
+                    evaluated = main.evaluate_papers([path], engine, fused=args.fused)
+                    results.extend(evaluated)
+                    return evaluated
+
+                start = time.perf_counter()
+                try:
+                    run_pipeline([os.path.join(args.input_dir, name) for name in pdf_names], evaluate,
+                                 PipelineManifest(os.path.join(workspace, "pipeline_manifest.json")),
+                                 extracted_dir, preprocessed_dir, workers=args.workers,
+                                 evaluators=args.max_papers, force=True)
+                finally:
+                    engine.shutdown()
+                timings["pipeline"] = time.perf_counter() - start
+            else:
+                start = time.perf_counter()
+                jobs = [
+                    (os.path.join(args.input_dir, name), os.path.join(extracted_dir, f"{os.path.splitext(name)[0]}.txt"))
+                    for name in pdf_names
+                ]
+                reports = list(extract_text.extract_parallel(jobs, args.workers))
+                timings["extract"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                paper_paths = []
+                for report in reports:
+                    tracing.record("pdf_parse", report["elapsed"], file=os.path.basename(report["file"]),
+                                   status=report["status"], pages=report["pages"], chars=report["chars"])
+                    if report["status"] != "ok":
+                        continue
+                    with tracing.span("preprocess", file=os.path.basename(report["output"])):
+                        with open(report["output"], "r", encoding="utf-8") as f:
+                            sections = preprocess_text(f.read())
+                        output_path = os.path.join(preprocessed_dir, os.path.basename(report["output"]))
+                        save_preprocessed_text(sections, output_path)
+                    paper_paths.append(output_path)
+                timings["preprocess"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                try:
+                    results = main.evaluate_papers(paper_paths, engine, fused=args.fused)
+                finally:
+                    engine.shutdown()
+                timings["evaluate"] = time.perf_counter() - start
+    finally:
+        for running in servers:
+            running.stop()
+        client.close()
+        shutil.rmtree(workspace)
+
+    total = sum(timings.values())
+    evaluated = sum(1 for result in results if "error" not in result)
+    llm_stats = client.stats()
+    limiter_stats = engine.backend_stats().get(client.base_url, {})
+    metrics = {
+        "papers_per_sec": evaluated / total if total else 0.0,
+        "llm_calls_per_paper": llm_stats["calls"] / evaluated if evaluated else 0.0,
+        "p50_latency": llm_stats["p50"],
+        "p95_latency": llm_stats["p95"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.adaptive:
+        # Where the limit settles is a sizing signal, not a metric with a good direction
+        settled_limit = limiter_stats.get("settled_limit")
+        skipped_chunks = limiter_stats.get("rejected", 0)
+    config = {
+        "papers": len(pdf_names),
+        "fused": args.fused,
+        "workers": args.workers,
+        "max_in_flight": args.max_in_flight,
+        "backend_limit": args.backend_limit,
+        "max_papers": args.max_papers,
+        "adaptive": args.adaptive,
+        "max_queue": args.max_queue,
+        "endpoints": args.endpoints,
+        "down_endpoints": args.down_endpoints,
+        "server": server_config(server),
+    }
+    if args.pipelined:
+        config["pipelined"] = True
+    results_path = os.path.join(args.results_dir, "e2e.jsonl")
+    previous = load_previous_run(results_path, config)
+
+    print(f"Papers: {evaluated}/{len(pdf_names)} evaluated, LLM calls: {llm_stats['calls']}, "
+          f"failed calls: {llm_stats['failures']}")
+    for stage, elapsed in timings.items():
+        print(f"{stage:>10}: {elapsed:8.2f}s")
+    if isinstance(client, EndpointPool):
+        for url, stats in client.endpoint_stats().items():
+            print(f"  {url}: {stats['routed']} routed, {stats['calls']} calls, {stats['failovers']} failed over"
+                  f"{'' if stats['healthy'] else ' (down)'}")
+    if args.adaptive:
+        print(f"Adaptive limit settled at {settled_limit:.1f} (max {args.max_in_flight}), "
+              f"{skipped_chunks} chunks skipped")
+    for metric, value in metrics.items():
+        shown = "n/a" if value is None else f"{value:.3f}"
+        old = previous["metrics"].get(metric) if previous else None
+        print(f"{metric:>20}: {shown:>10}" + (f"  (previous {old:.3f})" if old is not None else ""))
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    with open(results_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": config,
+            "timings": timings,
+            "metrics": metrics,
+            "limiter": limiter_stats,
+        }) + "\n")
+
+    if previous is None:
+        print(f"No previous run with this configuration in {results_path}.")
+        return
+    regressions = find_regressions(metrics, previous["metrics"])
+    for metric, old, value in regressions:
+        print(f"REGRESSION: {metric} went from {old:.3f} to {value:.3f}")
+    if not regressions:
+        print(f"No regressions above {REGRESSION_TOLERANCE:.0%} against the previous run.")
+    elif args.fail_on_regression:
+        sys.exit(1)
+
+
+SYNTHETIC_SECTIONS = [  # (first page, heading) of the synthetic paper, as fractions of its length
+    (0.0, "Abstract"), (0.002, "1 Introduction"), (0.05, "2 Methodology"), (0.3, "3 Results"),
+    (0.8, "4 Discussion"), (0.99, "5 Conclusion"), (0.995, "References"),
+]
+SYNTHETIC_WORDS = (
+    "model data results method analysis sample network effect signal measure value approach "
+    "observed significant distribution parameter training estimate variance framework proposed"
+).split()
+
+
+def write_synthetic_paper(path, pages, chars_per_page=3000, seed=0):
+    """
+    Write an extracted-text file of a long synthetic paper, page by page.
+    Args:
+        path (str): Output file.
+        pages (int): Number of pages.
+        chars_per_page (int): Approximate characters per page.
+        seed (int): Seed of the word sampling.
+    """
+    import random
+    rng = random.Random(seed)
+    headings = {int(fraction * pages): heading for fraction, heading in SYNTHETIC_SECTIONS}
+    with open(path, "w", encoding="utf-8") as f:
+        for page in range(pages):
+            if page in headings:
+                f.write(f"{headings[page]}\n")
+            written = 0
+            while written < chars_per_page:
+                # PDF-like lines of about 80 characters, ending sentences now and then
+                line = " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(10))
+                line += ".\n" if rng.random() < 0.3 else "\n"
+                f.write(line)
+                written += len(line)
+
+
+def run_memory_mode(args):
+    """
+    Preprocess and evaluate the synthetic paper in one mode and print the peak RSS as JSON.
+    Runs in a child process, so each mode starts from a fresh interpreter.
+    """
+    from agents.Coherence_agent import CoherenceAgent
+    from agents.chunking import FileText
+    from agents.llm_cache import LLMCache
+    from agents.llm_client import OllamaClient
+    from engine import EvaluationEngine
+    from scripts.preprocess_text import preprocess_text, save_preprocessed_text, preprocess_file
+
+    agent = CoherenceAgent(args.base_url, cache=LLMCache(":memory:", bypass=True), client=OllamaClient(args.base_url))
+    engine = EvaluationEngine(max_in_flight=args.max_in_flight, default_backend_limit=args.max_in_flight)
+    output_path = f"{args.input}.{args.mode}.sections"
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if args.mode == "whole":
+        with open(args.input, "r", encoding="utf-8") as f:
+            sections = preprocess_text(f.read())
+        save_preprocessed_text(sections, output_path)
+        del sections
+        with open(output_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        preprocess_file(args.input, output_path)
+        text = FileText(output_path)
+    preprocessed = time.perf_counter() - start
+    result = agent.analyze(text, map_chunks=lambda fn, jobs: engine.map_chunks(agent.base_url, fn, jobs))
+    engine.shutdown()
+    os.remove(output_path)
+    print(json.dumps({
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "preprocess_s": preprocessed,
+        "total_s": time.perf_counter() - start,
+        "chunks": len(result["chunk_scores"]),
+    }))
+
+
+def benchmark_prefill(args):
+    """
+    Compare the prompt tokens the server prefills per chunk for the coherence prompt layouts
+    on a long synthetic paper: chunk index first, instructions as a constant prefix, and
+    session context reuse.
+    """
+    from agents.Coherence_agent import CoherenceAgent
+    from agents.llm_cache import LLMCache
+    from agents.llm_client import OllamaClient
+    from engine import EvaluationEngine
+    from scripts.preprocess_text import preprocess_file
+
+    class PrefillClient(OllamaClient):
+        # Collect the prefill counts and durations reported by the server
+        def __init__(self, base_url):
+            super().__init__(base_url)
+            self.prefills = []
+
+        def generate(self, model, prompt, options=None, **fields):
+            reply = super().generate(model, prompt, options, **fields)
+            self.prefills.append((reply.get("prompt_eval_count", 0), reply.get("prompt_eval_duration", 0) / 1e9))
+            return reply
+
+    class IndexFirstAgent(CoherenceAgent):
+        # The earlier layout, where the chunk index in the first sentence changes the whole prompt
+        def _build_prompt(self, chunk, index, total, session=False):
+            return f"You are evaluating chunk {index+1} of {total}.\n\n" + super()._build_prompt(chunk, index, total)
+
+    workspace = tempfile.mkdtemp(prefix="prefill_")
+    input_path = os.path.join(workspace, "synthetic.txt")
+    text_path = os.path.join(workspace, "synthetic.sections")
+    write_synthetic_paper(input_path, args.pages)
+    preprocess_file(input_path, text_path)
+    with open(text_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    layouts = {
+        "index first": (IndexFirstAgent, False),
+        "constant prefix": (CoherenceAgent, False),
+        "session context": (CoherenceAgent, True),
+    }
+    print(f"Synthetic paper: {args.pages} pages, mock server with {args.parallel} parallel slots")
+    try:
+        for layout, (agent_class, reuse_context) in layouts.items():
+            # A fresh server per layout, so no layout starts with prompts cached by another
+            server = server_from_args(args).start()
+            client = PrefillClient(server.base_url)
+            agent = agent_class(server.base_url, cache=LLMCache(":memory:", bypass=True), client=client,
+                                stream=False, reuse_context=reuse_context)
+            engine = EvaluationEngine(max_in_flight=args.parallel, default_backend_limit=args.parallel)
+            start = time.perf_counter()
+            try:
+                result = agent.analyze(text, map_chunks=partial(engine.map_chunks, server.base_url))
+            finally:
+                engine.shutdown()
+                server.stop()
+            elapsed = time.perf_counter() - start
+            chunks = len(result["chunk_scores"])
+            tokens = sum(count for count, _ in client.prefills)
+            seconds = sum(duration for _, duration in client.prefills)
+            # Per chunk, including the request that starts the session
+            print(f"{layout:>16}: {tokens / chunks:7.0f} prefill tokens/chunk, "
+                  f"{seconds / chunks * 1000:6.1f} ms prefill/chunk, {chunks} chunks in {elapsed:.2f}s")
+    finally:
+        shutil.rmtree(workspace)
+
+
+def benchmark_sections(args):
+    """
+    Compare the paper tokens each routed agent is sent with and without section routing.
+    """
+    from main import SECTION_ROUTES
+    from agents.chunking import estimate_tokens
+    from scripts.preprocess_text import load_section_index, read_sections
+
+    paths = list_papers(args.input_dir, args.papers)
+    full_tokens = 0
+    routed_tokens = {name: 0 for name in SECTION_ROUTES}
+    fallbacks = {name: 0 for name in SECTION_ROUTES}
+    start = time.perf_counter()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            tokens = estimate_tokens(f.read())
+        full_tokens += tokens
+        index = load_section_index(path)
+        for name, sections in SECTION_ROUTES.items():
+            text = read_sections(path, index, sections)
+            if text is None:
+                # No routed section found: the agent gets the whole paper
+                fallbacks[name] += 1
+                routed_tokens[name] += tokens
+            else:
+                routed_tokens[name] += estimate_tokens(text)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(paths)} papers, {full_tokens / len(paths):.0f} tokens per paper on average; "
+          f"indexes read in {elapsed:.2f}s")
+    for name, tokens in routed_tokens.items():
+        print(f"{name:>16}: {tokens / len(paths):7.0f} tokens/paper ({tokens / full_tokens:4.0%} of the paper) "
+              f"from {'+'.join(SECTION_ROUTES[name])}; {fallbacks[name]} papers fell back to the whole text")
+
+
+def benchmark_memory(args):
+    """
+    Compare peak memory of the whole-text and streaming paths on a synthetic long paper.
+    """
+    if args.mode:
+        run_memory_mode(args)
+        return
+    import subprocess
+
+    workspace = tempfile.mkdtemp(prefix="memory_")
+    input_path = os.path.join(workspace, "synthetic.txt")
+    write_synthetic_paper(input_path, args.pages)
+    server = MockOllamaServer(port=0, latency=0, prefill_rate=0, token_rate=0, parallel=args.max_in_flight).start()
+    print(f"Synthetic paper: {args.pages} pages, {os.path.getsize(input_path) / 2 ** 20:.1f} MB")
+    try:
+        for mode in ("whole", "stream"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "memory", "--mode", mode, "--input", input_path,
+                 "--base-url", server.base_url, "--max-in-flight", str(args.max_in_flight)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: peak RSS {stats['peak_rss_mb']:6.1f} MB "
+                  f"(+{stats['peak_rss_mb'] - stats['baseline_rss_mb']:5.1f} MB over the interpreter), "
+                  f"{stats['chunks']} chunks, preprocess {stats['preprocess_s']:.2f}s, total {stats['total_s']:.2f}s")
+    finally:
+        server.stop()
+        shutil.rmtree(workspace)
+
+
+def benchmark_startup(args):
+    """
+    Measure the cold start of main.py: fresh interpreters importing it, printing its help
+    and building each agent, against the bare interpreter.
+    """
+    import subprocess
+    from agents.registry import AGENT_SPECS
+
+    commands = {
+        "interpreter": [sys.executable, "-c", "pass"],
+        "import main": [sys.executable, "-c", "import main"],
+        "main.py --help": [sys.executable, "main.py", "--help"],
+    }
+    for name in AGENT_SPECS:
+        commands[f"build {name}"] = [sys.executable, "-c", f"import main; main.agents.get({name!r})"]
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    medians = {}
+    for label, command in commands.items():
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=repo_dir, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        medians[label] = sorted(times)[len(times) // 2]
+
+    print(f"Median of {args.repeats} fresh processes:")
+    for label, median in medians.items():
+        extra = "" if label == "interpreter" else f"  (+{median - medians['interpreter']:.3f}s over the interpreter)"
+        print(f"{label:>16}: {median:.3f}s{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the evaluation pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Serial loop vs. evaluation engine.")
+    evaluate_parser.add_argument("--input-dir", default=PREPROCESSED_DIR)
+    evaluate_parser.add_argument("--papers", type=int, default=4)
+    evaluate_parser.add_argument("--latency", type=float, default=0.05)
+    evaluate_parser.add_argument("--max-in-flight", type=int, default=8)
+    evaluate_parser.add_argument("--backend-limit", type=int, default=8)
+    evaluate_parser.add_argument("--max-papers", type=int, default=4)
+    evaluate_parser.set_defaults(func=benchmark_evaluate)
+
+    fused_parser = subparsers.add_parser("fused", help="Separate agents vs. fused multi-criteria agent.")
+    fused_parser.add_argument("--input-dir", default=PREPROCESSED_DIR)
+    fused_parser.add_argument("--papers", type=int, default=4)
+    fused_parser.add_argument("--latency", type=float, default=0.05)
+    fused_parser.add_argument("--base-url", help="Benchmark a real Ollama server instead of the mock.")
+    fused_parser.set_defaults(func=benchmark_fused)
+
+    extract_parser = subparsers.add_parser("extract", help="Serial vs. parallel PDF extraction.")
+    extract_parser.add_argument("--input-dir", default=PDF_DIR)
+    extract_parser.add_argument("--papers", type=int, default=1000)
+    extract_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    extract_parser.add_argument("--timeout", type=float, default=120)
+    extract_parser.set_defaults(func=benchmark_extract)
+
+    e2e_parser = subparsers.add_parser("e2e", help="Extract, preprocess and evaluate PDFs against the mock server.")
+    e2e_parser.add_argument("--input-dir", default=PDF_DIR)
+    e2e_parser.add_argument("--papers", type=int, default=8)
+    e2e_parser.add_argument("--fused", action="store_true")
+    e2e_parser.add_argument("--pipelined", action="store_true",
+                            help="Run the stages as pipeline.py does, overlapping extraction with evaluation.")
+    e2e_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    e2e_parser.add_argument("--max-in-flight", type=int, default=8)
+    e2e_parser.add_argument("--backend-limit", type=int, default=4)
+    e2e_parser.add_argument("--max-papers", type=int, default=4)
+    e2e_parser.add_argument("--adaptive", action="store_true", help="Use the adaptive concurrency limiter.")
+    e2e_parser.add_argument("--max-queue", type=int, help="Adaptive mode: calls allowed to wait per backend.")
+    e2e_parser.add_argument("--endpoints", type=int, default=1,
+                            help="Mock servers to start; more than one are used through an endpoint pool.")
+    e2e_parser.add_argument("--down-endpoints", type=int, default=0,
+                            help="Endpoints of the pool stopped before the run, to exercise failover.")
+    e2e_parser.add_argument("--results-dir", default=BENCHMARK_DIR)
+    tracing.add_tracing_arguments(e2e_parser)
+    e2e_parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with status 1 when a metric regressed.")
+    add_server_arguments(e2e_parser)
+    e2e_parser.set_defaults(func=benchmark_e2e)
+
+    memory_parser = subparsers.add_parser("memory", help="Peak memory of whole-text vs. streaming evaluation.")
+    memory_parser.add_argument("--pages", type=int, default=1000, help="Pages of the synthetic paper.")
+    memory_parser.add_argument("--max-in-flight", type=int, default=8)
+    memory_parser.add_argument("--mode", choices=["whole", "stream"], help=argparse.SUPPRESS)
+    memory_parser.add_argument("--input", help=argparse.SUPPRESS)
+    memory_parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    memory_parser.set_defaults(func=benchmark_memory)
+
+    batch_parser = subparsers.add_parser("batch", help="Whole-paper agents: one request at a time vs. analyze_many.")
+    batch_parser.add_argument("--input-dir", default=PREPROCESSED_DIR)
+    batch_parser.add_argument("--papers", type=int, default=8)
+    batch_parser.add_argument("--batch-size", type=int, default=4)
+    add_server_arguments(batch_parser)
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    prefill_parser = subparsers.add_parser("prefill", help="Prefill per chunk of the coherence prompt layouts.")
+    prefill_parser.add_argument("--pages", type=int, default=100, help="Pages of the synthetic paper.")
+    add_server_arguments(prefill_parser)
+    prefill_parser.set_defaults(func=benchmark_prefill)
+
+    sections_parser = subparsers.add_parser("sections", help="Prompt tokens per agent with and without section routing.")
+    sections_parser.add_argument("--input-dir", default=PREPROCESSED_DIR)
+    sections_parser.add_argument("--papers", type=int, default=1000)
+    sections_parser.set_defaults(func=benchmark_sections)
+
+    startup_parser = subparsers.add_parser("startup", help="Cold-start time of main.py and of each agent.")
+    startup_parser.add_argument("--repeats", type=int, default=5)
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
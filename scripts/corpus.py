@@ -0,0 +1,68 @@
+import os
+import glob
+import zlib
+import argparse
+
+
+def parse_shard(value):
+    """
+    Parse a "--shard i/n" argument.
+    Args:
+        value (str): Shard index and shard count, e.g. "0/4" for the first of four shards.
+    Returns:
+        tuple: (index, count), with 0 <= index < count.
+    Raises:
+        argparse.ArgumentTypeError: If the value is not of the form i/n.
+    """
+    index, _, count = value.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, e.g. 0/4, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{count - 1}, got {value!r}")
+    return index, count
+
+
+def paper_shard(path, count):
+    """
+    Return the shard a paper belongs to. Papers are assigned by the name of the file without
+    its extension, so a PDF and the text files made from it land in the same shard, and the
+    assignment does not depend on the other files in the corpus or on the machine.
+    Args:
+        path (str): Path of the paper, e.g. Data/All_papers/P006.pdf.
+        count (int): Number of shards.
+    Returns:
+        int: Shard index.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return zlib.crc32(name.encode("utf-8")) % count
+
+
+def select_papers(patterns, shard=None):
+    """
+    List the papers matching glob patterns, keeping those of one shard.
+    Args:
+        patterns (list): Glob patterns, e.g. ["Data/All_papers/P0*.pdf"].
+        shard (tuple): (index, count) from parse_shard, or None for every paper.
+    Returns:
+        list: Matching file paths, sorted and without duplicates.
+    """
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern) if os.path.isfile(path)})
+    if shard is None:
+        return paths
+    index, count = shard
+    return [path for path in paths if paper_shard(path, count) == index]
+
+
+def add_selection_arguments(parser, default_pattern):
+    """
+    Add the --glob and --shard options that choose which papers a run processes.
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend.
+        default_pattern (str): Glob used when --glob is not given.
+    """
+    parser.add_argument("--glob", action="append", metavar="PATTERN",
+                        help=f"Papers to process (repeatable). Default: {default_pattern}.")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only process shard I of N (0-based), so several machines can split a corpus.")
@@ -1,9 +1,37 @@
 import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import multiprocessing.connection
 from PyPDF2 import PdfReader
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from scripts.pipeline_manifest import PipelineManifest, file_hash
+from scripts.corpus import add_selection_arguments, select_papers
+
 # Directory paths
-INPUT_DIR = "F:/IIT-K-H/new/Data/All_papers"  # Folder containing PDF files
-OUTPUT_DIR = "F:/IIT-K-H/new/Data/extracted_text"  # Folder to save extracted text
+INPUT_DIR = "Data/All_papers"  # Folder containing PDF files
+OUTPUT_DIR = "Data/extracted_text"  # Folder to save extracted text
+
+# Parallel extraction settings
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_TIMEOUT = 120  # Seconds allowed per PDF before its worker is killed
+
+def iter_pdf_pages(pdf_path):
+    """
+    Extract the text of a PDF one page at a time.
+    Args:
+        pdf_path (str): Path to the PDF file.
+    Yields:
+        str: Text of each page.
+    """
+    reader = PdfReader(pdf_path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
 
 def extract_text_from_pdf(pdf_path):
     """
@@ -14,11 +42,7 @@ def extract_text_from_pdf(pdf_path):
         str: Extracted text.
     """
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text.strip()
+        return "".join(iter_pdf_pages(pdf_path)).strip()
     except Exception as e:
         print(f"Error extracting text from {pdf_path}: {e}")
         return None
@@ -33,25 +57,196 @@ def save_text_to_file(text, output_path):
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(text)
 
+def extract_pdf_to_file(pdf_path, output_path):
+    """
+    Stream the text of a PDF to a file page by page.
+
+    The output matches extract_text_from_pdf: pages are concatenated and leading and
+    trailing whitespace of the whole document is dropped. Text is written to a
+    temporary file that only replaces output_path once extraction succeeds.
+    Args:
+        pdf_path (str): Path to the PDF file.
+        output_path (str): Path to save the text file.
+    Returns:
+        dict: Report with the number of pages and characters, elapsed time and status.
+    """
+    start = time.perf_counter()
+    report = {"file": pdf_path, "output": output_path, "pages": 0, "chars": 0}
+    tmp_path = f"{output_path}.part"
+    try:
+        trailing = ""  # Whitespace held back until more text follows it
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for page_text in iter_pdf_pages(pdf_path):
+                report["pages"] += 1
+                if report["chars"] == 0:
+                    page_text = page_text.lstrip()
+                stripped = page_text.rstrip()
+                if stripped:
+                    f.write(trailing + stripped)
+                    report["chars"] += len(trailing) + len(stripped)
+                    trailing = page_text[len(stripped):]
+                else:
+                    trailing += page_text
+        if report["chars"] == 0:
+            raise ValueError("no text found")
+        os.replace(tmp_path, output_path)
+        report["status"] = "ok"
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        report["status"] = "failed"
+        report["error"] = str(e)
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+def _extract_worker(pdf_path, output_path, connection):
+    # Entry point of the worker processes; each one reports through its own pipe
+    connection.send(extract_pdf_to_file(pdf_path, output_path))
+    connection.close()
+
+def extract_parallel(jobs, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """
+    Extract several PDFs in worker processes.
+
+    Each PDF runs in its own process, which sends its report back through its own pipe,
+    so a PDF exceeding the timeout can be killed without affecting the rest of the batch.
+    Args:
+        jobs (list): List of (pdf_path, output_path) tuples.
+        workers (int): Maximum number of PDFs extracted at the same time.
+        timeout (float): Seconds allowed per PDF.
+    Yields:
+        dict: Extraction report of each PDF, in completion order.
+    """
+    pending = list(jobs)
+    running = {}  # Receiving end of the worker's pipe -> (process, start time, pdf_path, output_path)
+
+    def failed(pdf_path, output_path, error, started):
+        return {"file": pdf_path, "output": output_path, "pages": 0, "chars": 0,
+                "status": "failed", "error": error, "elapsed": time.perf_counter() - started}
+
+    while pending or running:
+        while pending and len(running) < workers:
+            pdf_path, output_path = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_extract_worker, args=(pdf_path, output_path, sender), daemon=True
+            )
+            process.start()
+            # Only the worker holds the sending end now, so its exit without a report reads as EOF
+            sender.close()
+            running[receiver] = (process, time.perf_counter(), pdf_path, output_path)
+
+        for receiver in multiprocessing.connection.wait(list(running), timeout=0.1):
+            process, started, pdf_path, output_path = running.pop(receiver)
+            try:
+                report = receiver.recv()
+            except EOFError:
+                report = None
+            receiver.close()
+            process.join()
+            yield report or failed(pdf_path, output_path, f"worker exited with code {process.exitcode}", started)
+
+        # Kill workers that ran out of time, unless their report has just arrived
+        now = time.perf_counter()
+        for receiver, (process, started, pdf_path, output_path) in list(running.items()):
+            if now - started <= timeout or receiver.poll():
+                continue
+            process.terminate()
+            process.join()
+            running.pop(receiver)
+            receiver.close()
+            if os.path.exists(f"{output_path}.part"):
+                os.remove(f"{output_path}.part")
+            yield failed(pdf_path, output_path, f"timed out after {timeout}s", started)
+
+def extract_serial(jobs):
+    """
+    Extract several PDFs one after another in the current process.
+    Args:
+        jobs (list): List of (pdf_path, output_path) tuples.
+    Yields:
+        dict: Extraction report of each PDF.
+    """
+    for pdf_path, output_path in jobs:
+        yield extract_pdf_to_file(pdf_path, output_path)
+
+def print_report(reports, elapsed):
+    """
+    Print a per-file summary of an extraction run.
+    Args:
+        reports (list): Extraction reports.
+        elapsed (float): Wall-clock time of the whole run in seconds.
+    """
+    print(f"\n{'File':<30} {'Pages':>6} {'Chars':>10} {'Time (s)':>9}  Status")
+    for report in sorted(reports, key=lambda r: r["file"]):
+        status = report["status"] if report["status"] == "ok" else f"{report['status']}: {report['error']}"
+        print(f"{os.path.basename(report['file']):<30} {report['pages']:>6} {report['chars']:>10} "
+              f"{report['elapsed']:>9.2f}  {status}")
+    failures = sum(1 for report in reports if report["status"] != "ok")
+    print(f"\n{len(reports)} files, {sum(r['pages'] for r in reports)} pages, "
+          f"{failures} failures in {elapsed:.1f}s")
+
 def main():
+    parser = argparse.ArgumentParser(description="Extract text from the PDF papers.")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Folder containing PDF files.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Folder to save extracted text.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Number of worker processes; 0 extracts serially in this process.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds allowed per PDF (parallel mode only).")
+    parser.add_argument("--report", help="Where to save the per-file report. Default: extraction_report.json "
+                                         "next to the output folder.")
+    parser.add_argument("--force", action="store_true", help="Re-extract PDFs that have not changed.")
+    add_selection_arguments(parser, "*.pdf in --input-dir")
+    tracing.add_tracing_arguments(parser)
+    args = parser.parse_args()
+
     # Create the output directory if it doesn't exist
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    # The manifest and report live in the data folder that holds the output folder
+    data_dir = os.path.dirname(os.path.normpath(args.output_dir))
+    manifest = PipelineManifest(os.path.join(data_dir, "pipeline_manifest.json"))
+    report_path = args.report or os.path.join(data_dir, "extraction_report.json")
 
-    # Process each PDF in the input directory
-    for file_name in os.listdir(INPUT_DIR):
-        if file_name.endswith(".pdf"):
-            pdf_path = os.path.join(INPUT_DIR, file_name)
-            output_path = os.path.join(OUTPUT_DIR, f"{os.path.splitext(file_name)[0]}.txt")
+    # Collect the PDFs that changed since the last run
+    jobs = []
+    pdf_hashes = {}
+    for pdf_path in select_papers(args.glob or [os.path.join(args.input_dir, "*.pdf")], args.shard):
+        file_name = os.path.basename(pdf_path)
+        output_path = os.path.join(args.output_dir, f"{os.path.splitext(file_name)[0]}.txt")
 
-            print(f"Processing file: {file_name}")
-            text = extract_text_from_pdf(pdf_path)
+        pdf_hashes[pdf_path] = file_hash(pdf_path)
+        if not args.force and manifest.is_current("extract", file_name, pdf_hashes[pdf_path]):
+            print(f"Skipping unchanged file: {file_name}")
+            continue
+        jobs.append((pdf_path, output_path))
 
-            if text:
-                save_text_to_file(text, output_path)
-                print(f"Extracted text saved to: {output_path}")
+    start = time.perf_counter()
+    if args.workers > 0:
+        extraction = extract_parallel(jobs, args.workers, args.timeout)
+    else:
+        extraction = extract_serial(jobs)
+
+    reports = []
+    with tracing.traced_run(args):
+        for report in extraction:
+            reports.append(report)
+            file_name = os.path.basename(report["file"])
+            # Extraction runs in worker processes, so its span is recorded from the report
+            tracing.record("pdf_parse", report["elapsed"], file=file_name, status=report["status"],
+                           pages=report["pages"], chars=report["chars"])
+            if report["status"] == "ok":
+                manifest.record("extract", file_name, pdf_hashes[report["file"]], report["output"])
+                print(f"Extracted text saved to: {report['output']}")
             else:
-                print(f"Failed to extract text from: {file_name}")
+                print(f"Failed to extract text from: {file_name} ({report['error']})")
+    elapsed = time.perf_counter() - start
+
+    print_report(reports, elapsed)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"elapsed": elapsed, "workers": args.workers, "files": reports}, f, indent=2)
 
 if __name__ == "__main__":
     main()
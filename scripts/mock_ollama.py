@@ -0,0 +1,368 @@
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default settings
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 11435
+DEFAULT_LATENCY = 0.02  # Seconds before the model starts on a request
+DEFAULT_PREFILL_RATE = 20000  # Prompt tokens processed per second; 0 means instant
+DEFAULT_TOKEN_RATE = 400  # Reply tokens generated per second; 0 means instant
+DEFAULT_PARALLEL = 4  # Requests generated at the same time, like OLLAMA_NUM_PARALLEL
+DEFAULT_MODE = "json"
+
+# Rough average used to count prompt tokens, as in agents/chunking.py
+CHARS_PER_TOKEN = 4
+
+
+def tokenize(text):
+    """
+    Turn text into fake token ids, one per CHARS_PER_TOKEN characters, so that texts
+    sharing a prefix share the tokens of that prefix.
+    Args:
+        text (str): Text to tokenize.
+    Returns:
+        list: Token ids.
+    """
+    return [
+        zlib.crc32(text[i:i + CHARS_PER_TOKEN].encode("utf-8")) & 0xFFFF
+        for i in range(0, len(text), CHARS_PER_TOKEN)
+    ]
+
+CANNED_RESPONSE = json.dumps({
+    "score": 0.8,
+    "explanation": "The text is logically organised, arguments are clear and terminology is consistent."
+})
+CANNED_FUSED_RESPONSE = json.dumps({
+    "coherence": {"score": 0.8, "explanation": "Arguments follow logically and terminology is consistent."},
+    "ethics": {"score": 0.9, "explanation": "No ethical concerns are apparent in the methods described."},
+    "novelty": {"score": 0.6, "explanation": "The approach extends known techniques in a modest way."},
+})
+# Models tend to keep writing after the JSON object; streaming clients can stop before this part
+CANNED_PROSE = (
+    "\n\nI assigned this score because the chunk presents its arguments in a logical order, "
+    "uses consistent terminology throughout and connects its ideas to the broader narrative of "
+    "the paper. Some transitions could be smoother, but overall the text reads coherently."
+)
+
+# Reply styles seen from real models: JSON followed by prose, a fenced block, or prose only.
+# Prose-only replies cannot be parsed as JSON, so they exercise the parser's fallbacks and repairs.
+RESPONSE_MODES = {
+    "json": lambda obj: obj + CANNED_PROSE,
+    "fenced": lambda obj: f"Here is my evaluation:\n```json\n{obj}\n```" + CANNED_PROSE,
+    "prose": lambda obj: (
+        "Score: 0.8\nExplanation: The text is logically organised, arguments are clear and "
+        "terminology is consistent." + CANNED_PROSE
+    ),
+}
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Request handler answering the subset of the Ollama API used by the agents.
+    """
+    server_version = "MockOllama/0.2"
+    protocol_version = "HTTP/1.1"  # Keep connections alive like the real server
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_for(self, prompt, json_format=False):
+        # Answer multi-criteria prompts with one object per criterion
+        if '"coherence":' in prompt and '"novelty":' in prompt:
+            reply = CANNED_FUSED_RESPONSE
+        else:
+            reply = CANNED_RESPONSE
+        # Requests constrained to JSON get bare JSON, as Ollama enforces the format
+        if json_format:
+            return reply
+        return RESPONSE_MODES[self.server.mode](reply)
+
+    def _stream_generate(self, common, pieces):
+        # Send the reply as newline-delimited JSON pieces using chunked transfer encoding
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, piece in enumerate(pieces):
+                time.sleep(self.server.generation_time(1))
+                done = i == len(pieces) - 1
+                if done:
+                    message = {**common, "response": piece}
+                else:
+                    message = {"model": common["model"], "created_at": common["created_at"],
+                               "response": piece, "done": False}
+                data = (json.dumps(message) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, as streaming agents do once they have their answer
+            self.server.record_request("cancelled")
+            self.close_connection = True
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "llama3.2"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        self.server.record_request(self.path)
+        if self.server.should_fail():
+            self.server.record_request("injected_errors")
+            self._send_json({"error": "injected failure"}, status=self.server.error_status)
+            return
+
+        if self.path == "/api/chat":
+            prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        else:
+            prompt = request.get("prompt", "")
+        reply = self._reply_for(prompt, json_format=bool(request.get("format")))
+        pieces = re.findall(r"\S+\s*", reply)
+        num_predict = (request.get("options") or {}).get("num_predict")
+        truncated = bool(num_predict) and len(pieces) > num_predict
+        if truncated:
+            pieces = pieces[:num_predict]
+        # A context from an earlier reply goes before the prompt, as Ollama does
+        tokens = list(request.get("context") or []) + tokenize(prompt)
+
+        # Only `parallel` requests are worked on at once; the others queue, as on a real server
+        with self.server.slots:
+            # Tokens already in a slot's cache are not processed again
+            prompt_tokens = len(tokens) - self.server.cached_prefix(tokens, tokenize("".join(pieces)))
+            prefill = self.server.latency + self.server.prefill_time(prompt_tokens)
+            time.sleep(prefill)
+            common = {
+                "model": request.get("model", "llama3.2"),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "done_reason": "length" if truncated else "stop",
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(pieces),
+                "eval_duration": int(self.server.generation_time(len(pieces)) * 1e9),
+            }
+            if self.path == "/api/generate":
+                # Lets the client continue from this point without sending the prompt again
+                common["context"] = tokens + tokenize("".join(pieces))
+            if self.path == "/api/chat":
+                time.sleep(self.server.generation_time(len(pieces)))
+                self._send_json({**common, "message": {"role": "assistant", "content": "".join(pieces)}})
+            elif request.get("stream", True):
+                self._stream_generate(common, pieces)
+            else:
+                time.sleep(self.server.generation_time(len(pieces)))
+                self._send_json({**common, "response": "".join(pieces)})
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, latency=DEFAULT_LATENCY,
+                 prefill_rate=DEFAULT_PREFILL_RATE, token_rate=DEFAULT_TOKEN_RATE, parallel=DEFAULT_PARALLEL,
+                 error_rate=0.0, error_status=503, mode=DEFAULT_MODE, seed=0, prompt_cache=True):
+        """
+        Initialize the mock server.
+
+        Each request waits for one of `parallel` slots, then takes latency plus its prompt
+        tokens at prefill_rate before the first token, then one token every 1/token_rate seconds.
+        Like Ollama, each slot keeps the tokens of its last request, and the part of a new
+        prompt that repeats one of them from the start is not processed again.
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind; 0 picks a free port.
+            latency (float): Fixed seconds before the model starts on a request.
+            prefill_rate (float): Prompt tokens processed per second; 0 means instant.
+            token_rate (float): Reply tokens generated per second; 0 means instant.
+            parallel (int): Requests worked on at the same time; the others queue.
+            error_rate (float): Fraction of requests answered with error_status instead.
+            error_status (int): HTTP status of the injected errors.
+            mode (str): Reply style: "json", "fenced" or "prose".
+            seed (int): Seed for the error injection, so runs are repeatable.
+            prompt_cache (bool): Reuse cached prompt prefixes; when False every prompt token is processed.
+        """
+        super().__init__((host, port), MockOllamaHandler)
+        self.latency = latency
+        self.prefill_rate = prefill_rate
+        self.token_rate = token_rate
+        self.parallel = max(parallel, 1)
+        self.slots = threading.BoundedSemaphore(self.parallel)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.mode = mode
+        self.request_counts = {}
+        self.prompt_cache = prompt_cache
+        self._slot_tokens = []  # Tokens of the latest requests, one entry per slot, most recent first
+        self._random = random.Random(seed)
+        self._counts_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def prefill_time(self, tokens):
+        return tokens / self.prefill_rate if self.prefill_rate else 0.0
+
+    def generation_time(self, tokens):
+        return tokens / self.token_rate if self.token_rate else 0.0
+
+    def cached_prefix(self, tokens, reply_tokens):
+        """
+        Find how many leading tokens of a request are cached in a slot, and cache the
+        request with its reply in that slot, or in the least recently used one.
+        Args:
+            tokens (list): Context and prompt tokens of the request.
+            reply_tokens (list): Tokens of the reply.
+        Returns:
+            int: Number of leading tokens that need no processing.
+        """
+        if not self.prompt_cache:
+            return 0
+        with self._counts_lock:
+            best, best_length = None, 0
+            for i, cached in enumerate(self._slot_tokens):
+                length = 0
+                for a, b in zip(cached, tokens):
+                    if a != b:
+                        break
+                    length += 1
+                if length > best_length:
+                    best, best_length = i, length
+            if best is not None:
+                del self._slot_tokens[best]
+            elif len(self._slot_tokens) >= self.parallel:
+                self._slot_tokens.pop()
+            self._slot_tokens.insert(0, tokens + reply_tokens)
+            # The last prompt token is always processed, to produce the first reply token
+            return min(best_length, len(tokens) - 1) if tokens else 0
+
+    def handle_error(self, request, client_address):
+        # Clients closing idle keep-alive connections is normal; report anything else
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def should_fail(self):
+        with self._counts_lock:
+            return self._random.random() < self.error_rate
+
+    def record_request(self, path):
+        with self._counts_lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def start(self):
+        """
+        Serve requests on a background thread.
+        Returns:
+            MockOllamaServer: The running server.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_server_arguments(parser):
+    """
+    Add the mock server's timing, failure and reply options to an argument parser.
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend.
+    """
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help="Fixed seconds before the model starts on a request.")
+    parser.add_argument("--prefill-rate", type=float, default=DEFAULT_PREFILL_RATE,
+                        help="Prompt tokens processed per second (0 = instant).")
+    parser.add_argument("--token-rate", type=float, default=DEFAULT_TOKEN_RATE,
+                        help="Reply tokens generated per second (0 = instant).")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL,
+                        help="Requests worked on at the same time.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests that fail with --error-status.")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--mode", choices=sorted(RESPONSE_MODES), default=DEFAULT_MODE,
+                        help="Style of the replies.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the error injection.")
+    parser.add_argument("--no-prompt-cache", action="store_true",
+                        help="Process every prompt token, instead of reusing prefixes cached in the slots.")
+
+
+def server_from_args(args, host=DEFAULT_HOST, port=0):
+    """
+    Build a mock server from options added by add_server_arguments.
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+    Returns:
+        MockOllamaServer: The server, not yet started.
+    """
+    return MockOllamaServer(
+        host, port, latency=args.latency, prefill_rate=args.prefill_rate, token_rate=args.token_rate,
+        parallel=args.parallel, error_rate=args.error_rate, error_status=args.error_status,
+        mode=args.mode, seed=args.seed, prompt_cache=not args.no_prompt_cache
+    )
+
+
+def server_config(server):
+    """
+    Describe a server's settings, e.g. to label benchmark results.
+    Args:
+        server (MockOllamaServer): The server.
+    Returns:
+        dict: Timing, failure and reply settings.
+    """
+    return {
+        "latency": server.latency,
+        "prefill_rate": server.prefill_rate,
+        "token_rate": server.token_rate,
+        "parallel": server.parallel,
+        "error_rate": server.error_rate,
+        "mode": server.mode,
+        "prompt_cache": server.prompt_cache,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server for local benchmarking.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.host, args.port)
+    print(f"Mock Ollama server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
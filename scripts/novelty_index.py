@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.text_features import hashed_term_counts, DEFAULT_NGRAMS
+
+# Directory paths
+INPUT_DIR = "Data/preprocessed_text"  # Papers to index, in the format main.py queries with
+INDEX_DIR = "Data/novelty_index"  # vectors.f32 (memory-mapped) and meta.json
+
+# Index settings
+DEFAULT_INDEX_DIMENSIONS = 2 ** 14  # Hashed TF-IDF buckets; must be a power of two
+DEFAULT_NEIGHBORS = 5
+INITIAL_CAPACITY = 64  # Rows allocated in the vector file; doubled when full
+TEXT_FORMAT = "preprocessed"  # Text the index is built from; indexes of another format are rebuilt
+
+
+class NoveltyIndex:
+    def __init__(self, path=INDEX_DIR, dimensions=DEFAULT_INDEX_DIMENSIONS, ngrams=DEFAULT_NGRAMS):
+        """
+        Open or create a nearest-neighbor index of papers over hashed TF-IDF vectors.
+
+        Log-scaled term counts are stored in a memory-mapped float32 file, one row per
+        paper, and document frequencies in meta.json. IDF weights depend on the whole
+        corpus, so they are applied at query time: the weighted, normalised matrix is
+        built once after each batch of inserts and every query is one matrix-vector product.
+        Args:
+            path (str): Directory holding the index files.
+            dimensions (int): Number of hash buckets; ignored when the index exists.
+            ngrams (tuple): N-gram lengths to use; ignored when the index exists.
+        """
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.Lock()
+        self._weighted = None
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dimensions = meta["dimensions"]
+            self.ngrams = tuple(meta["ngrams"])
+            self.capacity = meta["capacity"]
+            self.names = meta["names"]
+            self.document_frequency = np.array(meta["document_frequency"], dtype=np.float64)
+            # Indexes saved before the format was recorded were built from the extracted text
+            self.text_format = meta.get("text_format", "extracted")
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                     shape=(self.capacity, self.dimensions))
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.dimensions = dimensions
+            self.ngrams = tuple(ngrams)
+            self.capacity = INITIAL_CAPACITY
+            self.names = []
+            self.document_frequency = np.zeros(dimensions, dtype=np.float64)
+            self.text_format = TEXT_FORMAT
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+",
+                                     shape=(self.capacity, self.dimensions))
+        self.rows = {name: row for row, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def _term_vector(self, text):
+        # Log-scaled hashed term counts of a text
+        return np.log1p(hashed_term_counts(text, self.dimensions, self.ngrams)).astype(np.float32)
+
+    def _grow(self):
+        # Double the vector file, keeping the existing rows. The file is unmapped before it is
+        # resized, since Windows refuses to resize a file that is mapped.
+        self.vectors.flush()
+        mapping = self.vectors._mmap
+        del self.vectors
+        if mapping is not None:
+            mapping.close()
+        capacity = self.capacity * 2
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(capacity * self.dimensions * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(capacity, self.dimensions))
+        self.capacity = capacity
+
+    def add(self, name, text):
+        """
+        Insert a paper, or replace it if a paper with the same name is indexed.
+        Call save() after a batch of inserts to persist them.
+        Args:
+            name (str): Identifier of the paper, e.g. its file name without extension.
+            text (str): Text of the paper.
+        """
+        vector = self._term_vector(text)
+        with self._lock:
+            row = self.rows.get(name)
+            if row is None:
+                if len(self.names) == self.capacity:
+                    self._grow()
+                row = len(self.names)
+                self.names.append(name)
+                self.rows[name] = row
+            else:
+                self.document_frequency -= self.vectors[row] > 0
+            self.vectors[row] = vector
+            self.document_frequency += vector > 0
+            self._weighted = None
+
+    def save(self):
+        """
+        Flush the vectors and atomically rewrite the metadata.
+        """
+        with self._lock:
+            self.vectors.flush()
+            meta = {
+                "dimensions": self.dimensions,
+                "ngrams": list(self.ngrams),
+                "capacity": self.capacity,
+                "names": self.names,
+                "document_frequency": self.document_frequency.astype(int).tolist(),
+                "text_format": self.text_format,
+            }
+            temp_path = f"{self.meta_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(temp_path, self.meta_path)
+
+    def _idf(self):
+        # Smoothed inverse document frequency, as in scikit-learn
+        return (np.log((1 + len(self.names)) / (1 + self.document_frequency)) + 1).astype(np.float32)
+
+    def _weighted_matrix(self):
+        # IDF-weighted, L2-normalised rows of every indexed paper, rebuilt after inserts
+        with self._lock:
+            if self._weighted is None:
+                idf = self._idf()
+                matrix = np.asarray(self.vectors[:len(self.names)]) * idf
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1
+                self._weighted = (matrix / norms, idf)
+            return self._weighted
+
+    def nearest(self, text, k=DEFAULT_NEIGHBORS, exclude=None):
+        """
+        Find the indexed papers most similar to a text.
+        Args:
+            text (str): Text of the query paper.
+            k (int): Number of neighbors to return.
+            exclude (str): Name of an indexed paper to leave out, e.g. the query paper itself.
+        Returns:
+            list: (name, cosine similarity) pairs, most similar first.
+        """
+        return self.nearest_vector(self._term_vector(text), k, exclude)
+
+    def nearest_vector(self, vector, k=DEFAULT_NEIGHBORS, exclude=None):
+        """
+        Find the indexed papers most similar to a term vector from _term_vector.
+        """
+        matrix, idf = self._weighted_matrix()
+        if not len(matrix):
+            return []
+        query = vector * idf
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        similarities = matrix @ (query / norm)
+        if exclude in self.rows:
+            similarities[self.rows[exclude]] = -1
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(self.names[row], float(similarities[row])) for row in top if similarities[row] >= 0]
+
+    def novelty(self, text, k=DEFAULT_NEIGHBORS, exclude=None):
+        """
+        Score how different a paper is from the closest paper in the index.
+        Args:
+            text (str): Text of the paper.
+            k (int): Number of neighbors to report.
+            exclude (str): Name of an indexed paper to leave out.
+        Returns:
+            dict: 'score' (1 minus the highest similarity), 'max_similarity' and 'neighbors'.
+        """
+        neighbors = self.nearest(text, k, exclude)
+        max_similarity = neighbors[0][1] if neighbors else 0.0
+        return {
+            "score": 1.0 - max_similarity,
+            "max_similarity": max_similarity,
+            "neighbors": [{"name": name, "similarity": round(similarity, 4)} for name, similarity in neighbors],
+        }
+
+
+def load_novelty_index(path=INDEX_DIR):
+    """
+    Open an existing index.
+    Args:
+        path (str): Directory holding the index files.
+    Returns:
+        NoveltyIndex: The index, or None if none has been built at path.
+    """
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    return NoveltyIndex(path)
+
+
+def build_index(input_dir=INPUT_DIR, index_dir=INDEX_DIR, rebuild=False):
+    """
+    Add the papers of a folder that are not indexed yet.
+    Args:
+        input_dir (str): Folder with preprocessed text files, which main.py queries the index with.
+        index_dir (str): Directory holding the index files.
+        rebuild (bool): Re-index every paper, not only new ones.
+    Returns:
+        NoveltyIndex: The updated index.
+    """
+    index = NoveltyIndex(index_dir)
+    if index.text_format != TEXT_FORMAT:
+        # Similarities between texts of different formats are biased, so re-index every paper
+        print(f"Index was built from {index.text_format} text; re-indexing from {TEXT_FORMAT} text")
+        index.text_format = TEXT_FORMAT
+        rebuild = True
+    added = 0
+    for filename in sorted(os.listdir(input_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        name = os.path.splitext(filename)[0]
+        if name in index and not rebuild:
+            continue
+        with open(os.path.join(input_dir, filename), "r", encoding="utf-8") as f:
+            index.add(name, f.read())
+        added += 1
+    index.save()
+    print(f"Indexed {added} new papers; {len(index)} papers in {index_dir}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the novelty index of the corpus.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="Re-index papers that are already indexed.")
+    parser.add_argument("--query", help="Text file to find the nearest neighbors of, instead of building.")
+    parser.add_argument("-k", type=int, default=DEFAULT_NEIGHBORS)
+    args = parser.parse_args()
+
+    if args.query is None:
+        start = time.perf_counter()
+        build_index(args.input_dir, args.index_dir, args.rebuild)
+        print(f"Done in {time.perf_counter() - start:.1f}s")
+        return
+
+    index = load_novelty_index(args.index_dir)
+    if index is None:
+        print(f"No index in {args.index_dir}; build it first.")
+        return
+    with open(args.query, "r", encoding="utf-8") as f:
+        text = f.read()
+    name = os.path.splitext(os.path.basename(args.query))[0]
+    result = index.novelty(text, args.k, exclude=name)
+    print(f"Novelty of {name}: {result['score']:.3f}")
+    for neighbor in result["neighbors"]:
+        print(f"  {neighbor['name']}: similarity {neighbor['similarity']:.3f}")
+
+if __name__ == "__main__":
+    main()
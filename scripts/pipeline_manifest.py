@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import threading
+
+# Default locations
+MANIFEST_PATH = "Data/pipeline_manifest.json"
+CHECKPOINT_PATH = "Data/evaluation_results.jsonl"
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Compute the SHA-256 content hash of a file.
+    Args:
+        path (str): Path to the file.
+        block_size (int): Number of bytes read at a time.
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(*parts):
+    """
+    Compute the SHA-256 hash of one or more strings.
+    Args:
+        *parts (str): Strings to hash, in order.
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    def __init__(self, path=MANIFEST_PATH):
+        """
+        Initialize the manifest recording which inputs each pipeline stage has processed.
+
+        The manifest is a JSON file of the form
+        {stage: {name: {"input_hash": ..., "output_path": ..., ...}}}.
+        Args:
+            path (str): Path to the manifest file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_current(self, stage, name, input_hash):
+        """
+        Check whether an input was already processed with the same content.
+        Args:
+            stage (str): Pipeline stage ("extract", "preprocess" or "evaluate").
+            name (str): Name of the input (usually its file name).
+            input_hash (str): Current content hash of the input.
+        Returns:
+            bool: True if the stage can skip this input.
+        """
+        with self._lock:
+            entry = self.entries.get(stage, {}).get(name)
+        if entry is None or entry.get("input_hash") != input_hash:
+            return False
+        output_path = entry.get("output_path")
+        return output_path is None or os.path.exists(output_path)
+
+    def record(self, stage, name, input_hash, output_path=None, **extra):
+        """
+        Record that an input was processed and save the manifest.
+        Args:
+            stage (str): Pipeline stage.
+            name (str): Name of the input.
+            input_hash (str): Content hash of the input.
+            output_path (str): Path of the produced output, if any.
+            **extra: Additional fields stored with the entry.
+        """
+        entry = {"input_hash": input_hash, "output_path": output_path, **extra}
+        if output_path is not None and os.path.exists(output_path):
+            entry["output_hash"] = file_hash(output_path)
+        with self._lock:
+            self.entries.setdefault(stage, {})[name] = entry
+            self._save()
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a truncated manifest
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class CheckpointLog:
+    def __init__(self, path=CHECKPOINT_PATH):
+        """
+        Initialize an append-only JSONL log of per-paper evaluation results.
+        Args:
+            path (str): Path to the JSONL file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, filename, fingerprint, result):
+        """
+        Append one evaluation result and flush it to disk.
+        Args:
+            filename (str): Name of the evaluated paper.
+            fingerprint (str): Fingerprint of the paper text and evaluation settings.
+            result (dict): Evaluation result.
+        """
+        line = json.dumps({"filename": filename, "fingerprint": fingerprint, "result": result})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """
+        Load the latest checkpointed record of every paper.
+        A truncated last line, left behind by an interrupted run, is ignored.
+        Returns:
+            dict: Mapping of filename to {"fingerprint": ..., "result": ...}.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["filename"]] = record
+        return records
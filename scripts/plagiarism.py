@@ -0,0 +1,291 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Directory paths
+INPUT_DIR = "Data/extracted_text"  # Corpus to compare papers against
+REPORT_PATH = "Data/plagiarism_report.json"
+
+# Fingerprint settings
+SHINGLE_WORDS = 8  # Words per shingle; shorter overlaps are ignored
+WINDOW = 4  # Winnowing window: any overlap of SHINGLE_WORDS + WINDOW - 1 words is always detected
+MAX_DOCUMENT_FREQUENCY = 0.05  # Shingles in more than this share of papers are boilerplate
+MIN_SHARED = 5  # Shared fingerprints needed to report a paper as overlapping
+MAX_SPANS = 5  # Longest overlapping spans reported per matching paper
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fingerprint(text, shingle_words=SHINGLE_WORDS, window=WINDOW):
+    """
+    Select winnowing fingerprints of a text.
+
+    The text is split into overlapping shingles of shingle_words words, each shingle is
+    hashed, and the smallest hash of every window of consecutive shingles is kept. Matching
+    text of at least shingle_words + window - 1 words is then guaranteed to share a
+    fingerprint, while only about 2 / (window + 1) of the shingles are stored.
+    Args:
+        text (str): Text to fingerprint.
+        shingle_words (int): Words per shingle.
+        window (int): Shingles per winnowing window.
+    Returns:
+        list: (hash, start, end) per fingerprint, with the character span of its shingle.
+    """
+    words = [(match.group(), match.start(), match.end()) for match in WORD_PATTERN.finditer(text.lower())]
+    shingles = [
+        (zlib.crc32(" ".join(word for word, _, _ in words[i:i + shingle_words]).encode("utf-8")),
+         words[i][1], words[i + shingle_words - 1][2])
+        for i in range(len(words) - shingle_words + 1)
+    ]
+    if len(shingles) <= window:
+        return [min(shingles)] if shingles else []
+
+    fingerprints = []
+    selected = -1
+    for start in range(len(shingles) - window + 1):
+        # Rightmost minimum of the window, so a minimum shared by windows is recorded once
+        best = start
+        for i in range(start + 1, start + window):
+            if shingles[i][0] <= shingles[best][0]:
+                best = i
+        if best != selected:
+            fingerprints.append(shingles[best])
+            selected = best
+    return fingerprints
+
+
+def fingerprint_file(path):
+    """
+    Fingerprint a text file; runs in worker processes.
+    Args:
+        path (str): Path to the text file.
+    Returns:
+        tuple: (name, fingerprints), with the file name without extension as name.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return os.path.splitext(os.path.basename(path))[0], fingerprint(f.read())
+
+
+def _merge_spans(matches, gap):
+    """
+    Merge matched fingerprints that are close together, both in the paper and in the
+    source, into spans.
+    Args:
+        matches (list): (start, end, source_start, source_end) per shared fingerprint.
+        gap (int): Largest distance in characters between fingerprints of one span.
+    Returns:
+        list: Merged spans, longest first.
+    """
+    spans = []
+    for start, end, source_start, source_end in sorted(matches):
+        if (spans and start <= spans[-1]["end"] + gap
+                and spans[-1]["source_start"] <= source_start <= spans[-1]["source_end"] + gap):
+            span = spans[-1]
+            span["end"] = max(span["end"], end)
+            span["source_start"] = min(span["source_start"], source_start)
+            span["source_end"] = max(span["source_end"], source_end)
+        else:
+            spans.append({"start": start, "end": end, "source_start": source_start, "source_end": source_end})
+    return sorted(spans, key=lambda span: span["start"] - span["end"])
+
+
+class PlagiarismIndex:
+    def __init__(self, max_document_frequency=MAX_DOCUMENT_FREQUENCY):
+        """
+        Initialize an empty inverted index from fingerprint hashes to the papers containing them.
+        Args:
+            max_document_frequency (float): Fingerprints found in more than this share of the
+                papers are treated as boilerplate and ignored.
+        """
+        self.max_document_frequency = max_document_frequency
+        self.postings = {}
+        self.sizes = {}
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def add(self, name, fingerprints):
+        """
+        Add the fingerprints of a paper.
+        Args:
+            name (str): Identifier of the paper.
+            fingerprints (list): Output of fingerprint().
+        """
+        self.sizes[name] = len(fingerprints)
+        for hash_value, start, end in fingerprints:
+            self.postings.setdefault(hash_value, []).append((name, start, end))
+
+    def check(self, text, exclude=None, min_shared=MIN_SHARED):
+        """
+        Find indexed papers that share text with a paper.
+
+        Each fingerprint of the paper is looked up once in the inverted index, so the
+        cost grows with the length of the paper, not with the size of the corpus.
+        Args:
+            text (str): Text of the paper.
+            exclude (str): Name of an indexed paper to leave out, e.g. the paper itself.
+            min_shared (int): Shared fingerprints needed to report a paper.
+        Returns:
+            dict: 'max_containment' (the largest share of the paper's fingerprints found in
+                one other paper) and 'matches', one dict per overlapping paper with its
+                'containment', 'similarity' (Jaccard over fingerprints) and longest 'spans'.
+        """
+        fingerprints = fingerprint(text)
+        # The paper's own postings are left out, so on a small corpus a fingerprint shared
+        # with a single other paper is not taken for boilerplate
+        others = len(self.sizes) - (exclude in self.sizes)
+        limit = max(int(self.max_document_frequency * others), 1)
+        shared = {}
+        for hash_value, start, end in fingerprints:
+            postings = [posting for posting in self.postings.get(hash_value, ()) if posting[0] != exclude]
+            if len(postings) > limit:
+                continue
+            for name, source_start, source_end in postings:
+                shared.setdefault(name, []).append((start, end, source_start, source_end))
+
+        matches = []
+        for name, hits in shared.items():
+            count = len({hit[:2] for hit in hits})
+            if count < min_shared:
+                continue
+            union = len(fingerprints) + self.sizes[name] - count
+            matches.append({
+                "name": name,
+                "shared_fingerprints": count,
+                "containment": round(count / len(fingerprints), 4),
+                "similarity": round(count / union, 4) if union else 0.0,
+                "spans": _merge_spans(hits, gap=SHINGLE_WORDS * 8)[:MAX_SPANS],
+            })
+        matches.sort(key=lambda match: -match["containment"])
+        return {
+            "max_containment": matches[0]["containment"] if matches else 0.0,
+            "matches": matches,
+        }
+
+
+def build_plagiarism_index(input_dir=INPUT_DIR, workers=DEFAULT_WORKERS):
+    """
+    Fingerprint every paper of a folder in a process pool and index the fingerprints.
+    Args:
+        input_dir (str): Folder with text files.
+        workers (int): Worker processes; 0 fingerprints in this process.
+    Returns:
+        PlagiarismIndex: The index.
+    """
+    paths = [os.path.join(input_dir, name) for name in sorted(os.listdir(input_dir)) if name.endswith(".txt")]
+    index = PlagiarismIndex()
+    if workers:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(fingerprint_file, paths, chunksize=8))
+    else:
+        results = [fingerprint_file(path) for path in paths]
+    for name, fingerprints in results:
+        index.add(name, fingerprints)
+    return index
+
+
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _check_file(path):
+    # Check one corpus paper against the rest; runs in worker processes
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "r", encoding="utf-8") as f:
+        return name, _worker_index.check(f.read(), exclude=name)
+
+
+def check_corpus(index, input_dir=INPUT_DIR, workers=DEFAULT_WORKERS):
+    """
+    Compare every paper of a folder with the rest of the index, in a process pool.
+    Args:
+        index (PlagiarismIndex): Index of the corpus.
+        input_dir (str): Folder with the text files to check.
+        workers (int): Worker processes; 0 checks in this process.
+    Returns:
+        dict: check() result per paper name.
+    """
+    paths = [os.path.join(input_dir, name) for name in sorted(os.listdir(input_dir)) if name.endswith(".txt")]
+    if not workers:
+        _init_worker(index)
+        return dict(_check_file(path) for path in paths)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(index,)) as executor:
+        return dict(executor.map(_check_file, paths, chunksize=8))
+
+
+def self_check(corpus_sizes=(2, 10, 39, 40, 100), words=2000, seed=0):
+    """
+    Check that an exact copy is found whatever the size of the corpus: each corpus holds
+    random papers plus a copy of the first one, and the copy must be fully contained in it.
+    Args:
+        corpus_sizes (tuple): Numbers of papers to try, copy included.
+        words (int): Words per synthetic paper.
+        seed (int): Seed of the random papers.
+    Returns:
+        bool: True if the copy was found in every corpus.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    ok = True
+    for size in corpus_sizes:
+        texts = {f"paper{i}": " ".join(rng.choices(vocabulary, k=words)) for i in range(size - 1)}
+        texts["copy"] = texts["paper0"]
+        index = PlagiarismIndex()
+        for name, text in texts.items():
+            index.add(name, fingerprint(text))
+        result = index.check(texts["copy"], exclude="copy")
+        found = bool(result["matches"]) and result["matches"][0]["name"] == "paper0"
+        ok = ok and found and result["max_containment"] == 1.0
+        print(f"{size:>4} papers: max_containment {result['max_containment']:.2f}"
+              f"{'' if found else ' (copy not found)'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find text shared between the papers of the corpus.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes (0 = none).")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="Containment above which a paper is listed in the summary.")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Check on synthetic corpora that an exact copy is found, then exit.")
+    args = parser.parse_args()
+
+    if args.self_check:
+        ok = self_check()
+        print("Self-check passed" if ok else "Self-check FAILED")
+        sys.exit(0 if ok else 1)
+
+    start = time.perf_counter()
+    index = build_plagiarism_index(args.input_dir, args.workers)
+    indexed = time.perf_counter() - start
+    results = check_corpus(index, args.input_dir, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {len(index)} papers in {indexed:.1f}s, checked them in {elapsed - indexed:.1f}s")
+
+    for name, result in results.items():
+        if result["max_containment"] > args.threshold:
+            top = result["matches"][0]
+            print(f"  {name}: {top['containment']:.0%} of its fingerprints appear in {top['name']} "
+                  f"(similarity {top['similarity']:.2f})")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+if __name__ == "__main__":
+    main()
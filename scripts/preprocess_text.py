@@ -1,9 +1,76 @@
 import os
 import re
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from scripts.pipeline_manifest import PipelineManifest, file_hash
+from scripts.corpus import add_selection_arguments, select_papers
 
 # Directory paths
-INPUT_DIR = "F:/IIT-K-H/new/Data/extracted_text"  # Folder with extracted text files
-OUTPUT_DIR = "F:/IIT-K-H/new/Data/preprocessed_text"  # Folder to save preprocessed text files
+INPUT_DIR = "Data/extracted_text"  # Folder with extracted text files
+OUTPUT_DIR = "Data/preprocessed_text"  # Folder to save preprocessed text files
+
+# Written next to each preprocessed text file: byte offsets of every section's content
+SECTION_INDEX_SUFFIX = ".sections.json"
+
+# Sections to extract, with the headings that introduce each of them
+SECTION_HEADINGS = {
+    "Abstract": ["Abstract"],
+    "Introduction": ["Introduction"],
+    "Methodology": ["Methodology", "Methods", "Method", "Materials and Methods"],
+    "Results": ["Results", "Experimental Results"],
+    "Discussion": ["Discussion"],
+    "Conclusion": ["Conclusion", "Conclusions", "Concluding Remarks"],
+}
+
+# Other unnumbered headings that end the preceding section
+BOUNDARY_HEADINGS = ["References", "Acknowledgments", "Acknowledgements", "Related Work", "Appendix"]
+
+# One pattern matching every heading line: a known heading in any case, optionally numbered,
+# or any top-level numbered heading such as "3 Experiments". Only the known headings ignore
+# case, so numbered lines of body text or tables ("232 labels.") are not taken for headings.
+# Group "name" holds the heading text.
+_known_headings = sorted(
+    {h for headings in SECTION_HEADINGS.values() for h in headings} | set(BOUNDARY_HEADINGS),
+    key=len, reverse=True,
+)
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:"
+    r"(?:\d+\.?[ \t]+)?(?P<name>(?i:" + "|".join(re.escape(h) for h in _known_headings) + r"))[ \t]*[:.]?"
+    r"|\d+\.?[ \t]+[A-Z][^\n]{0,80}"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+_section_of_heading = {h.lower(): section for section, headings in SECTION_HEADINGS.items() for h in headings}
+
+def find_sections(raw_text):
+    """
+    Locate the sections of a paper in a single pass over the text.
+
+    Every heading line is found with one regex scan. Each section runs from the end
+    of its first heading line to the start of the next heading of any kind.
+    Args:
+        raw_text (str): Raw text extracted from a PDF.
+    Returns:
+        dict: Mapping of section name to (start, end) character offsets into raw_text.
+            Sections that were not found are left out.
+    """
+    headings = [
+        (match.start(), match.end(), _section_of_heading.get((match.group("name") or "").lower()))
+        for match in HEADING_PATTERN.finditer(raw_text)
+    ]
+
+    offsets = {}
+    for i, (_, content_start, section) in enumerate(headings):
+        if section is None or section in offsets:
+            continue
+        content_end = headings[i + 1][0] if i + 1 < len(headings) else len(raw_text)
+        offsets[section] = (content_start, content_end)
+    return offsets
 
 def preprocess_text(raw_text):
     """
@@ -13,59 +80,232 @@ def preprocess_text(raw_text):
     Returns:
         dict: A dictionary containing structured sections.
     """
-    # Remove extra whitespaces
-    text = re.sub(r"\s+", " ", raw_text)
-
-    # Define sections to extract
-    sections = {
-        "Abstract": "",
-        "Introduction": "",
-        "Methodology": "",
-        "Results": "",
-        "Discussion": "",
-        "Conclusion": ""
-    }
-
-    # Use regex to identify sections
-    for section in sections.keys():
-        match = re.search(rf"(?i){section}[:\s]*(.*?)(?=\n[A-Z][a-z]|\Z)", text, re.DOTALL)
-        if match:
-            sections[section] = match.group(1).strip()
+    offsets = find_sections(raw_text)
+
+    # Normalise whitespace within each section only
+    sections = {}
+    for section in SECTION_HEADINGS:
+        start, end = offsets.get(section, (0, 0))
+        sections[section] = " ".join(raw_text[start:end].split())
 
     return sections
 
+def find_section_lines(lines):
+    """
+    Locate the sections of a paper line by line, as find_sections does for a whole text.
+    Args:
+        lines (iterable): Lines of the raw text, as bytes, newlines included.
+    Returns:
+        dict: Mapping of section name to (start, end) byte offsets of its content.
+    """
+    headings = []
+    offset = 0
+    for line in lines:
+        match = HEADING_PATTERN.match(line.decode("utf-8").rstrip("\r\n"))
+        if match:
+            headings.append((offset, offset + len(line), _section_of_heading.get((match.group("name") or "").lower())))
+        offset += len(line)
+
+    offsets = {}
+    for i, (_, content_start, section) in enumerate(headings):
+        if section is None or section in offsets:
+            continue
+        content_end = headings[i + 1][0] if i + 1 < len(headings) else offset
+        offsets[section] = (content_start, content_end)
+    return offsets
+
+def preprocess_file(input_path, output_path):
+    """
+    Preprocess a text file into a sections file without loading either into memory.
+
+    A first pass over the lines finds the section offsets; each section is then read
+    back line by line and written with its whitespace normalised. The output is the
+    same as save_preprocessed_text(preprocess_text(text)), and memory use is bounded
+    by the longest line rather than by the size of the paper.
+    The section index is written next to the output, see save_section_index.
+    Args:
+        input_path (str): Extracted text file.
+        output_path (str): Path to save the preprocessed text.
+    Returns:
+        tuple: (input_chars, output_chars) processed, for reporting.
+    """
+    input_chars = output_chars = 0
+    index = {}
+    with open(input_path, "rb") as source:
+        offsets = find_section_lines(source)
+        with open(output_path, "w", encoding="utf-8") as f:
+            for section in SECTION_HEADINGS:
+                start, end = offsets.get(section, (0, 0))
+                f.write(f"{section}:\n")
+                content_start = f.tell()
+                source.seek(start)
+                separator = ""
+                while source.tell() < end:
+                    line = source.readline(end - source.tell()).decode("utf-8")
+                    input_chars += len(line)
+                    for word in line.split():
+                        f.write(separator + word)
+                        output_chars += len(separator) + len(word)
+                        separator = " "
+                index[section] = (content_start, f.tell())
+                f.write("\n\n")
+    save_section_index(index, output_path)
+    return input_chars, output_chars
+
 def save_preprocessed_text(sections, output_path):
     """
-    Save the structured sections to a file.
+    Save the structured sections to a file, and their section index next to it.
     Args:
         sections (dict): Dictionary of structured sections.
         output_path (str): Path to save the preprocessed text.
     """
+    index = {}
     with open(output_path, "w", encoding="utf-8") as f:
         for section, content in sections.items():
-            f.write(f"{section}:\n{content}\n\n")
+            f.write(f"{section}:\n")
+            start = f.tell()
+            f.write(content)
+            index[section] = (start, f.tell())
+            f.write("\n\n")
+    save_section_index(index, output_path)
 
-def main():
-    # Create the output directory if it doesn't exist
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+def section_index_path(text_path):
+    """
+    Return the path of the section index of a preprocessed text file.
+    Args:
+        text_path (str): Preprocessed text file, e.g. "P001.txt".
+    Returns:
+        str: Path of its index, e.g. "P001.sections.json".
+    """
+    return os.path.splitext(text_path)[0] + SECTION_INDEX_SUFFIX
 
-    # Process each extracted text file in the input directory
-    for file_name in os.listdir(INPUT_DIR):
-        if file_name.endswith(".txt"):
-            input_path = os.path.join(INPUT_DIR, file_name)
-            output_path = os.path.join(OUTPUT_DIR, file_name)
+def save_section_index(index, text_path):
+    """
+    Save the offsets of the sections of a preprocessed text file as JSON, so that single
+    sections can be read with a seek instead of loading and parsing the whole file.
+    Args:
+        index (dict): Mapping of section name to (start, end) byte offsets of its content.
+        text_path (str): The preprocessed text file the offsets point into.
+    """
+    with open(section_index_path(text_path), "w", encoding="utf-8") as f:
+        json.dump({
+            "text": os.path.basename(text_path),
+            "encoding": "utf-8",
+            "sections": {section: list(offsets) for section, offsets in index.items()},
+        }, f, indent=2)
 
-            print(f"Processing file: {file_name}")
-            with open(input_path, "r", encoding="utf-8") as f:
-                raw_text = f.read()
+def index_preprocessed_file(text_path):
+    """
+    Rebuild the section index of a preprocessed text file from its "Section:" lines, for
+    files written before indexes existed. Each section is a heading line followed by one
+    line of content, so the file is read line by line.
+    Args:
+        text_path (str): Preprocessed text file.
+    Returns:
+        dict: Mapping of section name to (start, end) byte offsets of its content.
+    """
+    headings = {f"{section}:\n".encode("utf-8"): section for section in SECTION_HEADINGS}
+    index = {}
+    offset = 0
+    section = None
+    with open(text_path, "rb") as f:
+        for line in f:
+            if section is not None:
+                index[section] = (offset, offset + len(line.rstrip(b"\n")))
+                section = None
+            elif line in headings and headings[line] not in index:
+                section = headings[line]
+            offset += len(line)
+    return index
 
-            # Preprocess the text
-            structured_sections = preprocess_text(raw_text)
+def load_section_index(text_path):
+    """
+    Load the section index of a preprocessed text file, rebuilding it from the text when
+    the file predates indexes.
+    Args:
+        text_path (str): Preprocessed text file.
+    Returns:
+        dict: Mapping of section name to (start, end) byte offsets of its content.
+    """
+    path = section_index_path(text_path)
+    if not os.path.exists(path):
+        return index_preprocessed_file(text_path)
+    with open(path, "r", encoding="utf-8") as f:
+        return {section: tuple(offsets) for section, offsets in json.load(f)["sections"].items()}
 
-            # Save the preprocessed text
-            save_preprocessed_text(structured_sections, output_path)
-            print(f"Preprocessed text saved to: {output_path}")
+def read_sections(text_path, index, sections):
+    """
+    Read some sections of a preprocessed text file, seeking to each of them.
+    Args:
+        text_path (str): Preprocessed text file.
+        index (dict): Its section index, from load_section_index.
+        sections (iterable): Names of the sections to read. They are returned in paper order.
+    Returns:
+        str: The non-empty sections in the "Section:\ncontent" layout of the file, or None
+            if all of them are empty, e.g. because their headings were not found.
+    """
+    wanted = set(sections)
+    parts = []
+    with open(text_path, "rb") as f:
+        for section in SECTION_HEADINGS:
+            start, end = index.get(section, (0, 0))
+            if section not in wanted or end <= start:
+                continue
+            f.seek(start)
+            parts.append(f"{section}:\n{f.read(end - start).decode('utf-8')}")
+    return "\n\n".join(parts) if parts else None
+
+def preprocess_paper(input_path, output_dir, manifest, force=False):
+    """
+    Preprocess one extracted text file, unless the manifest shows it has not changed.
+    Args:
+        input_path (str): Path to the extracted text file.
+        output_dir (str): Folder to save the preprocessed text file in.
+        manifest (PipelineManifest): Manifest recording the files already preprocessed.
+        force (bool): Reprocess the file even if it has not changed.
+    Returns:
+        tuple: (output_path, processed), where processed is False if the file was skipped.
+    """
+    file_name = os.path.basename(input_path)
+    output_path = os.path.join(output_dir, file_name)
+
+    input_hash = file_hash(input_path)
+    if not force and manifest.is_current("preprocess", file_name, input_hash):
+        print(f"Skipping unchanged file: {file_name}")
+        if not os.path.exists(section_index_path(output_path)):
+            save_section_index(index_preprocessed_file(output_path), output_path)
+        return output_path, False
+
+    print(f"Processing file: {file_name}")
+    with tracing.span("preprocess", file=file_name) as span:
+        # Stream the sections to the output without loading the paper
+        input_chars, output_chars = preprocess_file(input_path, output_path)
+        span.count(input_chars=input_chars, output_chars=output_chars)
+    manifest.record("preprocess", file_name, input_hash, output_path)
+    print(f"Preprocessed text saved to: {output_path}")
+    return output_path, True
+
+def main():
+    parser = argparse.ArgumentParser(description="Split extracted text into sections.")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Folder with extracted text files.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Folder to save preprocessed text files.")
+    parser.add_argument("--force", action="store_true", help="Reprocess text files that have not changed.")
+    add_selection_arguments(parser, "*.txt in --input-dir")
+    tracing.add_tracing_arguments(parser)
+    args = parser.parse_args()
+
+    # Create the output directory if it doesn't exist
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    # The manifest lives in the data folder that holds the output folder
+    manifest = PipelineManifest(os.path.join(os.path.dirname(os.path.normpath(args.output_dir)),
+                                             "pipeline_manifest.json"))
+
+    # Process each extracted text file in the input directory
+    with tracing.traced_run(args):
+        for input_path in select_papers(args.glob or [os.path.join(args.input_dir, "*.txt")], args.shard):
+            preprocess_paper(input_path, args.output_dir, manifest, args.force)
 
 if __name__ == "__main__":
     main()
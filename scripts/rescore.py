@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.results_store import ResultsStore, STORE_PATH
+from scripts.train_model import PUBLISHABLE_DIR, NON_PUBLISHABLE_DIR
+from scripts.scoring import SCORING_PATH, load_scoring, save_scoring
+
+# Calibration settings
+CALIBRATION_SAMPLES = 2000  # Random weight vectors tried, besides equal weights
+THRESHOLD_STEPS = 101  # Thresholds tried, evenly spaced over [0, 1]
+
+# Ways to turn chunk scores into an agent score; NaN marks skipped chunks
+CHUNK_AGGREGATES = {"mean": np.nanmean, "median": np.nanmedian, "min": np.nanmin}
+
+
+def combine_matrix(scores, weights):
+    """
+    Vectorised combine_scores over many papers and, optionally, many weight vectors.
+    Args:
+        scores (numpy.ndarray): Papers x agents, NaN where an agent was not run.
+        weights (numpy.ndarray): One weight per agent, or one row of weights per candidate.
+    Returns:
+        numpy.ndarray: Combined score per paper, or candidates x papers for 2-D weights.
+    """
+    present = ~np.isnan(scores)
+    candidates = np.atleast_2d(weights)
+    numerator = candidates @ np.where(present, scores, 0.0).T
+    denominator = candidates @ present.T
+    combined = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+    return combined[0] if np.ndim(weights) == 1 else combined
+
+
+def pad_chunk_scores(chunk_lists):
+    """
+    Stack lists of chunk scores of different lengths into one NaN-padded matrix.
+    Args:
+        chunk_lists (list): One list of chunk scores per paper; None for skipped chunks.
+    Returns:
+        numpy.ndarray: Papers x longest list.
+    """
+    width = max((len(chunks) for chunks in chunk_lists), default=0)
+    matrix = np.full((len(chunk_lists), max(width, 1)), np.nan)
+    for row, chunks in enumerate(chunk_lists):
+        matrix[row, :len(chunks)] = [np.nan if score is None else score for score in chunks]
+    return matrix
+
+
+def score_matrix(store, run_id=None, chunk_aggregate="mean"):
+    """
+    Load the agent scores of a run as a matrix, optionally re-aggregated from the chunk scores.
+    Args:
+        store (ResultsStore): Results store.
+        run_id (int): Run to load; the latest run by default.
+        chunk_aggregate (str): Key of CHUNK_AGGREGATES. "mean" keeps the stored agent scores;
+            other aggregates recompute the scores of agents with stored chunk scores.
+    Returns:
+        tuple: (filenames, agents, scores) with scores a papers x agents matrix, NaN where
+            an agent was not run.
+    """
+    rows = store.scores(run_id)
+    agents = [agent for agent in store.score_columns if any(row[agent] is not None for row in rows)]
+    filenames = [row["filename"] for row in rows]
+    scores = np.array([[np.nan if row[agent] is None else row[agent] for agent in agents] for row in rows],
+                      dtype=np.float64).reshape(len(rows), len(agents))
+    if chunk_aggregate == "mean":
+        return filenames, agents, scores
+
+    chunk_scores = store.chunk_scores(run_id)
+    if not chunk_scores:
+        print(f"Run {run_id if run_id is not None else store.latest_run()} has no chunk scores; "
+              f"--chunk-aggregate {chunk_aggregate} keeps the stored agent scores")
+    for column, agent in enumerate(agents):
+        papers = [row for row, filename in enumerate(filenames) if (filename, agent) in chunk_scores]
+        if not papers:
+            continue
+        matrix = pad_chunk_scores([chunk_scores[filenames[row], agent] for row in papers])
+        valid = ~np.isnan(matrix).all(axis=1)
+        aggregated = np.full(len(papers), np.nan)
+        aggregated[valid] = CHUNK_AGGREGATES[chunk_aggregate](matrix[valid], axis=1)
+        scores[papers, column] = np.where(valid, aggregated, scores[papers, column])
+    return filenames, agents, scores
+
+
+def labeled_names(publishable_dir=PUBLISHABLE_DIR, non_publishable_dir=NON_PUBLISHABLE_DIR):
+    """
+    Map the names of the labeled papers to their labels.
+    Args:
+        publishable_dir (str): Folder with publishable papers.
+        non_publishable_dir (str): Folder with non-publishable papers.
+    Returns:
+        dict: Label (1 for publishable) per file name without extension.
+    """
+    labels = {}
+    for folder, label in ((publishable_dir, 1), (non_publishable_dir, 0)):
+        for filename in os.listdir(folder):
+            labels[os.path.splitext(filename)[0]] = label
+    return labels
+
+
+def calibrate(scores, labels, samples=CALIBRATION_SAMPLES, steps=THRESHOLD_STEPS, seed=0):
+    """
+    Search the weights and threshold that best separate publishable from non-publishable papers.
+
+    Equal weights and `samples` random weight vectors are combined with `steps` thresholds
+    in one broadcast, and the pair with the highest balanced accuracy (the mean of the
+    accuracies on each class) wins; ties go to equal weights and then the lower threshold.
+    Args:
+        scores (numpy.ndarray): Labeled papers x agents, NaN where an agent was not run.
+        labels (numpy.ndarray): 1 for publishable papers, 0 otherwise.
+        samples (int): Random weight vectors to try.
+        steps (int): Thresholds to try.
+        seed (int): Seed of the weight sampling.
+    Returns:
+        tuple: (weights, threshold, balanced accuracy, accuracy).
+    """
+    labels = np.asarray(labels, dtype=bool)
+    candidates = np.vstack([
+        np.ones(scores.shape[1]) / scores.shape[1],
+        np.random.default_rng(seed).dirichlet(np.ones(scores.shape[1]), size=samples),
+    ])
+    thresholds = np.linspace(0.0, 1.0, steps)
+    predictions = combine_matrix(scores, candidates)[:, :, None] >= thresholds  # Candidates x papers x thresholds
+    true_positive = (predictions & labels[None, :, None]).sum(axis=1) / max(labels.sum(), 1)
+    true_negative = (~predictions & ~labels[None, :, None]).sum(axis=1) / max((~labels).sum(), 1)
+    balanced = (true_positive + true_negative) / 2
+    best_candidate, best_threshold = np.unravel_index(np.argmax(balanced), balanced.shape)
+    accuracy = (predictions[best_candidate, :, best_threshold] == labels).mean()
+    return candidates[best_candidate], thresholds[best_threshold], balanced[best_candidate, best_threshold], accuracy
+
+
+def parse_weights(values):
+    """
+    Parse "--weight AGENT=W" arguments.
+    Args:
+        values (list): List of "agent=weight" strings.
+    Returns:
+        dict: Weight per agent.
+    """
+    weights = {}
+    for value in values or []:
+        agent, _, weight = value.partition("=")
+        weights[agent] = float(weight)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute combined scores and publishability from stored results, without calling the LLM."
+    )
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--run", type=int, help="Run to re-score (default: latest).")
+    parser.add_argument("--weight", action="append", metavar="AGENT=W",
+                        help="Weight of an agent's score (repeatable); defaults come from --scoring.")
+    parser.add_argument("--threshold", type=float, help="Publishability threshold; default from --scoring.")
+    parser.add_argument("--chunk-aggregate", choices=sorted(CHUNK_AGGREGATES), default="mean",
+                        help="Recompute the chunked agents' scores from their chunk scores.")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Fit weights and threshold on the labeled papers of the run.")
+    parser.add_argument("--scoring", default=SCORING_PATH, help="Weights and threshold used by main.py.")
+    parser.add_argument("--write-scoring", action="store_true",
+                        help="Save the weights and threshold to --scoring for main.py.")
+    parser.add_argument("--save", action="store_true", help="Store the re-scored papers as a new run.")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    run_id = args.run if args.run is not None else store.latest_run()
+    if run_id is None:
+        print(f"No results in {args.store}; run main.py first.")
+        return
+    start = time.perf_counter()
+    filenames, agents, scores = score_matrix(store, run_id, args.chunk_aggregate)
+    weights, threshold = load_scoring(args.scoring)
+    weights.update(parse_weights(args.weight))
+    if args.threshold is not None:
+        threshold = args.threshold
+    weight_vector = np.array([weights.get(agent, 1.0) for agent in agents])
+    # Papers without any agent score, e.g. decided by triage, keep their stored verdict
+    scored = ~np.isnan(scores).all(axis=1)
+
+    if args.calibrate:
+        labels = labeled_names()
+        labeled = [row for row, filename in enumerate(filenames)
+                   if scored[row] and os.path.splitext(filename)[0] in labels]
+        if not labeled:
+            print(f"Run {run_id} has no labeled papers (names from {PUBLISHABLE_DIR} and {NON_PUBLISHABLE_DIR}); "
+                  "evaluate them first.")
+            return
+        y = np.array([labels[os.path.splitext(filenames[row])[0]] for row in labeled])
+        weight_vector, threshold, balanced, accuracy = calibrate(scores[labeled], y)
+        print(f"Calibrated on {len(labeled)} labeled papers ({int(y.sum())} publishable): "
+              f"balanced accuracy {balanced:.1%}, accuracy {accuracy:.1%}")
+        weights.update(dict(zip(agents, weight_vector.round(4).tolist())))
+
+    combined = combine_matrix(scores, weight_vector)
+    publishable = combined >= threshold
+    elapsed = time.perf_counter() - start
+
+    stored = {row["filename"]: row for row in store.scores(run_id)}
+    changed = sum(
+        1 for filename, verdict, has_scores in zip(filenames, publishable, scored)
+        if has_scores and stored[filename]["is_publishable"] is not None
+        and bool(stored[filename]["is_publishable"]) != verdict
+    )
+    kept = [filename for filename, has_scores in zip(filenames, scored) if not has_scores]
+    kept_publishable = sum(1 for filename in kept if stored[filename]["is_publishable"])
+    print(f"Re-scored {int(scored.sum())} papers of run {run_id} in {elapsed * 1000:.1f} ms")
+    print("Weights: " + ", ".join(f"{agent} {weight:.3f}" for agent, weight in zip(agents, weight_vector))
+          + f"; threshold {threshold:.2f}")
+    print(f"{int(publishable[scored].sum())} publishable, {changed} verdicts changed")
+    if kept:
+        print(f"Kept the stored verdict of {len(kept)} papers without agent scores "
+              f"({kept_publishable} publishable), e.g. decided by triage")
+
+    if args.write_scoring:
+        save_scoring(weights, float(threshold), args.scoring, source_run=run_id)
+        print(f"Scoring saved to {args.scoring}")
+    if args.save:
+        new_run = store.start_run({"rescored_from": run_id, "weights": weights, "threshold": float(threshold),
+                                   "chunk_aggregate": args.chunk_aggregate})
+        # The new run carries the triage fields and chunk scores over, so it can be re-scored in turn
+        store.add_scores(new_run, [
+            {**stored[filename], "average_score": float(score), "is_publishable": bool(verdict),
+             **{agent: None if np.isnan(value) else float(value) for agent, value in zip(agents, row)}}
+            if has_scores else stored[filename]
+            for filename, score, verdict, row, has_scores in zip(filenames, combined, publishable, scores, scored)
+        ], chunk_scores=store.chunk_scores(run_id))
+        print(f"Saved as run {new_run}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
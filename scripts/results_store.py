@@ -0,0 +1,391 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Default location
+STORE_PATH = "Data/evaluation_results.sqlite"
+
+# Paper fields stored in their own columns; agent scores get a column each, added as agents appear
+PAPER_COLUMNS = ("average_score", "is_publishable", "triage_decision", "triage_probability")
+SCORE_COLUMN_PATTERN = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def agent_results(evaluation):
+    """
+    Pick the agent results out of an evaluation, i.e. the values carrying a score.
+    Args:
+        evaluation (dict): Evaluation of one paper, as returned by main.evaluate_paper.
+    Returns:
+        dict: Agent result by agent name.
+    """
+    return {
+        name: value for name, value in evaluation.items()
+        if isinstance(value, dict) and "score" in value and SCORE_COLUMN_PATTERN.match(name)
+    }
+
+
+class ResultsStore:
+    def __init__(self, path=STORE_PATH):
+        """
+        Open or create the SQLite store of evaluation results.
+
+        Every run of main.py is a row of `runs`. Each paper of a run is a row of `papers`,
+        with the combined score, the verdict and one REAL column per agent score, so
+        queries over scores never read explanation text. The raw per-chunk scores of the
+        chunked agents are in `chunk_scores`, and explanations and other agent output in
+        `explanations`, one row per paper and agent. Both are only written for papers
+        evaluated in that run.
+        Args:
+            path (str): Path to the database file; ":memory:" for a throwaway store.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " started_at REAL NOT NULL,"
+            " settings TEXT);"
+            "CREATE TABLE IF NOT EXISTS papers ("
+            " run_id INTEGER NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " average_score REAL,"
+            " is_publishable INTEGER,"
+            " triage_decision TEXT,"
+            " triage_probability REAL,"
+            " reused INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (run_id, filename));"
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            " run_id INTEGER NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " agent TEXT NOT NULL,"
+            " explanation TEXT,"
+            " details TEXT,"
+            " PRIMARY KEY (run_id, filename, agent));"
+            "CREATE TABLE IF NOT EXISTS chunk_scores ("
+            " run_id INTEGER NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " agent TEXT NOT NULL,"
+            " chunk INTEGER NOT NULL,"
+            " score REAL,"
+            " PRIMARY KEY (run_id, filename, agent, chunk));"
+            "CREATE INDEX IF NOT EXISTS papers_by_filename ON papers (filename, run_id);"
+        )
+        self._conn.commit()
+        self.score_columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(papers)")
+            if row[1] not in PAPER_COLUMNS + ("run_id", "filename", "reused")
+        ]
+
+    def _ensure_score_columns(self, agents):
+        # Add a score column for agents the store has not seen yet; called with the lock held
+        for agent in agents:
+            if agent not in self.score_columns:
+                self._conn.execute(f"ALTER TABLE papers ADD COLUMN {agent} REAL")
+                self.score_columns.append(agent)
+
+    def start_run(self, settings=None):
+        """
+        Record the start of a run.
+        Args:
+            settings (dict): Options of the run, kept for reference.
+        Returns:
+            int: Identifier of the new run.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started_at, settings) VALUES (?, ?)",
+                (time.time(), json.dumps(settings or {})),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def add(self, run_id, evaluation, reused=False):
+        """
+        Store the evaluation of one paper and commit it, so results survive an interrupted run.
+        Args:
+            run_id (int): Run from start_run.
+            evaluation (dict): Evaluation of one paper, as returned by main.evaluate_paper.
+            reused (bool): The result was carried over from an earlier run; its explanations
+                are not stored again.
+        """
+        agents = agent_results(evaluation)
+        triage = evaluation.get("triage") or {}
+        is_publishable = evaluation.get("is_publishable")
+        row = {
+            "run_id": run_id,
+            "filename": evaluation["filename"],
+            "average_score": evaluation.get("average_score"),
+            "is_publishable": None if is_publishable is None else int(is_publishable),
+            "triage_decision": triage.get("decision"),
+            "triage_probability": triage.get("probability"),
+            "reused": int(reused),
+            **{name: result["score"] for name, result in agents.items()},
+        }
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        with self._lock:
+            self._ensure_score_columns(agents)
+            self._conn.execute(f"INSERT OR REPLACE INTO papers ({columns}) VALUES ({placeholders})",
+                               tuple(row.values()))
+            if not reused:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO explanations (run_id, filename, agent, explanation, details)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (run_id, evaluation["filename"], name, result.get("explanation"),
+                         json.dumps({key: value for key, value in result.items()
+                                     if key not in ("score", "explanation", "chunk_scores")}))
+                        for name, result in agents.items()
+                    ],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunk_scores (run_id, filename, agent, chunk, score) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (run_id, evaluation["filename"], name, chunk, score)
+                        for name, result in agents.items()
+                        for chunk, score in enumerate(result.get("chunk_scores") or [])
+                    ],
+                )
+            self._conn.commit()
+
+    def add_scores(self, run_id, rows, chunk_scores=None):
+        """
+        Store score rows without explanations, e.g. papers re-scored by scripts/rescore.py.
+        Args:
+            run_id (int): Run from start_run.
+            rows (list): Dicts with 'filename', 'average_score', 'is_publishable', the triage
+                fields and agent scores, as returned by scores().
+            chunk_scores (dict): Chunk scores to store with the rows, as returned by chunk_scores().
+        """
+        with self._lock:
+            for row in rows:
+                self._ensure_score_columns([key for key in row if key not in ("filename",) + PAPER_COLUMNS])
+                row = {"run_id": run_id, "reused": 1, **row}
+                if row.get("is_publishable") is not None:
+                    row["is_publishable"] = int(row["is_publishable"])
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO papers ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+                    tuple(row.values()),
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_scores (run_id, filename, agent, chunk, score) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, filename, agent, chunk, score)
+                    for (filename, agent), scores in (chunk_scores or {}).items()
+                    for chunk, score in enumerate(scores)
+                ],
+            )
+            self._conn.commit()
+
+    def latest_run(self):
+        """
+        Return the identifier of the most recent run, or None if the store is empty.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return row[0]
+
+    def runs(self):
+        """
+        List the runs with their number of papers and of publishable papers.
+        Returns:
+            list: One dict per run, oldest first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT runs.run_id, runs.started_at, COUNT(papers.filename), SUM(papers.is_publishable)"
+                " FROM runs LEFT JOIN papers ON papers.run_id = runs.run_id"
+                " GROUP BY runs.run_id ORDER BY runs.run_id"
+            ).fetchall()
+        return [
+            {"run_id": run_id, "started_at": started_at, "papers": papers, "publishable": publishable or 0}
+            for run_id, started_at, papers, publishable in rows
+        ]
+
+    def scores(self, run_id=None):
+        """
+        Return the score columns of every paper of a run.
+        Args:
+            run_id (int): Run to read; the latest run by default.
+        Returns:
+            list: One dict per paper, with average_score, is_publishable, the triage decision
+                and probability, and each agent score.
+        """
+        run_id = self.latest_run() if run_id is None else run_id
+        columns = ["filename", *PAPER_COLUMNS, *self.score_columns]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM papers WHERE run_id = ? ORDER BY filename", (run_id,)
+            ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def below_threshold(self, threshold, column="average_score", run_id=None):
+        """
+        Find the papers of a run scoring below a threshold.
+        Args:
+            threshold (float): Score to compare with.
+            column (str): average_score or an agent's score column.
+            run_id (int): Run to read; the latest run by default.
+        Returns:
+            list: (filename, score) pairs, lowest score first.
+        """
+        if column != "average_score" and column not in self.score_columns:
+            raise ValueError(f"Unknown score column: {column}")
+        run_id = self.latest_run() if run_id is None else run_id
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT filename, {column} FROM papers WHERE run_id = ? AND {column} < ? ORDER BY {column}",
+                (run_id, threshold),
+            ).fetchall()
+
+    def mean_scores(self):
+        """
+        Average every score column per run.
+        Returns:
+            dict: Per run_id, the mean average_score and agent scores (None where no paper has one).
+        """
+        columns = ["average_score", *self.score_columns]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_id, {', '.join(f'AVG({column})' for column in columns)}"
+                " FROM papers GROUP BY run_id ORDER BY run_id"
+            ).fetchall()
+        return {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+    def chunk_scores(self, run_id=None):
+        """
+        Return the raw chunk scores behind the papers of a run. Papers the run reused
+        from a checkpoint get the chunk scores of the latest earlier run that evaluated them.
+        Args:
+            run_id (int): Run to read; the latest run by default.
+        Returns:
+            dict: Per (filename, agent), the list of chunk scores in chunk order (None for skipped chunks).
+        """
+        run_id = self.latest_run() if run_id is None else run_id
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.filename, c.agent, c.score FROM chunk_scores c"
+                " JOIN (SELECT filename, MAX(run_id) AS run_id FROM chunk_scores WHERE run_id <= ?"
+                "       AND filename IN (SELECT filename FROM papers WHERE run_id = ?)"
+                "       GROUP BY filename) latest"
+                " ON c.filename = latest.filename AND c.run_id = latest.run_id"
+                " ORDER BY c.filename, c.agent, c.chunk",
+                (run_id, run_id),
+            ).fetchall()
+        scores = {}
+        for filename, agent, score in rows:
+            scores.setdefault((filename, agent), []).append(score)
+        return scores
+
+    def explanations(self, filename, run_id=None):
+        """
+        Return the explanations and other agent output for one paper.
+        Args:
+            filename (str): Paper file name, e.g. "P006.txt".
+            run_id (int): Run to read; by default the latest run that evaluated the paper.
+        Returns:
+            dict: Per agent, its 'explanation' and other output fields.
+        """
+        with self._lock:
+            if run_id is None:
+                row = self._conn.execute(
+                    "SELECT MAX(run_id) FROM explanations WHERE filename = ?", (filename,)
+                ).fetchone()
+                run_id = row[0]
+            rows = self._conn.execute(
+                "SELECT agent, explanation, details FROM explanations WHERE run_id = ? AND filename = ?",
+                (run_id, filename),
+            ).fetchall()
+        return {agent: {"explanation": explanation, **json.loads(details or "{}")}
+                for agent, explanation, details in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def import_results(store, path):
+    """
+    Load results saved by earlier versions of main.py into a new run of the store.
+    Args:
+        store (ResultsStore): Store to fill.
+        path (str): evaluation_results.json (a list of evaluations) or the JSONL checkpoint log.
+    Returns:
+        tuple: (run_id, number of papers imported).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            evaluations = {}
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                evaluations[record["filename"]] = record["result"]
+            evaluations = list(evaluations.values())
+        else:
+            evaluations = json.load(f)
+    run_id = store.start_run({"imported_from": path})
+    for evaluation in evaluations:
+        store.add(run_id, evaluation)
+    return run_id, len(evaluations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the evaluation results store.")
+    parser.add_argument("--store", default=STORE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("runs", help="List the runs.")
+    scores_parser = subparsers.add_parser("scores", help="Scores of every paper of a run.")
+    scores_parser.add_argument("--run", type=int, help="Run to show (default: latest).")
+    below_parser = subparsers.add_parser("below", help="Papers scoring below a threshold.")
+    below_parser.add_argument("threshold", type=float)
+    below_parser.add_argument("--column", default="average_score", help="average_score or an agent name.")
+    below_parser.add_argument("--run", type=int, help="Run to query (default: latest).")
+    subparsers.add_parser("means", help="Mean scores per run.")
+    show_parser = subparsers.add_parser("show", help="Explanations for one paper.")
+    show_parser.add_argument("filename")
+    show_parser.add_argument("--run", type=int, help="Run to show (default: latest run that evaluated it).")
+    import_parser = subparsers.add_parser("import", help="Import a legacy results JSON or JSONL checkpoint.")
+    import_parser.add_argument("path")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    if args.command == "runs":
+        for run in store.runs():
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+            print(f"Run {run['run_id']}: {started}, {run['papers']} papers, {run['publishable']} publishable")
+    elif args.command == "scores":
+        for row in store.scores(args.run):
+            print("  ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                            for key, value in row.items() if value is not None))
+    elif args.command == "below":
+        for filename, score in store.below_threshold(args.threshold, args.column, args.run):
+            print(f"{filename}: {score:.3f}")
+    elif args.command == "means":
+        for run_id, means in store.mean_scores().items():
+            print(f"Run {run_id}: " + ", ".join(f"{column} {value:.3f}" for column, value in means.items()
+                                                if value is not None))
+    elif args.command == "show":
+        for agent, output in store.explanations(args.filename, args.run).items():
+            print(f"== {agent}\n{output.pop('explanation')}")
+            for key, value in output.items():
+                print(f"{key}: {json.dumps(value)}")
+    elif args.command == "import":
+        run_id, count = import_results(store, args.path)
+        print(f"Imported {count} papers from {args.path} as run {run_id}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import json
+
+# Default locations
+SCORING_PATH = "Data/scoring.json"  # Weights and threshold written by --calibrate, read by main.py
+
+# Default scoring (based on labeled data insights)
+DEFAULT_WEIGHTS = {"coherence": 1.0, "ethics": 1.0, "novelty": 1.0}  # Criteria not listed weigh 1
+DEFAULT_THRESHOLD = 0.75  # Minimum combined score required for publishability
+
+
+def load_scoring(path=SCORING_PATH):
+    """
+    Load the criterion weights and publishability threshold.
+    Args:
+        path (str): JSON file written by save_scoring.
+    Returns:
+        tuple: (weights, threshold); the defaults when the file does not exist.
+    """
+    if not os.path.exists(path):
+        return dict(DEFAULT_WEIGHTS), DEFAULT_THRESHOLD
+    with open(path, "r", encoding="utf-8") as f:
+        scoring = json.load(f)
+    return {**DEFAULT_WEIGHTS, **scoring["weights"]}, scoring["threshold"]
+
+
+def save_scoring(weights, threshold, path=SCORING_PATH, **extra):
+    """
+    Save criterion weights and the publishability threshold for main.py.
+    Args:
+        weights (dict): Weight per criterion.
+        threshold (float): Minimum combined score for publishability.
+        path (str): JSON file to write.
+        **extra: Additional fields kept for reference, e.g. the calibration accuracy.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"weights": weights, "threshold": threshold, **extra}, f, indent=2)
+
+
+def combine_scores(scores, weights=None):
+    """
+    Combine the agent scores of one paper into its weighted mean. Only the agents that
+    were run count, so the result stays a score between 0 and 1 whatever agents are enabled.
+    Args:
+        scores (dict): Score per agent.
+        weights (dict): Weight per agent; agents without a weight count 1. Defaults to DEFAULT_WEIGHTS.
+    Returns:
+        float: The combined score, 0 when there is no score.
+    """
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    total = sum(weights.get(agent, 1.0) for agent in scores)
+    if not total:
+        return 0.0
+    return sum(weights.get(agent, 1.0) * score for agent, score in scores.items()) / total
@@ -0,0 +1,100 @@
+import re
+import zlib
+import numpy as np
+
+# Feature settings
+DEFAULT_DIMENSIONS = 2 ** 16  # Hashed feature buckets; must be a power of two
+DEFAULT_NGRAMS = (1, 2)  # Word n-gram lengths used as features
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens.
+    Args:
+        text (str): Text to tokenize.
+    Returns:
+        list: Tokens of two or more characters starting with a letter.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def iter_ngrams(tokens, ngrams=DEFAULT_NGRAMS):
+    """
+    Yield the word n-grams of a token list.
+    Args:
+        tokens (list): Tokens of the text.
+        ngrams (tuple): N-gram lengths to produce.
+    Yields:
+        str: N-grams joined by single spaces.
+    """
+    for n in ngrams:
+        for i in range(len(tokens) - n + 1):
+            yield " ".join(tokens[i:i + n])
+
+
+def hash_ngrams(text, ngrams=DEFAULT_NGRAMS):
+    """
+    Hash the n-grams of a text with CRC-32, which unlike hash() is stable across processes.
+    Args:
+        text (str): Text to hash.
+        ngrams (tuple): N-gram lengths to use.
+    Returns:
+        numpy.ndarray: One uint32 hash per n-gram occurrence.
+    """
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in iter_ngrams(tokenize(text), ngrams)),
+        dtype=np.uint32,
+    )
+
+
+def hashed_term_counts(text, dimensions=DEFAULT_DIMENSIONS, ngrams=DEFAULT_NGRAMS):
+    """
+    Count the n-grams of a text per hash bucket.
+    Args:
+        text (str): Text to count.
+        dimensions (int): Number of hash buckets; a power of two.
+        ngrams (tuple): N-gram lengths to use.
+    Returns:
+        numpy.ndarray: Count per bucket, of length dimensions.
+    """
+    hashes = hash_ngrams(text, ngrams)
+    return np.bincount(hashes & (dimensions - 1), minlength=dimensions).astype(np.float64)
+
+
+def hashed_features(text, dimensions=DEFAULT_DIMENSIONS, ngrams=DEFAULT_NGRAMS):
+    """
+    Turn a text into a fixed-size vector of hashed n-gram counts.
+
+    The sign of each count comes from the top bit of the n-gram's hash to cancel out
+    collisions on average. Counts are log-scaled and the vector is L2-normalised, so
+    long and short papers are comparable.
+    Args:
+        text (str): Text of the paper.
+        dimensions (int): Number of hash buckets; a power of two.
+        ngrams (tuple): N-gram lengths to use.
+    Returns:
+        numpy.ndarray: Feature vector of length dimensions.
+    """
+    hashes = hash_ngrams(text, ngrams)
+    if hashes.size == 0:
+        return np.zeros(dimensions, dtype=np.float64)
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+    counts = np.bincount(hashes & (dimensions - 1), weights=signs, minlength=dimensions)
+    vector = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def feature_matrix(texts, dimensions=DEFAULT_DIMENSIONS, ngrams=DEFAULT_NGRAMS):
+    """
+    Build the feature matrix of several texts.
+    Args:
+        texts (list): Texts of the papers.
+        dimensions (int): Number of hash buckets.
+        ngrams (tuple): N-gram lengths to use.
+    Returns:
+        numpy.ndarray: Matrix with one row of hashed_features per text.
+    """
+    return np.vstack([hashed_features(text, dimensions, ngrams) for text in texts])
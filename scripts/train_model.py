@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.extract_text import extract_text_from_pdf
+from scripts.preprocess_text import preprocess_text
+from scripts.text_features import feature_matrix, hashed_features, DEFAULT_DIMENSIONS, DEFAULT_NGRAMS
+
+# Directory paths
+PUBLISHABLE_DIR = "Data/Publishable"  # Labeled publishable papers (PDF)
+NON_PUBLISHABLE_DIR = "Data/Non-Publishable"  # Labeled non-publishable papers (PDF)
+MODEL_PATH = "Data/triage_model.npz"  # Trained model
+
+# Training settings
+DEFAULT_L2 = 0.001  # Weight penalty; larger values pull probabilities towards 0.5
+DEFAULT_LEARNING_RATE = 2.0
+DEFAULT_EPOCHS = 500
+
+# Probabilities at or below LOW / at or above HIGH are trusted without asking the LLM agents
+DEFAULT_LOW_THRESHOLD = 0.15
+DEFAULT_HIGH_THRESHOLD = 0.85
+
+# Labeled papers the model must be trained on before main.py --triage lets it decide papers
+# without the agents. With fewer, the thresholds are fitted to a handful of examples.
+MIN_TRIAGE_PAPERS = 50
+
+
+def load_paper_text(path):
+    """
+    Read a paper in the format the evaluation works on.
+    Args:
+        path (str): Path to a PDF, or to an already preprocessed text file.
+    Returns:
+        str: Preprocessed text, formatted like the files written by preprocess_text.py.
+    """
+    if path.endswith(".txt"):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    sections = preprocess_text(extract_text_from_pdf(path) or "")
+    return "".join(f"{section}:\n{content}\n\n" for section, content in sections.items())
+
+
+def load_labeled_papers(publishable_dir=PUBLISHABLE_DIR, non_publishable_dir=NON_PUBLISHABLE_DIR):
+    """
+    Load the labeled papers.
+    Args:
+        publishable_dir (str): Folder with publishable papers.
+        non_publishable_dir (str): Folder with non-publishable papers.
+    Returns:
+        tuple: (names, texts, labels), with label 1 for publishable papers.
+    """
+    names, texts, labels = [], [], []
+    for folder, label in ((publishable_dir, 1), (non_publishable_dir, 0)):
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith((".pdf", ".txt")):
+                continue
+            text = load_paper_text(os.path.join(folder, filename))
+            if not text.strip():
+                print(f"Skipping {filename}: no text")
+                continue
+            names.append(filename)
+            texts.append(text)
+            labels.append(label)
+    return names, texts, np.array(labels, dtype=np.float64)
+
+
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def train_logistic_regression(X, y, l2=DEFAULT_L2, learning_rate=DEFAULT_LEARNING_RATE, epochs=DEFAULT_EPOCHS):
+    """
+    Fit an L2-regularised logistic regression with full-batch gradient descent.
+    Classes are weighted inversely to their size, so the minority class is not ignored.
+    Args:
+        X (numpy.ndarray): Feature matrix, one row per paper.
+        y (numpy.ndarray): Labels, 1 for publishable.
+        l2 (float): Weight penalty.
+        learning_rate (float): Gradient descent step size.
+        epochs (int): Number of gradient steps.
+    Returns:
+        tuple: (weights, bias).
+    """
+    positives = y.sum()
+    negatives = len(y) - positives
+    sample_weights = np.where(y == 1, len(y) / (2 * max(positives, 1)), len(y) / (2 * max(negatives, 1)))
+
+    weights = np.zeros(X.shape[1])
+    bias = 0.0
+    for _ in range(epochs):
+        error = (sigmoid(X @ weights + bias) - y) * sample_weights
+        weights -= learning_rate * (X.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return weights, bias
+
+
+class TriageModel:
+    def __init__(self, weights, bias, dimensions=DEFAULT_DIMENSIONS, ngrams=DEFAULT_NGRAMS, papers=0,
+                 validation=None):
+        """
+        Initialize a trained publishability classifier over hashed n-gram features.
+        Args:
+            weights (numpy.ndarray): Feature weights.
+            bias (float): Intercept.
+            dimensions (int): Number of hash buckets the weights were trained on.
+            ngrams (tuple): N-gram lengths the weights were trained on.
+            papers (int): Number of labeled papers the model was trained on; 0 if unknown.
+            validation (dict): Leave-one-out results from validation_report, or None if not measured.
+        """
+        self.weights = weights
+        self.bias = float(bias)
+        self.dimensions = int(dimensions)
+        self.ngrams = tuple(int(n) for n in ngrams)
+        self.papers = int(papers)
+        self.validation = validation
+
+    def summary(self):
+        """
+        Describe how much the model's triage decisions can be trusted.
+        Returns:
+            str: Training set size and leave-one-out error at the thresholds.
+        """
+        trained = f"trained on {self.papers} labeled papers" if self.papers else "training set size unknown"
+        if self.validation is None:
+            return f"{trained}; leave-one-out error not measured"
+        v = self.validation
+        return (f"{trained}; leave-one-out error {v['error']:.0%}, and {v['confident_error']:.0%} on the "
+                f"{v['confident']} papers outside the {v['low']:.2f}-{v['high']:.2f} band")
+
+    def predict_proba(self, text):
+        """
+        Estimate the probability that a paper is publishable.
+        Args:
+            text (str): Preprocessed text of the paper.
+        Returns:
+            float: Probability between 0 and 1.
+        """
+        features = hashed_features(text, self.dimensions, self.ngrams)
+        return float(sigmoid(features @ self.weights + self.bias))
+
+    def triage(self, text, low=DEFAULT_LOW_THRESHOLD, high=DEFAULT_HIGH_THRESHOLD):
+        """
+        Classify a paper when the model is confident.
+        Args:
+            text (str): Preprocessed text of the paper.
+            low (float): Probability at or below which the paper is non-publishable.
+            high (float): Probability at or above which the paper is publishable.
+        Returns:
+            tuple: (decision, probability); decision is "publishable", "non-publishable"
+                or "uncertain".
+        """
+        probability = self.predict_proba(text)
+        if probability >= high:
+            return "publishable", probability
+        if probability <= low:
+            return "non-publishable", probability
+        return "uncertain", probability
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        validation = {} if self.validation is None else {f"validation_{k}": v for k, v in self.validation.items()}
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, dimensions=self.dimensions,
+                            ngrams=np.array(self.ngrams), papers=self.papers, **validation)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        """
+        Load a model saved by save().
+        Args:
+            path (str): Path to the .npz file.
+        Returns:
+            TriageModel: The model.
+        """
+        with np.load(path) as data:
+            # Models saved before the training set size was recorded load with papers=0
+            validation = {key[len("validation_"):]: data[key].item() for key in data.files
+                          if key.startswith("validation_")}
+            return cls(data["weights"], data["bias"], data["dimensions"], data["ngrams"],
+                       int(data["papers"]) if "papers" in data.files else 0, validation or None)
+
+
+def leave_one_out(X, y, names, **training):
+    """
+    Estimate accuracy by training on all papers but one and predicting the one left out.
+    Args:
+        X (numpy.ndarray): Feature matrix.
+        y (numpy.ndarray): Labels.
+        names (list): Paper names, for the report.
+        **training: Arguments for train_logistic_regression.
+    Returns:
+        numpy.ndarray: Held-out probability of every paper.
+    """
+    probabilities = np.zeros(len(y))
+    for i in range(len(y)):
+        keep = np.arange(len(y)) != i
+        weights, bias = train_logistic_regression(X[keep], y[keep], **training)
+        probabilities[i] = sigmoid(X[i] @ weights + bias)
+        print(f"  {names[i]}: label {int(y[i])}, held-out probability {probabilities[i]:.2f}")
+    return probabilities
+
+
+def validation_report(probabilities, labels, low=DEFAULT_LOW_THRESHOLD, high=DEFAULT_HIGH_THRESHOLD):
+    """
+    Summarise leave-one-out predictions at the triage thresholds.
+    Args:
+        probabilities (numpy.ndarray): Held-out probability of every paper.
+        labels (numpy.ndarray): Labels, 1 for publishable.
+        low (float): Probability at or below which a paper is non-publishable.
+        high (float): Probability at or above which a paper is publishable.
+    Returns:
+        dict: error (all papers at 0.5), confident (papers outside the band), confident_error,
+            low and high.
+    """
+    wrong = (probabilities >= 0.5) != (labels == 1)
+    confident = (probabilities >= high) | (probabilities <= low)
+    return {
+        "error": float(wrong.mean()),
+        "confident": int(confident.sum()),
+        "confident_error": float(wrong[confident].mean()) if confident.any() else 0.0,
+        "low": low,
+        "high": high,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the publishability triage model on the labeled papers.")
+    parser.add_argument("--publishable-dir", default=PUBLISHABLE_DIR)
+    parser.add_argument("--non-publishable-dir", default=NON_PUBLISHABLE_DIR)
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS, help="Hashed feature buckets.")
+    parser.add_argument("--l2", type=float, default=DEFAULT_L2)
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument("--no-validate", action="store_true", help="Skip the leave-one-out evaluation.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    names, texts, labels = load_labeled_papers(args.publishable_dir, args.non_publishable_dir)
+    X = feature_matrix(texts, args.dimensions)
+    print(f"Loaded {len(names)} labeled papers ({int(labels.sum())} publishable) in {time.perf_counter() - start:.1f}s")
+
+    validation = None
+    if not args.no_validate:
+        print("Leave-one-out evaluation:")
+        probabilities = leave_one_out(X, labels, names, l2=args.l2, epochs=args.epochs)
+        validation = validation_report(probabilities, labels)
+
+    weights, bias = train_logistic_regression(X, labels, l2=args.l2, epochs=args.epochs)
+    model = TriageModel(weights, bias, args.dimensions, papers=len(names), validation=validation)
+    model.save(args.output)
+    print(f"Model saved to {args.output}: {model.summary()}")
+    if model.papers < MIN_TRIAGE_PAPERS:
+        print(f"main.py --triage needs a model trained on at least {MIN_TRIAGE_PAPERS} labeled papers; "
+              f"it will send every paper to the agents until more are labeled")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import json
+import time
+import pstats
+import cProfile
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Default output paths
+TRACE_PATH = "Data/trace.jsonl"
+PROFILE_PATH = "Data/profile.prof"
+
+# Span the code is currently running in. Engine threads copy the context of the thread
+# that submitted their work, so spans nest across the paper, agent and chunk pools.
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    def __init__(self, name, parent=None, **attrs):
+        """
+        Initialize a timed unit of work.
+        Args:
+            name (str): Stage name, e.g. "llm_call".
+            parent (Span): Enclosing span, if any.
+            **attrs: Labels such as the paper's filename or the chunk index.
+        """
+        self.name = name
+        self.id = next(_span_ids)
+        self.parent_id = parent.id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.id
+        self.attrs = attrs
+        self.counts = {}
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def count(self, **values):
+        # Add to counters such as prompt_tokens; counters are summed in the summary
+        for key, value in values.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent_id,
+            "trace": self.trace_id,
+            "start": self.start,
+            "duration": self.duration,
+            **self.attrs,
+            **self.counts,
+        }
+
+
+class _NullSpan:
+    # Stand-in used when tracing is off, so instrumented code needs no checks
+    def set(self, **attrs):
+        pass
+
+    def count(self, **values):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, path=None):
+        """
+        Initialize a tracer that collects finished spans and optionally writes them as JSON lines.
+        Args:
+            path (str): File the spans are appended to as they finish; None keeps them in memory only.
+        """
+        self.spans = []
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Time a block of code as a span nested in the current one.
+        Args:
+            name (str): Stage name.
+            **attrs: Labels for the span.
+        Yields:
+            Span: The span, to add attributes or counters to.
+        """
+        span = Span(name, _current_span.get(), **attrs)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name, duration, **attrs):
+        """
+        Add a span for work timed elsewhere, e.g. in a worker process.
+        Args:
+            name (str): Stage name.
+            duration (float): Seconds the work took.
+            **attrs: Labels for the span; numbers are added to its counters instead.
+        """
+        span = Span(name, _current_span.get(),
+                    **{key: value for key, value in attrs.items() if not isinstance(value, (int, float))})
+        span.count(**{key: value for key, value in attrs.items() if isinstance(value, (int, float))})
+        span.start -= duration
+        span.duration = duration
+        self._finish(span)
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(span.to_dict()) + "\n")
+
+    def summary(self):
+        """
+        Aggregate the finished spans per stage.
+        Returns:
+            dict: Per stage name: count, total, mean, p95 and max seconds, and summed counters.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        stages = {}
+        for span in spans:
+            stages.setdefault(span.name, []).append(span)
+
+        summary = {}
+        for name, group in stages.items():
+            durations = sorted(span.duration for span in group)
+            counts = {}
+            for span in group:
+                for key, value in span.counts.items():
+                    counts[key] = counts.get(key, 0) + value
+            summary[name] = {
+                "count": len(durations),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations),
+                "p95": durations[min(int(0.95 * len(durations)), len(durations) - 1)],
+                "max": durations[-1],
+                **counts,
+            }
+        return summary
+
+    def print_summary(self):
+        """
+        Print the per-stage summary as a table, slowest stage first.
+        """
+        summary = self.summary()
+        if not summary:
+            return
+        counters = sorted({key for stage in summary.values() for key in stage} - {"count", "total", "mean", "p95", "max"})
+        print(f"\n{'stage':<16}{'count':>7}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}"
+              + "".join(f"{key:>18}" for key in counters))
+        for name, stage in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            print(f"{name:<16}{stage['count']:>7}{stage['total']:>10.2f}{stage['mean'] * 1000:>10.1f}"
+                  f"{stage['p95'] * 1000:>10.1f}" + "".join(f"{stage.get(key, ''):>18}" for key in counters))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_tracer = None
+
+
+def set_tracer(tracer):
+    """
+    Install the tracer used by span(), record() and count(); None turns tracing off.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block of code with the installed tracer. Does nothing when tracing is off.
+    Args:
+        name (str): Stage name.
+        **attrs: Labels for the span.
+    Yields:
+        Span: The span, or a stand-in that ignores everything when tracing is off.
+    """
+    if _tracer is None:
+        yield _NULL_SPAN
+        return
+    with _tracer.span(name, **attrs) as current:
+        yield current
+
+
+def record(name, duration, **attrs):
+    # Add a span for work timed elsewhere; see Tracer.record
+    if _tracer is not None:
+        _tracer.record(name, duration, **attrs)
+
+
+def count(**values):
+    """
+    Add to the counters of the current span, e.g. count(prompt_tokens=120).
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.count(**values)
+
+
+@contextmanager
+def profile(path=PROFILE_PATH, top=25):
+    """
+    Run a block under cProfile, save the stats and print the most expensive functions.
+    cProfile only sees the thread it was started on, so profile serial runs.
+    Args:
+        path (str): File the raw stats are saved to, for snakeviz or pstats.
+        top (int): Number of functions printed, by cumulative time.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+        print(f"Profile saved to {path}")
+
+
+def add_tracing_arguments(parser):
+    """
+    Add the --trace and --profile options to an argument parser.
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend.
+    """
+    parser.add_argument("--trace", nargs="?", const=TRACE_PATH, metavar="PATH",
+                        help=f"Record per-stage timings as JSON lines (default {TRACE_PATH}) and print a summary.")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_PATH, metavar="PATH",
+                        help="Run under cProfile and save the stats; only the main thread is profiled.")
+
+
+@contextmanager
+def traced_run(args):
+    """
+    Trace and/or profile a run as requested by the add_tracing_arguments options.
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+    """
+    tracer = Tracer(args.trace) if args.trace else None
+    set_tracer(tracer)
+    try:
+        if args.profile:
+            with profile(args.profile):
+                yield
+        else:
+            yield
+    finally:
+        set_tracer(None)
+        if tracer is not None:
+            tracer.close()
+            tracer.print_summary()
+            print(f"Trace appended to {args.trace}")